@@ -0,0 +1,691 @@
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ib_async import BarData, Contract
+from core.config import get_settings
+from core.history_scheduler import history_scheduler, PRIORITY_INTERACTIVE
+from utils.logger import logger
+
+# 本地K线的列式存储结构，time 为 UTC 秒
+BAR_DTYPE = np.dtype(
+    [
+        ("time", "i8"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+        ("average", "f8"),
+        ("barCount", "i8"),
+    ]
+)
+
+# IB durationStr 单位对应的秒数（按自然日换算）
+DURATION_UNITS = {
+    "S": 1,
+    "D": 86400,
+    "W": 7 * 86400,
+    "M": 30 * 86400,
+    "Y": 365 * 86400,
+}
+
+# K线周期上限（秒） -> 单次请求允许的最大时长（秒）
+MAX_CHUNK_SECONDS = [
+    (1, 1800),
+    (5, 3600),
+    (15, 14400),
+    (30, 28800),
+    (60, 86400),
+    (120, 2 * 86400),
+    (20 * 60, 7 * 86400),
+    (8 * 3600, 30 * 86400),
+    (30 * 86400, 365 * 86400),
+]
+
+# 相邻K线间隔不少于该秒数时视为不同的交易时段（隔夜、周末、节假日）
+SESSION_GAP = 4 * 3600
+# "N D" 窗口内交易时段不足时最多向前顺延的天数
+SESSION_LOOKBACK_DAYS = 10
+
+BarKey = Tuple[int, str, str, bool]
+Interval = Tuple[int, int]
+
+
+def _duration_parts(duration: str) -> Tuple[int, str]:
+    match = re.fullmatch(r"\s*(\d+)\s*([SDWMY])\s*", duration.upper())
+    if not match:
+        raise ValueError(f"无效的数据时长: {duration}")
+    return int(match.group(1)), match.group(2)
+
+
+def parse_duration(duration: str) -> int:
+    """将 "1 D"、"2 W" 等 durationStr 按日历时间换算为秒
+
+    "N D" 的实际窗口按交易时段计算，见 session_count 与 load_bars
+    """
+    count, unit = _duration_parts(duration)
+    return count * DURATION_UNITS[unit]
+
+
+def session_count(duration: str) -> int:
+    """"N D" 对应的交易时段数，其余单位返回 0（按日历时间计算）
+
+    IB 按交易时段解释 "N D"：周末或开盘前请求 "1 D" 返回上一个交易时段
+    """
+    count, unit = _duration_parts(duration)
+    return count if unit == "D" else 0
+
+
+def session_starts(times: np.ndarray, bar_seconds: int) -> np.ndarray:
+    """按K线之间的空档切分交易时段，返回每个时段第一根K线的时间
+
+    日线等不短于 SESSION_GAP 的周期每根K线各为一个时段
+    """
+    times = np.asarray(times)
+    if not len(times):
+        return times
+    gaps = np.diff(times) >= max(SESSION_GAP, bar_seconds)
+    return times[np.r_[True, gaps]]
+
+
+# barSizeSetting 单位对应的秒数
+BAR_SIZE_UNITS = {
+    "sec": 1,
+    "min": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+}
+
+
+def parse_bar_size(bar_size: str) -> int:
+    """将 "1 min"、"5 mins"、"1 day" 等 barSizeSetting 换算为秒"""
+    match = re.fullmatch(r"\s*(\d+)\s*(sec|min|hour|day|week|month)s?\s*", bar_size.lower())
+    if not match:
+        raise ValueError(f"无效的K线周期: {bar_size}")
+    return int(match.group(1)) * BAR_SIZE_UNITS[match.group(2)]
+
+
+def ib_duration(seconds: float) -> str:
+    """将秒数换算为能覆盖该区间的 durationStr"""
+    if seconds <= 86400:
+        return f"{max(int(math.ceil(seconds)), 60)} S"
+    if seconds < 365 * 86400:
+        return f"{int(math.ceil(seconds / 86400))} D"
+    return f"{int(math.ceil(seconds / (365 * 86400)))} Y"
+
+
+def bar_time(value) -> int:
+    """BarData.date（datetime 或 date）转为 UTC 秒"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return int(datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp())
+    raise TypeError(f"无法识别的K线时间: {value!r}")
+
+
+def bars_to_array(bars: Sequence[BarData]) -> np.ndarray:
+    """将 BarData 列表转换为按时间升序的结构化数组"""
+    array = np.empty(len(bars), dtype=BAR_DTYPE)
+    for i, bar in enumerate(bars):
+        array[i] = (
+            bar_time(bar.date),
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+            bar.average,
+            bar.barCount,
+        )
+    array.sort(order="time")
+    return array
+
+
+def array_to_bars(array: np.ndarray) -> List[BarData]:
+    """将结构化数组转换回 BarData 列表"""
+    return [
+        BarData(
+            date=datetime.fromtimestamp(int(row["time"]), timezone.utc),
+            open=float(row["open"]),
+            high=float(row["high"]),
+            low=float(row["low"]),
+            close=float(row["close"]),
+            volume=float(row["volume"]),
+            average=float(row["average"]),
+            barCount=int(row["barCount"]),
+        )
+        for row in array
+    ]
+
+
+def merge_bars(existing: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """合并两段K线，时间相同的以 new 为准，结果按时间升序"""
+    combined = np.concatenate([np.asarray(existing), np.asarray(new)])[::-1]
+    _, index = np.unique(combined["time"], return_index=True)
+    return combined[index]
+
+
+def resample_bars(array: np.ndarray, bar_seconds: int) -> np.ndarray:
+    """将按时间升序的K线聚合为 bar_seconds 周期（按 UTC 整点对齐）
+
+    开盘取首根、收盘取末根、最高/最低取极值，成交量与笔数求和，
+    均价按成交量加权
+    """
+    if not len(array):
+        return np.empty(0, dtype=BAR_DTYPE)
+    times = array["time"]
+    buckets = times - times % bar_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(array)] - 1
+
+    volume = np.add.reduceat(array["volume"], starts)
+    turnover = np.add.reduceat(array["average"] * array["volume"], starts)
+
+    result = np.empty(len(starts), dtype=BAR_DTYPE)
+    result["time"] = buckets[starts]
+    result["open"] = array["open"][starts]
+    result["high"] = np.maximum.reduceat(array["high"], starts)
+    result["low"] = np.minimum.reduceat(array["low"], starts)
+    result["close"] = array["close"][ends]
+    result["volume"] = volume
+    result["average"] = np.divide(
+        turnover, volume, out=result["close"].copy(), where=volume > 0
+    )
+    result["barCount"] = np.add.reduceat(array["barCount"], starts)
+    return result
+
+
+def can_resample(bar_size: str, base_bar_size: str, use_rth: bool) -> bool:
+    """bar_size 是否能由 base_bar_size 的K线聚合得到
+
+    日线只在常规交易时段内聚合（盘前盘后会跨越 UTC 日界），周线和月线不聚合
+    """
+    bar_seconds = parse_bar_size(bar_size)
+    base_seconds = parse_bar_size(base_bar_size)
+    if bar_seconds <= base_seconds or bar_seconds % base_seconds:
+        return False
+    if bar_seconds > 86400 or (bar_seconds == 86400 and not use_rth):
+        return False
+    return True
+
+
+def merge_intervals(intervals: Sequence[Interval]) -> List[Interval]:
+    """合并重叠或相邻的时间区间"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start: int, end: int, covered: Sequence[Interval]) -> List[Interval]:
+    """计算 [start, end] 中未被 covered 覆盖的区间"""
+    missing: List[Interval] = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+class BarStore:
+    """本地历史K线存储
+
+    按 (conId, bar_size, whatToShow, useRTH) 每个序列保存一个 .npy 文件，
+    读取时以内存映射方式返回，不复制数据；旁边的 .json 记录已覆盖的时间区间，
+    只有未覆盖的尾部或缺口才需要向 IB 请求
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._locks: Dict[BarKey, asyncio.Lock] = {}
+
+    def lock(self, key: BarKey) -> asyncio.Lock:
+        """同一序列的读-补-写过程串行执行"""
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    def read(self, key: BarKey) -> np.ndarray:
+        """以内存映射方式读取整个序列"""
+        path = self._path(key, ".npy")
+        if not path.exists():
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.load(path, mmap_mode="r")
+
+    def coverage(self, key: BarKey) -> List[Interval]:
+        """已覆盖的时间区间"""
+        path = self._path(key, ".json")
+        if not path.exists():
+            return []
+        return [tuple(interval) for interval in json.loads(path.read_text())["coverage"]]
+
+    def write(self, key: BarKey, bars: np.ndarray, covered: Sequence[Interval]):
+        """合并新K线并记录覆盖区间"""
+        path = self._path(key, ".npy")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if len(bars):
+            merged = merge_bars(self.read(key), bars)
+            # 写入临时文件后替换，已打开的内存映射不受影响
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, merged)
+            os.replace(tmp, path)
+        coverage = merge_intervals([*self.coverage(key), *covered])
+        self._path(key, ".json").write_text(json.dumps({"coverage": coverage}))
+
+    def _path(self, key: BarKey, suffix: str) -> Path:
+        con_id, bar_size, what_to_show, use_rth = key
+        name = f"{bar_size.replace(' ', '')}_{what_to_show}_{'rth' if use_rth else 'all'}"
+        return self.root / str(con_id) / f"{name}{suffix}"
+
+
+def plan_chunks(start: int, end: int, bar_size: str) -> List[Interval]:
+    """将 [start, end] 按该K线周期允许的单次最大时长切分，从新到旧排列"""
+    chunk = max_chunk_seconds(parse_bar_size(bar_size))
+    chunks: List[Interval] = []
+    cursor = end
+    while cursor > start:
+        chunks.append((max(start, cursor - chunk), cursor))
+        cursor -= chunk
+    return chunks
+
+
+def max_chunk_seconds(bar_seconds: int) -> int:
+    """单次请求允许的最大时长（IB 历史数据时长与K线周期对应规则）"""
+    for max_bar_seconds, chunk in MAX_CHUNK_SECONDS:
+        if bar_seconds <= max_bar_seconds:
+            return chunk
+    return MAX_CHUNK_SECONDS[-1][1]
+
+
+async def load_bars(
+    contract: Contract,
+    duration: str,
+    bar_size: str,
+    end_datetime: datetime,
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> np.ndarray:
+    """获取截至 end_datetime、时长为 duration 的K线
+
+    已存储的部分直接从本地读取，只向 IB 请求缺失的区间；
+    超出单次请求上限的区间自动分段并发请求，经 history_scheduler 按 priority 排队节流。
+    若本地的 resample_base 周期K线已覆盖区间起点、只缺最新的尾部，
+    只补齐基础周期的尾部后在本地聚合，不再请求该周期的完整区间。
+    "N D" 与 IB 一致，返回 end_datetime 之前最近 N 个交易时段，周末、节假日和开盘前
+    向前顺延；其余单位按日历时间 [end_datetime - duration, end_datetime] 计算
+    """
+    end = int(end_datetime.timestamp())
+    start = end - parse_duration(duration)
+    bars = await _load_range(contract, start, end, bar_size, what_to_show, use_rth, priority)
+    sessions = session_count(duration)
+    if sessions:
+        bars = await _last_sessions(
+            contract, bars, sessions, start, bar_size, what_to_show, use_rth, priority
+        )
+    return bars
+
+
+async def _load_range(
+    contract: Contract,
+    start: int,
+    end: int,
+    bar_size: str,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> np.ndarray:
+    """获取 [start, end] 区间的K线"""
+    resample_base = get_settings().RESAMPLE_BASE_BAR_SIZE
+    if bar_store is not None and resample_base and can_resample(
+        bar_size, resample_base, use_rth
+    ):
+        resampled = await _resample_from_store(
+            contract, start, end, bar_size, resample_base, what_to_show, use_rth, priority
+        )
+        if resampled is not None:
+            return resampled
+
+    if bar_store is None:
+        chunks = await asyncio.gather(
+            *(
+                _request_chunk(contract, chunk, bar_size, what_to_show, use_rth, priority)
+                for chunk in plan_chunks(start, end, bar_size)
+            )
+        )
+        stored = merge_bars(
+            np.empty(0, dtype=BAR_DTYPE),
+            np.concatenate(chunks) if chunks else np.empty(0, dtype=BAR_DTYPE),
+        )
+    else:
+        async for _ in _backfill_range(
+            contract, start, end, bar_size, what_to_show, use_rth, priority
+        ):
+            pass
+        stored = bar_store.read((contract.conId, bar_size, what_to_show, use_rth))
+
+    lo = int(np.searchsorted(stored["time"], start, side="left"))
+    hi = int(np.searchsorted(stored["time"], end, side="right"))
+    return stored[lo:hi]
+
+
+async def _last_sessions(
+    contract: Contract,
+    bars: np.ndarray,
+    sessions: int,
+    start: int,
+    bar_size: str,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> np.ndarray:
+    """截取最近 sessions 个完整的交易时段
+
+    窗口内完整时段不足时（周末、节假日、开盘前）每次向前多取一天，
+    最多 SESSION_LOOKBACK_DAYS 天
+    """
+    bar_seconds = parse_bar_size(bar_size)
+    extended = 0
+    while True:
+        starts = session_starts(bars["time"], bar_seconds)
+        # 紧贴窗口起点的时段可能被截断，不计为完整时段
+        complete = starts[starts - start >= SESSION_GAP]
+        if len(complete) >= sessions or extended >= SESSION_LOOKBACK_DAYS:
+            break
+        earlier = await _load_range(
+            contract, start - 86400, start, bar_size, what_to_show, use_rth, priority
+        )
+        bars = merge_bars(earlier, bars)
+        start -= 86400
+        extended += 1
+
+    if not len(complete):
+        return bars
+    first = complete[-min(sessions, len(complete))]
+    return bars[int(np.searchsorted(bars["time"], first, side="left")) :]
+
+
+async def _resample_from_store(
+    contract: Contract,
+    start: int,
+    end: int,
+    bar_size: str,
+    base_bar_size: str,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> Optional[np.ndarray]:
+    """用本地基础周期K线聚合
+
+    基础K线只缺最新的尾部（单次请求即可补齐）时，先补齐尾部再聚合；
+    未覆盖区间起点、中间有缺口或补齐失败时返回 None，由调用方直接请求该周期
+    """
+    bar_seconds = parse_bar_size(bar_size)
+    base_seconds = parse_bar_size(base_bar_size)
+    aligned_start = start - start % bar_seconds
+    key = (contract.conId, base_bar_size, what_to_show, use_rth)
+
+    missing = subtract_intervals(aligned_start, end, bar_store.coverage(key))
+    if missing:
+        tail_start, _ = missing[0]
+        if (
+            len(missing) > 1
+            or tail_start == aligned_start
+            or len(plan_chunks(tail_start, end, base_bar_size)) > 1
+        ):
+            return None
+        async for _ in _backfill_range(
+            contract, aligned_start, end, base_bar_size, what_to_show, use_rth, priority
+        ):
+            pass
+        missing = subtract_intervals(aligned_start, end, bar_store.coverage(key))
+        # 尚未走完的最新一根基础K线不计入覆盖区间，但已写入存储，可以参与聚合
+        if missing and (len(missing) > 1 or end - missing[0][0] > base_seconds):
+            return None
+
+    base = bar_store.read(key)
+    lo = int(np.searchsorted(base["time"], aligned_start, side="left"))
+    hi = int(np.searchsorted(base["time"], end, side="right"))
+    return resample_bars(base[lo:hi], bar_seconds)
+
+
+async def backfill_bars(
+    contract: Contract,
+    duration: str,
+    bar_size: str,
+    end_datetime: datetime,
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> AsyncIterator[dict]:
+    """补齐本地存储中缺失的区间
+
+    缺失区间按单次请求上限切分后并发请求，每完成一个分段产出一次进度：
+    {"completed", "total", "start", "end", "bars", "error"}。
+    只有请求成功的分段才计入覆盖区间；失败或超时的分段 error 为错误信息，下次重新请求。
+    完成的分段先在内存中缓冲，缓冲行数达到已存储行数时才合并写入，结束时写入剩余部分
+    """
+    if bar_store is None:
+        raise ValueError("未启用本地K线存储（BAR_STORE_DIR）")
+
+    end = int(end_datetime.timestamp())
+    start = end - parse_duration(duration)
+    async for progress in _backfill_range(
+        contract, start, end, bar_size, what_to_show, use_rth, priority
+    ):
+        yield progress
+
+
+async def _backfill_range(
+    contract: Contract,
+    start: int,
+    end: int,
+    bar_size: str,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> AsyncIterator[dict]:
+    bar_seconds = parse_bar_size(bar_size)
+    key = (contract.conId, bar_size, what_to_show, use_rth)
+
+    async with bar_store.lock(key):
+        chunks = [
+            chunk
+            for gap in subtract_intervals(start, end, bar_store.coverage(key))
+            for chunk in plan_chunks(*gap, bar_size)
+        ]
+        tasks = {
+            asyncio.ensure_future(
+                _request_chunk(contract, chunk, bar_size, what_to_show, use_rth, priority)
+            ): chunk
+            for chunk in chunks
+        }
+        pending: List[np.ndarray] = []
+        pending_covered: List[Interval] = []
+        pending_rows, stored_rows = 0, len(bar_store.read(key))
+
+        def flush() -> int:
+            """把缓冲的分段一次合并写入，返回写入后的总行数"""
+            if pending or pending_covered:
+                bar_store.write(
+                    key,
+                    np.concatenate(pending) if pending else np.empty(0, dtype=BAR_DTYPE),
+                    pending_covered,
+                )
+                pending.clear()
+                pending_covered.clear()
+            return len(bar_store.read(key))
+
+        try:
+            completed = 0
+            async for task in asyncio.as_completed(tasks):
+                completed += 1
+                chunk_start, chunk_end = tasks[task]
+                progress = {
+                    "completed": completed,
+                    "total": len(chunks),
+                    "start": chunk_start,
+                    "end": chunk_end,
+                    "bars": 0,
+                    "error": None,
+                }
+                try:
+                    bars = await task
+                except Exception as e:
+                    logger.warning(
+                        f"补齐K线失败 {contract.symbol} {bar_size} "
+                        f"({chunk_start} - {chunk_end}): {str(e)}"
+                    )
+                    progress["error"] = str(e)
+                    yield progress
+                    continue
+
+                pending.append(bars)
+                pending_covered.extend(
+                    _covered_intervals(bars, chunk_start, chunk_end, bar_seconds)
+                )
+                pending_rows += len(bars)
+                # 缓冲量达到已存储行数时才合并写入，整个回填的磁盘读写总量为线性
+                if pending_rows >= stored_rows:
+                    stored_rows = flush()
+                    pending_rows = 0
+                logger.debug(
+                    f"补齐K线 {contract.symbol} {bar_size}: {len(bars)} 根 "
+                    f"({chunk_start} - {chunk_end})"
+                )
+                progress["bars"] = len(bars)
+                yield progress
+        finally:
+            for task in tasks:
+                task.cancel()
+            flush()
+
+
+def _covered_intervals(
+    bars: np.ndarray, chunk_start: int, chunk_end: int, bar_seconds: int
+) -> List[Interval]:
+    """成功返回的分段中可以计入覆盖区间的部分
+
+    尚未走完的最新一根K线不计入，下次重新拉取；
+    截止到当前时间的分段返回为空时可能只是数据尚未发布，整段都不计入
+    """
+    live = chunk_end + bar_seconds > time.time()
+    if not len(bars):
+        return [] if live else [(chunk_start, chunk_end)]
+    covered_end = chunk_end
+    if live and bars["time"][-1] + bar_seconds > chunk_end:
+        covered_end = int(bars["time"][-1])
+    return [(min(chunk_start, int(bars["time"][0])), covered_end)]
+
+
+async def stream_bars(
+    contract: Contract,
+    duration: str,
+    bar_size: str,
+    end_datetime: datetime,
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+    chunk_rows: int = 1000,
+) -> AsyncIterator[np.ndarray]:
+    """按时间顺序分批产出区间内的K线，每批最多 chunk_rows 根
+
+    缺失区间在后台并发补齐，从区间起点开始连续覆盖的部分一旦就绪即可产出，
+    不必等待整个区间下载完成。"N D" 需要先确定交易时段的起点，整段取回后再分批产出
+    """
+    if bar_store is None or session_count(duration):
+        bars = await load_bars(
+            contract, duration, bar_size, end_datetime, what_to_show, use_rth
+        )
+        for i in range(0, len(bars), chunk_rows):
+            yield bars[i : i + chunk_rows]
+        return
+
+    end = int(end_datetime.timestamp())
+    cursor = end - parse_duration(duration)
+    key = (contract.conId, bar_size, what_to_show, use_rth)
+
+    def ready(until: int, inclusive: bool):
+        stored = bar_store.read(key)
+        lo = int(np.searchsorted(stored["time"], cursor, side="left"))
+        hi = int(np.searchsorted(stored["time"], until, side="right" if inclusive else "left"))
+        for i in range(lo, hi, chunk_rows):
+            yield stored[i : min(i + chunk_rows, hi)]
+
+    async for _ in backfill_bars(
+        contract, duration, bar_size, end_datetime, what_to_show, use_rth
+    ):
+        gaps = subtract_intervals(cursor, end, bar_store.coverage(key))
+        covered_to = gaps[0][0] if gaps else end
+        if covered_to > cursor:
+            for chunk in ready(covered_to, inclusive=False):
+                yield chunk
+            cursor = covered_to
+
+    for chunk in ready(end, inclusive=True):
+        yield chunk
+
+
+async def _request_chunk(
+    contract: Contract,
+    chunk: Interval,
+    bar_size: str,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> np.ndarray:
+    chunk_start, chunk_end = chunk
+    bars = await _request_bars(
+        contract,
+        ib_duration(chunk_end - chunk_start),
+        bar_size,
+        datetime.fromtimestamp(chunk_end, timezone.utc),
+        what_to_show,
+        use_rth,
+        priority,
+    )
+    return bars_to_array(bars)
+
+
+async def _request_bars(
+    contract: Contract,
+    duration: str,
+    bar_size: str,
+    end_datetime: datetime,
+    what_to_show: str,
+    use_rth: bool,
+    priority: int,
+) -> List[BarData]:
+    return await history_scheduler.request(
+        contract,
+        priority,
+        endDateTime=end_datetime,
+        durationStr=duration,
+        barSizeSetting=bar_size,
+        whatToShow=what_to_show,
+        useRTH=use_rth,
+        formatDate=2,
+    )
+
+
+bar_store = (
+    BarStore(get_settings().BAR_STORE_DIR) if get_settings().BAR_STORE_DIR else None
+)
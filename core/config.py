@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 from functools import lru_cache
 
 
@@ -14,6 +14,97 @@ class Settings(BaseSettings):
     API_PORT: int = 1200
     API_ROOT_PATH: str = "/ib_api"
 
+    # 行情缓存设置
+    QUOTE_CACHE_IDLE_TTL: float = 300.0  # 空闲订阅保留时长（秒）
+    QUOTE_CACHE_MAX_LINES: int = 80  # 同时占用的行情线路上限
+    QUOTE_READY_TIMEOUT: float = 2.0  # 等待报价字段就绪的最长时间（秒）
+    QUOTE_BATCH_CONCURRENCY: int = 40  # 批量报价同时等待的合约数
+    OPTION_READY_TIMEOUT: float = 5.0  # 等待期权报价与希腊值就绪的最长时间（秒）
+    OPTION_CHAIN_CONCURRENCY: int = 40  # 期权链同时占用的行情线路数
+    RISK_FREE_RATE: float = 0.045  # 本地计算隐含波动率使用的无风险利率
+
+    # 市场深度设置
+    DEPTH_MAX_LINES: int = 3  # 同时保持的深度订阅上限（TWS 默认只允许 3 个）
+    DEPTH_ROWS: int = 10  # 每侧盘口档位数
+    DEPTH_SMART: bool = True  # 是否订阅跨交易所合并的 SMART 深度
+    DEPTH_IDLE_TTL: float = 60.0  # 空闲深度订阅保留时长（秒）
+    DEPTH_READY_TIMEOUT: float = 3.0  # 新订阅等待首批深度数据的最长时间（秒）
+
+    # 合约缓存设置
+    CONTRACT_CACHE_PATH: Optional[str] = "cache/contracts.db"  # 为空时不落盘
+    CONTRACT_CACHE_TTL: float = 7 * 24 * 3600.0  # 已识别合约的有效期（秒）
+
+    # 基本面报告缓存设置
+    FUNDAMENTAL_CACHE_PATH: Optional[str] = "cache/fundamentals.db"  # 为空时只缓存在内存
+    FUNDAMENTAL_CACHE_TTLS: Dict[str, float] = {  # 各报告类型的有效期（秒）
+        "ReportSnapshot": 24 * 3600.0,
+        "ReportsFinSummary": 24 * 3600.0,
+        "ReportsFinStatements": 7 * 24 * 3600.0,
+        "RESC": 24 * 3600.0,
+        "ReportsOwnership": 24 * 3600.0,
+        "CalendarReport": 12 * 3600.0,
+    }
+    FUNDAMENTAL_CACHE_DEFAULT_TTL: float = 24 * 3600.0  # 未单独配置的报告类型的有效期（秒）
+    FUNDAMENTAL_CACHE_MAX_STALE: float = 30 * 24 * 3600.0  # 过期后仍先返回旧报告的最长时间（秒）
+
+    # 基本面筛选设置
+    SCREENER_TABLE_PATH: Optional[str] = "cache/universe.npz"  # 为空时只保存在内存
+    SCREENER_UNIVERSE: List[str] = []  # 预取基本面的股票池，如 ["AAPL","MSFT",...]
+    SCREENER_METRICS: Dict[str, str] = {  # 筛选字段名 -> ReportSnapshot 指标名
+        "price": "NPRICE",
+        "market_cap": "MKTCAP",
+        "pe": "PEEXCLXOR",
+        "pb": "PRICE2BK",
+        "ps": "TTMPR2REV",
+        "revenue_growth": "TTMREVCHG",
+        "eps_growth": "TTMEPSCHG",
+        "roe": "TTMROEPCT",
+        "gross_margin": "TTMGROSMGN",
+        "net_margin": "TTMNPMGN",
+        "current_ratio": "QCURRATIO",
+        "debt_to_equity": "QTOTD2EQ",
+        "dividend_yield": "YIELD",
+        "beta": "BETA",
+        "target_price": "TargetPrice",
+        "consensus": "ConsRecom",
+    }
+    SCREENER_PREFETCH_CONCURRENCY: int = 8  # 预取同时进行的报告请求数
+    SCREENER_PREFETCH_PACING: float = 0.5  # 预取向 IB 发出请求的最小间隔（秒），命中缓存的不计
+    SCREENER_PREFETCH_INTERVAL: float = 24 * 3600.0  # 连接后自动预取的周期（秒），0 表示只手动触发
+
+    # 历史K线存储设置
+    BAR_STORE_DIR: Optional[str] = "cache/bars"  # 为空时每次直接请求 IB
+    RESAMPLE_BASE_BAR_SIZE: Optional[str] = "1 min"  # 已覆盖时由该周期本地聚合更大周期
+
+    # 技术指标设置
+    INDICATOR_MAX_ROWS: int = 5000  # 每个缓存的指标引擎保留的最近行数，即 tail 的上限
+    INDICATOR_MAX_ENGINES: int = 256  # 缓存的指标引擎数上限（按标的、周期与参数区分），超出时淘汰最久未使用的
+
+    # 历史数据节流设置
+    HISTORY_MAX_REQUESTS: int = 60  # 窗口内最多请求数
+    HISTORY_REQUEST_WINDOW: float = 600.0  # 请求数统计窗口（秒）
+    HISTORY_MAX_CONCURRENT: int = 50  # 同时进行中的请求上限
+    HISTORY_IDENTICAL_INTERVAL: float = 15.0  # 相同请求的最小间隔（秒），期间复用结果
+    HISTORY_CONTRACT_MAX_REQUESTS: int = 5  # 同一合约窗口内最多请求数
+    HISTORY_CONTRACT_WINDOW: float = 2.0  # 同一合约请求数统计窗口（秒）
+    HISTORY_REQUEST_TIMEOUT: float = 60.0  # 单个请求超时（秒），超时的分段不计入已覆盖区间
+
+    # 实时K线设置
+    REALTIME_BAR_SIZES: List[str] = ["5 secs", "1 min", "5 mins"]  # 由 5 秒K线在服务端聚合
+    REALTIME_BAR_WHAT_TO_SHOW: str = "TRADES"
+    REALTIME_BAR_USE_RTH: bool = False
+
+    # 逐笔录制设置
+    TICK_RECORDER_DIR: str = "cache/ticks"  # 每个标的一个环形文件
+    TICK_RECORDER_SYMBOLS: List[str] = []  # 连接 TWS 后自动录制的标的，如 ["AAPL","MSFT"]
+    TICK_RING_CAPACITY: int = 2_000_000  # 每个环形文件保留的记录数（每条 66 字节）
+
+    # 下单设置
+    ORDER_ACK_TIMEOUT: float = 5.0  # ack 模式下等待 TWS 确认订单的最长时间（秒）
+
+    # 流式响应设置
+    STREAM_CHUNK_ROWS: int = 1000  # 每个数据块包含的行数
+
     # 日志设置
     LOG_LEVEL: str = "INFO"
     LOG_FILE: Optional[str] = "logs/ib_api.log"
@@ -4,6 +4,12 @@ from enum import Enum
 class OrderType(Enum):
     LIMIT = "LMT"
     MARKET = "MKT"
+    STOP = "STP"
+    STOP_LIMIT = "STP LMT"
+    MARKET_IF_TOUCHED = "MIT"
+    LIMIT_IF_TOUCHED = "LIT"
+    TRAIL = "TRAIL"
+    TRAIL_LIMIT = "TRAIL LIMIT"
 
 class OrderAction(Enum):
     BUY = "BUY"
@@ -0,0 +1,158 @@
+import json
+import sqlite3
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from ib_async import Contract, Stock
+from core import ib
+from core.config import get_settings
+from utils.logger import logger
+
+# 持久化的合约字段（排除 comboLegs 等嵌套结构）
+_PERSISTED_FIELDS = [
+    f.name
+    for f in fields(Contract)
+    if f.name not in ("comboLegs", "deltaNeutralContract")
+]
+
+ContractKey = Tuple[str, str, str, str]
+
+
+class ContractCache:
+    """已识别合约缓存
+
+    按 (symbol, secType, exchange, currency) 缓存 qualifyContracts 的结果：
+    - 条目超过 ttl 秒后视为过期，下次使用时重新识别
+    - 写入同步落盘到 SQLite，启动时加载，重启后无需重新识别整个标的池
+    """
+
+    def __init__(self, path: Optional[str], ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[ContractKey, Tuple[Contract, float]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    @staticmethod
+    def key(contract: Contract) -> ContractKey:
+        symbol = contract.symbol.upper()
+        # 期权、期货等同一标的有多个合约，以到期日、行权方向和行权价区分
+        if contract.lastTradeDateOrContractMonth:
+            symbol += f" {contract.lastTradeDateOrContractMonth}"
+            if contract.right:
+                symbol += f" {contract.right}{contract.strike:g}"
+        return (symbol, contract.secType, contract.exchange, contract.currency)
+
+    def get(self, key: ContractKey) -> Optional[Contract]:
+        """查找未过期的已识别合约"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        contract, qualified_at = entry
+        if time.time() - qualified_at >= self.ttl:
+            del self._entries[key]
+            return None
+        return contract
+
+    def put(self, key: ContractKey, contract: Contract):
+        """缓存已识别的合约"""
+        qualified_at = time.time()
+        self._entries[key] = (contract, qualified_at)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(_dump(contract)), qualified_at),
+            )
+            self._db.commit()
+
+    async def qualify(self, *contracts: Contract) -> List[Contract]:
+        """识别合约，命中缓存的直接返回，未命中的合并为一次 qualifyContractsAsync
+
+        Returns:
+            与入参一一对应的合约列表，无法识别的合约 conId 为 0
+        """
+        result: List[Contract] = list(contracts)
+        pending = []
+        for i, contract in enumerate(contracts):
+            cached = self.get(self.key(contract))
+            if cached is not None:
+                self._hits += 1
+                result[i] = cached
+            else:
+                self._misses += 1
+                pending.append(contract)
+
+        if pending:
+            await ib.qualifyContractsAsync(*pending)
+            for contract in pending:
+                if contract.conId:
+                    self.put(self.key(contract), contract)
+        return result
+
+    def clear(self):
+        """清空内存与磁盘中的缓存"""
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM contracts")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "contracts": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    def _open(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS contracts (
+                symbol TEXT, sec_type TEXT, exchange TEXT, currency TEXT,
+                contract TEXT, qualified_at REAL,
+                PRIMARY KEY (symbol, sec_type, exchange, currency)
+            )"""
+        )
+        # 启动时丢弃过期条目并加载其余合约
+        self._db.execute(
+            "DELETE FROM contracts WHERE qualified_at <= ?", (time.time() - self.ttl,)
+        )
+        self._db.commit()
+        for *key, data, qualified_at in self._db.execute("SELECT * FROM contracts"):
+            contract = Contract.create(**json.loads(data))
+            self._entries[tuple(key)] = (contract, qualified_at)
+        logger.info(f"已加载 {len(self._entries)} 个缓存合约: {path}")
+
+
+def _dump(contract: Contract) -> dict:
+    return {name: getattr(contract, name) for name in _PERSISTED_FIELDS}
+
+
+async def qualify_stocks(
+    symbols: Sequence[str], exchange: str = "SMART", currency: str = "USD"
+) -> List[Contract]:
+    """批量识别股票合约，无法识别的合约 conId 为 0"""
+    return await contract_cache.qualify(
+        *(Stock(symbol.upper(), exchange, currency) for symbol in symbols)
+    )
+
+
+async def qualify_stock(
+    symbol: str, exchange: str = "SMART", currency: str = "USD"
+) -> Contract:
+    """识别单个股票合约，无法识别时抛出 ValueError"""
+    (contract,) = await qualify_stocks([symbol], exchange, currency)
+    if not contract.conId:
+        raise ValueError(f"无法识别合约: {symbol} ({exchange}/{currency})")
+    return contract
+
+
+contract_cache = ContractCache(
+    path=get_settings().CONTRACT_CACHE_PATH,
+    ttl=get_settings().CONTRACT_CACHE_TTL,
+)
@@ -0,0 +1,224 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from ib_async import Contract
+from core import ib
+from core.config import get_settings
+from utils.logger import logger
+
+ReportKey = Tuple[int, str]
+
+
+class FundamentalCache:
+    """基本面报告缓存
+
+    按 (conId, reportType) 缓存 reqFundamentalDataAsync 返回的 XML，zlib 压缩后存入 SQLite：
+    - 未超过该报告类型的 ttl 时直接返回
+    - 超过 ttl 但未超过 max_stale 时先返回旧报告，同时在后台刷新（stale-while-revalidate）
+    - 没有缓存或超过 max_stale 时等待请求完成；同一报告的并发请求合并为一次
+    IB 返回空报告（无订阅或无数据）时不写入缓存
+    SQLite 读写与压缩在线程池中执行，不阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttls: Dict[str, float],
+        default_ttl: float,
+        max_stale: float,
+    ):
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        # 报告获取时间的内存索引，报告内容按需从磁盘读取
+        self._index: Dict[ReportKey, float] = {}
+        self._blobs: Dict[ReportKey, bytes] = {}
+        self._inflight: Dict[ReportKey, asyncio.Task] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        # 线程池中的读写共用一个连接，需串行执行
+        self._db_lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._compressed_bytes = 0
+        self._raw_bytes = 0
+        if path:
+            self._open(path)
+
+    def ttl(self, report_type: str) -> float:
+        return self.ttls.get(report_type, self.default_ttl)
+
+    async def get(self, contract: Contract, report_type: str, allow_stale: bool = True) -> str:
+        """获取报告，优先使用缓存
+
+        Args:
+            allow_stale: 为 False 时过期报告不先返回旧版本，而是等待重新获取
+        """
+        key = (contract.conId, report_type)
+        fetched_at = self._index.get(key)
+        if fetched_at is not None:
+            age = time.time() - fetched_at
+            if age < self.ttl(report_type):
+                report = await self._load(key)
+                if report is not None:
+                    self._hits += 1
+                    return report
+            elif allow_stale and age < self.max_stale:
+                report = await self._load(key)
+                if report is not None:
+                    self._stale_hits += 1
+                    self._refresh_in_background(contract, report_type)
+                    return report
+
+        self._misses += 1
+        return await self._fetch(contract, report_type)
+
+    def fetched_at(self, con_id: int, report_type: str) -> Optional[float]:
+        """缓存报告的获取时间，未缓存时为 None"""
+        return self._index.get((con_id, report_type))
+
+    def is_fresh(self, con_id: int, report_type: str) -> bool:
+        """缓存报告是否未超过有效期（获取时无需请求 IB）"""
+        fetched_at = self._index.get((con_id, report_type))
+        return fetched_at is not None and time.time() - fetched_at < self.ttl(report_type)
+
+    def invalidate(self, con_id: int, report_type: Optional[str] = None):
+        """删除某个合约的缓存报告，report_type 为空时删除全部类型"""
+        keys = [
+            key
+            for key in self._index
+            if key[0] == con_id and (report_type is None or key[1] == report_type)
+        ]
+        for key in keys:
+            self._index.pop(key, None)
+            self._blobs.pop(key, None)
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "DELETE FROM reports WHERE con_id = ? AND report_type = ?", keys
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "reports": len(self._index),
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "in_flight": len(self._inflight),
+            "compression_ratio": (
+                self._raw_bytes / self._compressed_bytes if self._compressed_bytes else None
+            ),
+        }
+
+    async def _fetch(self, contract: Contract, report_type: str) -> str:
+        """同一报告同时只发出一个请求，所有调用方共享该请求的结果
+
+        请求在独立的任务中执行，调用方经 shield 等待：
+        某个调用方被取消时请求继续进行，其他等待者照常拿到结果
+        """
+        key = (contract.conId, report_type)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._request(key, contract, report_type))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._request_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _request(self, key: ReportKey, contract: Contract, report_type: str) -> str:
+        report = await ib.reqFundamentalDataAsync(contract, reportType=report_type)
+        if report:
+            await self._store(key, report)
+        return report
+
+    def _request_done(self, key: ReportKey, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 等待者都已取消时避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def _refresh_in_background(self, contract: Contract, report_type: str):
+        if (contract.conId, report_type) in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch(contract, report_type)
+            except Exception as e:
+                logger.warning(f"后台刷新基本面报告失败: {contract.symbol} {report_type} {str(e)}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def _store(self, key: ReportKey, report: str):
+        raw = report.encode()
+        fetched_at = time.time()
+        if self._db is None:
+            blob = zlib.compress(raw, 6)
+            self._blobs[key] = blob
+        else:
+            blob = await asyncio.to_thread(self._write, key, raw, fetched_at)
+        # 写入完成后才登记，并发读取不会查到尚未落盘的报告
+        self._index[key] = fetched_at
+        self._raw_bytes += len(raw)
+        self._compressed_bytes += len(blob)
+
+    async def _load(self, key: ReportKey) -> Optional[str]:
+        """读取缓存报告，读取期间被删除时返回 None"""
+        if self._db is None:
+            blob = self._blobs.get(key)
+            return None if blob is None else zlib.decompress(blob).decode()
+        return await asyncio.to_thread(self._read, key)
+
+    def _write(self, key: ReportKey, raw: bytes, fetched_at: float) -> bytes:
+        blob = zlib.compress(raw, 6)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)", (*key, blob, fetched_at)
+            )
+            self._db.commit()
+        return blob
+
+    def _read(self, key: ReportKey) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data FROM reports WHERE con_id = ? AND report_type = ?", key
+            ).fetchone()
+        return None if row is None else zlib.decompress(row[0]).decode()
+
+    def _open(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS reports (
+                con_id INTEGER, report_type TEXT, data BLOB, fetched_at REAL,
+                PRIMARY KEY (con_id, report_type)
+            )"""
+        )
+        # 启动时丢弃超过 max_stale 的报告
+        self._db.execute(
+            "DELETE FROM reports WHERE fetched_at <= ?", (time.time() - self.max_stale,)
+        )
+        self._db.commit()
+        for con_id, report_type, fetched_at in self._db.execute(
+            "SELECT con_id, report_type, fetched_at FROM reports"
+        ):
+            self._index[(con_id, report_type)] = fetched_at
+        logger.info(f"已加载 {len(self._index)} 份缓存基本面报告: {path}")
+
+
+fundamental_cache = FundamentalCache(
+    path=get_settings().FUNDAMENTAL_CACHE_PATH,
+    ttls=get_settings().FUNDAMENTAL_CACHE_TTLS,
+    default_ttl=get_settings().FUNDAMENTAL_CACHE_DEFAULT_TTL,
+    max_stale=get_settings().FUNDAMENTAL_CACHE_MAX_STALE,
+)
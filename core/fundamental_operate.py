@@ -1,15 +1,32 @@
-from ib_async import Stock
-from core import ib
+import asyncio
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+from ib_async import Contract
+from core.contract_cache import qualify_stock
 from core.constant import FundamentalDataType
+from core.fundamental_cache import fundamental_cache
+from core.fundamental_parser import parse_company_snapshot, parse_financial_statements
+from utils.data_convert import format_table
+
+# 内存中保留解析结果的报告数
+PARSED_REPORT_CACHE_SIZE = 64
+_parsed_reports: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+# bundle 可选的报告及对应的报告类型
+BUNDLE_REPORTS: Dict[str, FundamentalDataType] = {
+    "profile": FundamentalDataType.REPORT_SNAPSHOT,
+    "financials": FundamentalDataType.REPORTS_FIN_STATEMENTS,
+    "estimates": FundamentalDataType.RESC,
+    "ownership": FundamentalDataType.REPORTS_OWNERSHIP,
+}
 
 
 async def get_company_profile(symbol: str, exchange: str = "SMART"):
     """获取公司概况"""
-    contract = Stock(symbol, exchange, "USD")
-    await ib.qualifyContractsAsync(contract)
+    contract = await qualify_stock(symbol, exchange)
 
-    profile = await ib.reqFundamentalDataAsync(
-        contract, reportType=FundamentalDataType.REPORT_SNAPSHOT.value
+    profile = await fundamental_cache.get(
+        contract, FundamentalDataType.REPORT_SNAPSHOT.value
     )
 
     return (
@@ -28,11 +45,10 @@ async def get_financial_statements(
     exchange: str = "SMART",
 ):
     """获取财务报表"""
-    contract = Stock(symbol, exchange, "USD")
-    await ib.qualifyContractsAsync(contract)
+    contract = await qualify_stock(symbol, exchange)
 
-    statements = await ib.reqFundamentalDataAsync(
-        contract, reportType=FundamentalDataType.REPORTS_FIN_STATEMENTS.value
+    statements = await fundamental_cache.get(
+        contract, FundamentalDataType.REPORTS_FIN_STATEMENTS.value
     )
 
     return (
@@ -51,11 +67,10 @@ async def get_analyst_estimates(
     exchange: str = "SMART",
 ):
     """获取分析师预测"""
-    contract = Stock(symbol, exchange, "USD")
-    await ib.qualifyContractsAsync(contract)
+    contract = await qualify_stock(symbol, exchange)
 
-    estimates = await ib.reqFundamentalDataAsync(
-        contract, reportType=FundamentalDataType.RESC.value
+    estimates = await fundamental_cache.get(
+        contract, FundamentalDataType.RESC.value
     )
 
     return (
@@ -74,11 +89,10 @@ async def get_ownership_data(
     exchange: str = "SMART",
 ):
     """获取所有权数据"""
-    contract = Stock(symbol, exchange, "USD")
-    await ib.qualifyContractsAsync(contract)
+    contract = await qualify_stock(symbol, exchange)
 
-    ownership = await ib.reqFundamentalDataAsync(
-        contract, reportType=FundamentalDataType.REPORTS_OWNERSHIP.value
+    ownership = await fundamental_cache.get(
+        contract, FundamentalDataType.REPORTS_OWNERSHIP.value
     )
 
     return (
@@ -90,3 +104,121 @@ async def get_ownership_data(
     </ownershipData>""",
         ownership,
     )
+
+
+async def get_fundamental_bundle(
+    symbol: str,
+    exchange: str = "SMART",
+    reports: Optional[Sequence[str]] = None,
+):
+    """一次获取多份基本面报告
+
+    合约只识别一次，各报告并发请求，总耗时取决于最慢的一份；
+    单份报告失败不影响其他报告
+
+    Args:
+        reports: BUNDLE_REPORTS 中的报告名，为空时全部
+
+    Returns:
+        (XML 格式的报告集合, {"reports": {报告名: XML}, "errors": {报告名: 错误信息}})
+    """
+    names = [name.lower() for name in reports] if reports else list(BUNDLE_REPORTS)
+    unknown = [name for name in names if name not in BUNDLE_REPORTS]
+    if unknown:
+        raise ValueError(f"未知的报告: {unknown}，可选: {list(BUNDLE_REPORTS)}")
+    names = list(dict.fromkeys(names))
+
+    contract = await qualify_stock(symbol, exchange)
+    results = await asyncio.gather(
+        *(fundamental_cache.get(contract, BUNDLE_REPORTS[name].value) for name in names),
+        return_exceptions=True,
+    )
+
+    bundle = {"reports": {}, "errors": {}}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            bundle["errors"][name] = str(result)
+        elif not result:
+            bundle["errors"][name] = f"没有 {BUNDLE_REPORTS[name].value} 报告"
+        else:
+            bundle["reports"][name] = result
+
+    sections = "".join(
+        f"""
+        <{name}>{report}</{name}>"""
+        for name, report in bundle["reports"].items()
+    ) + "".join(
+        f"""
+        <error report="{name}">{message}</error>"""
+        for name, message in bundle["errors"].items()
+    )
+    return (
+        f"""<fundamentalBundle symbol="{contract.symbol}">{sections}
+    </fundamentalBundle>""",
+        bundle,
+    )
+
+
+async def get_financial_table(
+    symbol: str,
+    exchange: str = "SMART",
+    statement: Optional[str] = None,
+    period_type: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    items: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+):
+    """获取解析后的财务报表
+
+    Args:
+        statement: INC（利润表）、BAL（资产负债表）、CAS（现金流量表），为空时全部
+        period_type: Annual 或 Interim，为空时全部
+        start, end: 期间截止日期范围（YYYY-MM-DD，含两端）
+        items: 科目代码（coaCode），为空时全部
+        limit: 只保留最近的几个期间
+
+    Returns:
+        (CSV 格式的报表, {"columns": [...], "rows": [[...], ...], "currency": 报告货币})
+    """
+    contract = await qualify_stock(symbol, exchange)
+    statements = await _parsed_report(
+        contract,
+        FundamentalDataType.REPORTS_FIN_STATEMENTS.value,
+        parse_financial_statements,
+    )
+    table = statements.select(statement, period_type, start, end, items, limit)
+    return format_table(table), table
+
+
+async def get_company_snapshot(
+    symbol: str,
+    exchange: str = "SMART",
+    fields: Optional[Sequence[str]] = None,
+) -> dict:
+    """获取解析后的公司快照：概况、财务指标与一致预期，fields 为指标名"""
+    contract = await qualify_stock(symbol, exchange)
+    snapshot = await _parsed_report(
+        contract, FundamentalDataType.REPORT_SNAPSHOT.value, parse_company_snapshot
+    )
+    return snapshot.select(fields)
+
+
+async def _parsed_report(contract: Contract, report_type: str, parser: Callable):
+    """解析缓存的报告，解析结果随缓存报告的获取时间失效"""
+    xml = await fundamental_cache.get(contract, report_type)
+    if not xml:
+        raise ValueError(f"{contract.symbol} 没有 {report_type} 报告")
+    key = (contract.conId, report_type)
+    version = fundamental_cache.fetched_at(*key)
+    cached = _parsed_reports.get(key)
+    if cached is not None and version is not None and cached[0] == version:
+        _parsed_reports.move_to_end(key)
+        return cached[1]
+
+    parsed = await asyncio.to_thread(parser, xml)
+    if version is not None:
+        _parsed_reports[key] = (version, parsed)
+        while len(_parsed_reports) > PARSED_REPORT_CACHE_SIZE:
+            _parsed_reports.popitem(last=False)
+    return parsed
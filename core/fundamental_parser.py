@@ -0,0 +1,276 @@
+import io
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+# 财务报表表格的列
+STATEMENT_COLUMNS = [
+    "statement",
+    "period_type",
+    "end_date",
+    "fiscal_year",
+    "fiscal_period",
+    "item",
+    "name",
+    "value",
+]
+# 快照指标表格的列
+RATIO_COLUMNS = ["group", "field", "value"]
+FORECAST_COLUMNS = ["field", "period_type", "value"]
+
+
+def _iterparse(xml: str) -> Iterator[Tuple[str, ET.Element]]:
+    """逐个元素解析报告，调用方处理完一个元素后应 clear() 以释放内存"""
+    return ET.iterparse(io.BytesIO(xml.encode()), events=("start", "end"))
+
+
+def _float(text: Optional[str]) -> float:
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@dataclass
+class FinancialStatements:
+    """ReportsFinStatements 解析结果
+
+    每个 (报表, 期间, 科目) 一行，各列为定型的 NumPy 数组；
+    按报表类型预先建立行索引，查询只扫描对应报表的行
+    """
+
+    statement: np.ndarray  # INC / BAL / CAS
+    period_type: np.ndarray  # Annual / Interim
+    end_date: np.ndarray  # datetime64[D]
+    fiscal_year: np.ndarray
+    fiscal_period: np.ndarray  # 年报为 0
+    item: np.ndarray  # coaCode
+    value: np.ndarray
+    names: Dict[str, str]  # coaCode -> 科目名称
+    currency: str = ""
+
+    def __post_init__(self):
+        self._index = {
+            statement: np.flatnonzero(self.statement == statement)
+            for statement in np.unique(self.statement)
+        }
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    @property
+    def statements(self) -> List[str]:
+        return sorted(self._index)
+
+    def select(
+        self,
+        statement: Optional[str] = None,
+        period_type: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        items: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+    ) -> dict:
+        """按报表、期间类型、截止日期范围（含两端，YYYY-MM-DD）和科目筛选
+
+        Args:
+            limit: 只保留最近的几个期间
+
+        Returns:
+            {"columns": STATEMENT_COLUMNS, "rows": [[...], ...]}，按报表、期间、科目排序
+        """
+        if statement is not None:
+            rows = self._index.get(statement.upper(), np.empty(0, dtype=np.intp))
+        else:
+            rows = np.arange(len(self))
+        mask = np.ones(len(rows), dtype=bool)
+        if period_type:
+            mask &= self.period_type[rows] == period_type.capitalize()
+        if start:
+            mask &= self.end_date[rows] >= np.datetime64(start, "D")
+        if end:
+            mask &= self.end_date[rows] <= np.datetime64(end, "D")
+        if items:
+            mask &= np.isin(self.item[rows], [item.upper() for item in items])
+        rows = rows[mask]
+        if limit:
+            periods = np.unique(self.end_date[rows])[-limit:]
+            rows = rows[np.isin(self.end_date[rows], periods)]
+        rows = rows[
+            np.lexsort(
+                (
+                    self.item[rows],
+                    self.end_date[rows],
+                    self.period_type[rows],
+                    self.statement[rows],
+                )
+            )
+        ]
+
+        end_dates = np.datetime_as_string(self.end_date[rows], unit="D").tolist()
+        values = self.value[rows]
+        return {
+            "columns": STATEMENT_COLUMNS,
+            "rows": [
+                [statement, period_type, end_date, year, period, item, self.names.get(item), value]
+                for statement, period_type, end_date, year, period, item, value in zip(
+                    self.statement[rows].tolist(),
+                    self.period_type[rows].tolist(),
+                    end_dates,
+                    self.fiscal_year[rows].tolist(),
+                    self.fiscal_period[rows].tolist(),
+                    self.item[rows].tolist(),
+                    np.where(np.isnan(values), None, values).tolist(),
+                )
+            ],
+            "currency": self.currency,
+        }
+
+
+def parse_financial_statements(xml: str) -> FinancialStatements:
+    """用 iterparse 增量解析 ReportsFinStatements，处理完的期间立即释放"""
+    columns: Dict[str, list] = {
+        name: []
+        for name in (
+            "statement",
+            "period_type",
+            "end_date",
+            "fiscal_year",
+            "fiscal_period",
+            "item",
+            "value",
+        )
+    }
+    names: Dict[str, str] = {}
+    currency = ""
+    period: Dict[str, str] = {}
+    statement = ""
+
+    for event, elem in _iterparse(xml):
+        tag = elem.tag
+        if event == "start":
+            if tag == "FiscalPeriod":
+                period = dict(elem.attrib)
+            elif tag == "Statement":
+                statement = elem.get("Type", "")
+            continue
+
+        if tag == "lineItem":
+            columns["statement"].append(statement)
+            columns["period_type"].append(period.get("Type", ""))
+            columns["end_date"].append(period.get("EndDate", "NaT"))
+            columns["fiscal_year"].append(int(period.get("FiscalYear") or 0))
+            columns["fiscal_period"].append(int(period.get("FiscalPeriodNumber") or 0))
+            columns["item"].append(elem.get("coaCode", ""))
+            columns["value"].append(_float(elem.text))
+        elif tag == "mapItem":
+            names[elem.get("coaItem", "")] = (elem.text or "").strip()
+        elif tag == "ReportingCurrency":
+            currency = elem.get("Code", "")
+        elif tag == "FiscalPeriod":
+            elem.clear()
+
+    return FinancialStatements(
+        statement=np.array(columns["statement"], dtype="U3"),
+        period_type=np.array(columns["period_type"], dtype="U8"),
+        end_date=np.array(columns["end_date"], dtype="datetime64[D]"),
+        fiscal_year=np.array(columns["fiscal_year"], dtype="i4"),
+        fiscal_period=np.array(columns["fiscal_period"], dtype="i2"),
+        item=np.array(columns["item"], dtype="U16"),
+        value=np.array(columns["value"], dtype="f8"),
+        names=names,
+        currency=currency,
+    )
+
+
+@dataclass
+class CompanySnapshot:
+    """ReportSnapshot 解析结果：公司概况、财务指标与一致预期"""
+
+    info: Dict[str, object]
+    ratios: Dict[str, Tuple[str, object]]  # FieldName -> (Group, 值)
+    forecasts: List[Tuple[str, str, object]]  # (FieldName, PeriodType, 值)
+
+    def select(self, fields: Optional[Sequence[str]] = None) -> dict:
+        """按指标名筛选（忽略大小写），fields 为空时返回全部"""
+        wanted = {field.upper() for field in fields} if fields else None
+        return {
+            "info": self.info,
+            "ratios": {
+                "columns": RATIO_COLUMNS,
+                "rows": [
+                    [group, field, value]
+                    for field, (group, value) in self.ratios.items()
+                    if wanted is None or field.upper() in wanted
+                ],
+            },
+            "forecasts": {
+                "columns": FORECAST_COLUMNS,
+                "rows": [
+                    list(row)
+                    for row in self.forecasts
+                    if wanted is None or row[0].upper() in wanted
+                ],
+            },
+        }
+
+
+def _typed(value: Optional[str], ratio_type: str):
+    # Ratio Type：N 数值、D 日期、S 字符串
+    if ratio_type == "N":
+        number = _float(value)
+        return None if np.isnan(number) else number
+    return (value or "").strip() or None
+
+
+def parse_company_snapshot(xml: str) -> CompanySnapshot:
+    """用 iterparse 增量解析 ReportSnapshot，跳过大段的业务描述文本"""
+    info: Dict[str, object] = {}
+    ratios: Dict[str, Tuple[str, object]] = {}
+    forecasts: List[Tuple[str, str, object]] = []
+    group = ""
+    forecast = False
+    forecast_field = ("", "N")
+
+    for event, elem in _iterparse(xml):
+        tag = elem.tag
+        if event == "start":
+            if tag == "Group":
+                group = elem.get("ID", "")
+            elif tag == "ForecastData":
+                forecast = True
+            elif tag == "Ratio" and forecast:
+                forecast_field = (elem.get("FieldName", ""), elem.get("Type", "N"))
+            continue
+
+        if tag == "Ratio":
+            if not forecast:
+                ratios[elem.get("FieldName", "")] = (
+                    group,
+                    _typed(elem.text, elem.get("Type", "N")),
+                )
+            elem.clear()
+        elif tag == "Value" and forecast:
+            field, ratio_type = forecast_field
+            forecasts.append((field, elem.get("PeriodType", ""), _typed(elem.text, ratio_type)))
+        elif tag == "CoID":
+            info[elem.get("Type", "")] = (elem.text or "").strip()
+        elif tag == "Employees":
+            info["Employees"] = _typed(elem.text, "N")
+        elif tag == "SharesOut":
+            info["SharesOut"] = _typed(elem.text, "N")
+            info["TotalFloat"] = _typed(elem.get("TotalFloat"), "N")
+        elif tag in ("LatestAvailableAnnual", "LatestAvailableInterim"):
+            info[tag] = (elem.text or "").strip()
+        elif tag == "ReportingCurrency":
+            info["ReportingCurrency"] = elem.get("Code", "")
+        elif tag == "Industry" and elem.get("type") == "TRBC":
+            info.setdefault("Industry", (elem.text or "").strip())
+        elif tag == "ForecastData":
+            forecast = False
+            elem.clear()
+        elif tag == "TextInfo":
+            elem.clear()
+
+    return CompanySnapshot(info=info, ratios=ratios, forecasts=forecasts)
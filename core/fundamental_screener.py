@@ -0,0 +1,371 @@
+import ast
+import asyncio
+import operator
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from ib_async import Contract
+from core import ib
+from core.config import get_settings
+from core.constant import FundamentalDataType
+from core.contract_cache import qualify_stocks
+from core.fundamental_cache import fundamental_cache
+from core.fundamental_parser import CompanySnapshot, parse_company_snapshot
+from utils.logger import logger
+
+# 预取时每批识别的合约数
+QUALIFY_BATCH_SIZE = 50
+
+_COMPARE_OPS: Dict[type, Callable] = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+_BINARY_OPS: Dict[type, Callable] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+}
+
+
+class UniverseTable:
+    """股票池基本面指标的列式表
+
+    每个指标一列 float64（缺失为 NaN），按行号存储各标的；
+    筛选表达式直接在整列上做向量化比较，不逐个标的求值
+    """
+
+    def __init__(self, metrics: Sequence[str]):
+        self.metrics = [metric.lower() for metric in metrics]
+        self._columns = {metric: i for i, metric in enumerate(self.metrics)}
+        self._rows: Dict[str, int] = {}
+        self._symbols = np.empty(0, dtype=object)
+        self._data = np.empty((len(self.metrics), 0))
+        self._updated = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def symbols(self) -> np.ndarray:
+        return self._symbols[: len(self)]
+
+    def column(self, metric: str) -> np.ndarray:
+        """某个指标的整列（只读视图）"""
+        i = self._columns.get(metric.lower())
+        if i is None:
+            raise ValueError(f"未知的筛选字段: {metric}，可选: {self.metrics}")
+        column = self._data[i, : len(self)]
+        column.flags.writeable = False
+        return column
+
+    def upsert(self, symbol: str, values: Dict[str, float], updated: Optional[float] = None):
+        """写入一个标的的指标，未给出的指标为 NaN"""
+        symbol = symbol.upper()
+        row = self._rows.get(symbol)
+        if row is None:
+            row = len(self)
+            if row == len(self._symbols):
+                self._grow(max(64, row * 2))
+            self._rows[symbol] = row
+            self._symbols[row] = symbol
+        self._data[:, row] = [values.get(metric, np.nan) for metric in self.metrics]
+        self._updated[row] = time.time() if updated is None else updated
+
+    def screen(
+        self,
+        expression: Optional[str] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """按表达式筛选，如 "pe < 15 and revenue_growth > 10"
+
+        Args:
+            sort: 排序字段，前缀 "-" 表示降序，NaN 排在最后
+            limit: 最多返回的行数
+            columns: 返回的指标，为空时全部
+
+        Returns:
+            {"columns": ["symbol", ...], "rows": [[...], ...], "matched": 匹配数}
+        """
+        rows = np.arange(len(self))
+        if expression:
+            rows = rows[evaluate_filter(expression, self.column)]
+        if sort:
+            descending = sort.startswith("-")
+            values = self.column(sort.lstrip("-"))[rows]
+            order = np.argsort(-values if descending else values, kind="stable")
+            rows = rows[order]
+        matched = len(rows)
+        if limit:
+            rows = rows[:limit]
+
+        metrics = [metric.lower() for metric in columns] if columns else self.metrics
+        data = np.empty((len(metrics), len(rows)))
+        for i, metric in enumerate(metrics):
+            data[i] = self.column(metric)[rows]
+        values = np.where(np.isnan(data.T), None, data.T).tolist()
+        return {
+            "columns": ["symbol", *metrics],
+            "rows": [[symbol, *row] for symbol, row in zip(self._symbols[rows].tolist(), values)],
+            "matched": matched,
+        }
+
+    def stats(self) -> dict:
+        updated = self._updated[: len(self)]
+        return {
+            "symbols": len(self),
+            "metrics": self.metrics,
+            "oldest_update": float(updated.min()) if len(updated) else None,
+            "newest_update": float(updated.max()) if len(updated) else None,
+        }
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        n = len(self)
+        np.savez(
+            path,
+            symbols=self._symbols[:n].astype(str),
+            metrics=np.array(self.metrics),
+            data=self._data[:, :n],
+            updated=self._updated[:n],
+        )
+
+    def load(self, path: str):
+        """加载已保存的表，按指标名对齐列，配置中新增的指标为 NaN"""
+        if not Path(path).exists():
+            return
+        with np.load(path) as saved:
+            columns = {metric: i for i, metric in enumerate(saved["metrics"].tolist())}
+            data, updated = saved["data"], saved["updated"]
+            for row, symbol in enumerate(saved["symbols"].tolist()):
+                self.upsert(
+                    symbol,
+                    {
+                        metric: data[columns[metric], row]
+                        for metric in self.metrics
+                        if metric in columns
+                    },
+                    updated[row],
+                )
+        logger.info(f"已加载 {len(self)} 个标的的基本面指标: {path}")
+
+    def _grow(self, capacity: int):
+        n = len(self)
+        symbols = np.empty(capacity, dtype=object)
+        symbols[:n] = self._symbols[:n]
+        data = np.full((len(self.metrics), capacity), np.nan)
+        data[:, :n] = self._data[:, :n]
+        updated = np.zeros(capacity)
+        updated[:n] = self._updated[:n]
+        self._symbols, self._data, self._updated = symbols, data, updated
+
+
+def evaluate_filter(expression: str, column: Callable[[str], np.ndarray]) -> np.ndarray:
+    """在整列上求值筛选表达式，返回布尔掩码
+
+    支持比较（含连写，如 0 < pe < 15）、and/or/not、& | 与四则运算；
+    字段名由 column 解析为整列数组，与 NaN 的比较结果为 False
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"无效的筛选表达式: {expression}") from e
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Name):
+            return column(node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = visit(node.values[0])
+            for value in node.values[1:]:
+                result = combine(result, visit(value))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return np.logical_not(visit(node.operand))
+            if isinstance(node.op, ast.USub):
+                return -visit(node.operand)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return _BINARY_OPS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+            left = visit(node.left)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = visit(comparator)
+                result = np.logical_and(result, _COMPARE_OPS[type(op)](left, right))
+                left = right
+            return result
+        raise ValueError(f"筛选表达式不支持: {ast.unparse(node)}")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mask = visit(tree)
+    if np.ndim(mask) == 0:
+        raise ValueError(f"筛选表达式必须包含字段比较: {expression}")
+    return np.asarray(mask, dtype=bool)
+
+
+def snapshot_metrics(snapshot: CompanySnapshot, metrics: Dict[str, str]) -> Dict[str, float]:
+    """从公司快照中取出数值指标，预期数据取当前期（CURR）"""
+    forecasts = {
+        field: value for field, period_type, value in snapshot.forecasts if period_type == "CURR"
+    }
+    values = {}
+    for name, field in metrics.items():
+        value = snapshot.ratios[field][1] if field in snapshot.ratios else forecasts.get(field)
+        if isinstance(value, (int, float)):
+            values[name.lower()] = float(value)
+    return values
+
+
+class UniversePrefetcher:
+    """股票池基本面预取任务
+
+    分批识别合约后，以有限并发经过基本面缓存获取 ReportSnapshot，
+    解析出关键指标写入 UniverseTable；需要向 IB 请求的报告之间至少间隔 pacing 秒，
+    缓存中未过期的报告不计入节流。过期报告在并发与节流限制内等待重新获取，
+    不使用缓存的旧版本，因此表中的指标总是来自本轮获取的有效报告
+    """
+
+    def __init__(
+        self,
+        table: UniverseTable,
+        metrics: Dict[str, str],
+        path: Optional[str],
+        concurrency: int,
+        pacing: float,
+        interval: float,
+    ):
+        self.table = table
+        self.metrics = metrics
+        self.path = path
+        self.concurrency = concurrency
+        self.pacing = pacing
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._next_request = 0.0
+        self._pace_lock: Optional[asyncio.Lock] = None
+        self._progress: dict = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, symbols: Sequence[str], repeat: bool = False) -> bool:
+        """在后台开始预取，已在运行时返回 False
+
+        Args:
+            repeat: 完成后每隔 interval 秒重新预取
+        """
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self._loop(list(symbols), repeat))
+        return True
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+
+    def status(self) -> dict:
+        return {"running": self.running, **self._progress}
+
+    async def run(self, symbols: Sequence[str]):
+        """预取一遍股票池，单个标的失败只记录不中断"""
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        self._pace_lock = asyncio.Lock()
+        self._progress = {
+            "total": len(symbols),
+            "completed": 0,
+            "failed": 0,
+            "started_at": time.time(),
+            "finished_at": None,
+        }
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def prefetch(contract: Contract):
+            async with semaphore:
+                try:
+                    await self._prefetch(contract)
+                    self._progress["completed"] += 1
+                except Exception as e:
+                    self._progress["failed"] += 1
+                    logger.warning(f"预取基本面失败: {contract.symbol} {str(e)}")
+
+        try:
+            for i in range(0, len(symbols), QUALIFY_BATCH_SIZE):
+                batch = symbols[i : i + QUALIFY_BATCH_SIZE]
+                contracts = await qualify_stocks(batch)
+                unknown = [contract for contract in contracts if not contract.conId]
+                self._progress["failed"] += len(unknown)
+                await asyncio.gather(
+                    *(prefetch(contract) for contract in contracts if contract.conId)
+                )
+        finally:
+            self._progress["finished_at"] = time.time()
+            if self.path:
+                self.table.save(self.path)
+        logger.info(
+            f"基本面预取完成: {self._progress['completed']}/{len(symbols)}，失败 {self._progress['failed']}"
+        )
+
+    async def _prefetch(self, contract: Contract):
+        report_type = FundamentalDataType.REPORT_SNAPSHOT.value
+        if not fundamental_cache.is_fresh(contract.conId, report_type):
+            await self._pace()
+        xml = await fundamental_cache.get(contract, report_type, allow_stale=False)
+        if not xml:
+            raise ValueError(f"没有 {report_type} 报告")
+        snapshot = await asyncio.to_thread(parse_company_snapshot, xml)
+        self.table.upsert(contract.symbol, snapshot_metrics(snapshot, self.metrics))
+
+    async def _pace(self):
+        async with self._pace_lock:
+            wait = self._next_request - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request = time.monotonic() + self.pacing
+
+    async def _loop(self, symbols: List[str], repeat: bool):
+        while True:
+            try:
+                await self.run(symbols)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"基本面预取中断: {str(e)}")
+            if not repeat or self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    def _on_connected(self):
+        symbols = get_settings().SCREENER_UNIVERSE
+        if symbols and self.interval > 0:
+            self.start(symbols, repeat=True)
+
+
+universe_table = UniverseTable(get_settings().SCREENER_METRICS)
+if get_settings().SCREENER_TABLE_PATH:
+    universe_table.load(get_settings().SCREENER_TABLE_PATH)
+
+universe_prefetcher = UniversePrefetcher(
+    universe_table,
+    metrics=get_settings().SCREENER_METRICS,
+    path=get_settings().SCREENER_TABLE_PATH,
+    concurrency=get_settings().SCREENER_PREFETCH_CONCURRENCY,
+    pacing=get_settings().SCREENER_PREFETCH_PACING,
+    interval=get_settings().SCREENER_PREFETCH_INTERVAL,
+)
+ib.connectedEvent += universe_prefetcher._on_connected
+ib.disconnectedEvent += universe_prefetcher.stop
@@ -0,0 +1,280 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from ib_async import BarData, Contract
+from core import ib
+from core.config import get_settings
+from utils.logger import logger
+
+RequestKey = Tuple[int, Tuple[Tuple[str, Any], ...]]
+
+# 请求优先级，数值越小越先发出
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKFILL = 10
+
+# endDateTime 距当前时间在该秒数以内时视为 "当前时间"
+NOW_TOLERANCE = 5.0
+
+# 保留的请求错误条数上限（errorEvent 也会推送与历史数据无关的错误）
+MAX_RECORDED_ERRORS = 1000
+
+
+class HistoricalDataError(Exception):
+    """历史数据请求失败（请求错误、节流违规或超时）"""
+
+
+class RateWindow:
+    """滑动窗口限流：任意 period 秒内最多发出 limit 个请求"""
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self._sent: Deque[float] = deque()
+
+    def delay(self, now: float) -> float:
+        """距离下一个请求可以发出还需等待的秒数"""
+        while self._sent and now - self._sent[0] >= self.period:
+            self._sent.popleft()
+        if len(self._sent) < self.limit:
+            return 0.0
+        return self._sent[0] + self.period - now
+
+    def record(self, now: float):
+        self._sent.append(now)
+
+    def __len__(self) -> int:
+        return len(self._sent)
+
+
+def _normalize_end(params: dict) -> dict:
+    """截至当前时间的请求统一以空 endDateTime（IB 表示当前时间）发出
+
+    否则每次解析出的当前时间都不同，相同的交互式请求无法合并或复用结果
+    """
+    end = params.get("endDateTime")
+    if isinstance(end, datetime) and end.timestamp() < time.time() - NOW_TOLERANCE:
+        return params
+    if end is None or end == "" or isinstance(end, datetime):
+        return {**params, "endDateTime": ""}
+    return params
+
+
+@dataclass(order=True)
+class _PendingRequest:
+    priority: int
+    seq: int
+    key: RequestKey = field(compare=False)
+    contract: Contract = field(compare=False)
+    params: dict = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class HistoryScheduler:
+    """历史数据请求调度器
+
+    所有 reqHistoricalDataAsync 调用都经过这里，以遵守 IB 的节流规则：
+    - 任意 window 秒内最多 max_requests 个请求
+    - 同一合约、同一数据类型在 contract_window 秒内最多 contract_max_requests 个请求
+    - 同时进行中的请求不超过 max_concurrent 个
+    - identical_interval 秒内的相同请求直接复用上次结果，进行中的相同请求合并等待
+    排队请求按 priority 从小到大发出，相同优先级先到先发。
+    RaiseRequestErrors 关闭时 IB 的请求错误和超时都以空结果返回，
+    这里结合 errorEvent 与耗时识别出来，改为抛出 HistoricalDataError
+    """
+
+    def __init__(
+        self,
+        max_requests: int,
+        window: float,
+        max_concurrent: int,
+        identical_interval: float,
+        contract_max_requests: int,
+        contract_window: float,
+        request_timeout: float = 60.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.request_timeout = request_timeout
+        self.identical_interval = identical_interval
+        self._global = RateWindow(max_requests, window)
+        self._contract_limit = (contract_max_requests, contract_window)
+        self._per_contract: Dict[Tuple[int, str], RateWindow] = {}
+        self._queue: List[_PendingRequest] = []
+        self._inflight: Dict[RequestKey, asyncio.Future] = {}
+        self._recent: Dict[RequestKey, Tuple[float, List[BarData]]] = {}
+        # reqId -> (errorCode, errorString)，用于识别以空结果结束的失败请求
+        self._errors: Dict[int, Tuple[int, str]] = {}
+        self._seq = itertools.count()
+        self._active = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        # 统计
+        self._sent = 0
+        self._coalesced = 0
+        self._reused = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def request(
+        self, contract: Contract, priority: int = PRIORITY_INTERACTIVE, **params
+    ) -> List[BarData]:
+        """排队发出一个历史数据请求，params 与 reqHistoricalDataAsync 的参数相同"""
+        params = _normalize_end(params)
+        key = (contract.conId, tuple(sorted(params.items())))
+
+        recent = self._recent.get(key)
+        if recent and time.monotonic() - recent[0] < self.identical_interval:
+            self._reused += 1
+            return recent[1]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        heapq.heappush(
+            self._queue,
+            _PendingRequest(
+                priority, next(self._seq), key, contract, params, future, time.monotonic()
+            ),
+        )
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        """调度统计信息"""
+        return {
+            "queue_depth": len(self._queue),
+            "in_flight": self._active,
+            "sent": self._sent,
+            "sent_in_window": len(self._global),
+            "max_requests": self._global.limit,
+            "coalesced": self._coalesced,
+            "reused": self._reused,
+            "avg_wait": self._total_wait / self._sent if self._sent else 0.0,
+            "max_wait": self._max_wait,
+        }
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while self._queue:
+            self._wakeup.clear()
+            if self._active >= self.max_concurrent:
+                await self._wakeup.wait()
+                continue
+
+            item, delay = self._next_ready(time.monotonic())
+            if item is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.monotonic()
+            self._global.record(now)
+            self._contract_window(item).record(now)
+            wait = now - item.enqueued_at
+            self._sent += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._active += 1
+            asyncio.create_task(self._run(item))
+
+    def _next_ready(self, now: float) -> Tuple[Optional[_PendingRequest], float]:
+        """按优先级找出第一个可以发出的请求，没有时返回最短等待时间
+
+        依次从堆顶弹出，所属合约仍在节流中的请求暂时放在一边，找到后再放回堆中
+        """
+        global_delay = self._global.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        deferred: List[_PendingRequest] = []
+        ready = None
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            if self._contract_window(item).delay(now) <= 0:
+                ready = item
+                break
+            deferred.append(item)
+        for item in deferred:
+            heapq.heappush(self._queue, item)
+        if ready is not None:
+            return ready, 0.0
+        return None, min(self._contract_window(item).delay(now) for item in deferred)
+
+    def _contract_window(self, item: _PendingRequest) -> RateWindow:
+        what_to_show = item.params.get("whatToShow", "")
+        key = (item.contract.conId, what_to_show)
+        if key not in self._per_contract:
+            self._per_contract[key] = RateWindow(*self._contract_limit)
+        return self._per_contract[key]
+
+    async def _run(self, item: _PendingRequest):
+        try:
+            started = time.monotonic()
+            bars = await ib.reqHistoricalDataAsync(
+                item.contract, **item.params, timeout=self.request_timeout
+            )
+            self._check_result(bars, time.monotonic() - started)
+            self._recent[item.key] = (time.monotonic(), bars)
+            item.future.set_result(bars)
+        except Exception as e:
+            logger.error(f"历史数据请求失败: {item.contract.symbol} {str(e)}")
+            item.future.set_exception(e)
+        finally:
+            self._active -= 1
+            self._inflight.pop(item.key, None)
+            self._prune_recent()
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _check_result(self, bars: List[BarData], elapsed: float):
+        """空结果是请求失败还是区间内确实没有数据"""
+        error = self._errors.pop(getattr(bars, "reqId", None), None)
+        if error is not None:
+            code, message = error
+            # 162 "HMDS query returned no data" 表示区间内没有K线，属于正常的空结果
+            if "no data" not in message.lower():
+                raise HistoricalDataError(f"Error {code}: {message}")
+        if not bars and self.request_timeout and elapsed >= self.request_timeout:
+            raise HistoricalDataError(f"请求超时（{self.request_timeout} 秒）")
+
+    def _on_error(self, req_id: int, error_code: int, error_string: str, contract):
+        if req_id <= 0:
+            return
+        self._errors[req_id] = (error_code, error_string)
+        if len(self._errors) > MAX_RECORDED_ERRORS:
+            del self._errors[next(iter(self._errors))]
+
+    def _prune_recent(self):
+        now = time.monotonic()
+        self._recent = {
+            key: value
+            for key, value in self._recent.items()
+            if now - value[0] < self.identical_interval
+        }
+
+
+history_scheduler = HistoryScheduler(
+    max_requests=get_settings().HISTORY_MAX_REQUESTS,
+    window=get_settings().HISTORY_REQUEST_WINDOW,
+    max_concurrent=get_settings().HISTORY_MAX_CONCURRENT,
+    identical_interval=get_settings().HISTORY_IDENTICAL_INTERVAL,
+    contract_max_requests=get_settings().HISTORY_CONTRACT_MAX_REQUESTS,
+    contract_window=get_settings().HISTORY_CONTRACT_WINDOW,
+    request_timeout=get_settings().HISTORY_REQUEST_TIMEOUT,
+)
+ib.errorEvent += history_scheduler._on_error
@@ -0,0 +1,328 @@
+import math
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Deque, Dict, Hashable, Optional
+import numpy as np
+import pandas as pd
+from core.config import get_settings
+
+# 指标输出的列
+INDICATOR_COLUMNS = [
+    "time",
+    "close",
+    "sma",
+    "ema",
+    "rsi",
+    "atr",
+    "vwap",
+    "bb_upper",
+    "bb_lower",
+    "macd",
+    "macd_signal",
+    "macd_hist",
+]
+
+
+@dataclass(frozen=True)
+class IndicatorParams:
+    period: int = 20  # SMA、EMA、布林带周期
+    band_width: float = 2.0  # 布林带标准差倍数
+    rsi_period: int = 14
+    atr_period: int = 14
+    macd_fast: int = 12
+    macd_slow: int = 26
+    macd_signal: int = 9
+
+
+@dataclass
+class _State:
+    """逐根更新所需的全部状态，每根K线 O(1) 推进"""
+
+    count: int = 0
+    last_time: int = 0
+    window: Deque[float] = field(default_factory=deque)
+    win_sum: float = 0.0
+    win_sumsq: float = 0.0
+    ema: float = math.nan
+    prev_close: float = math.nan
+    avg_gain: float = math.nan
+    avg_loss: float = math.nan
+    atr: float = math.nan
+    macd_fast: float = math.nan
+    macd_slow: float = math.nan
+    macd_signal: float = math.nan
+    vwap_day: int = -1
+    cum_pv: float = 0.0
+    cum_volume: float = 0.0
+
+
+def compute_indicators(bars: np.ndarray, params: IndicatorParams) -> Dict[str, np.ndarray]:
+    """对整段K线向量化计算全部指标
+
+    EMA 类指标使用 adjust=False 的递推形式（RSI、ATR 为 Wilder 平滑），
+    与 IndicatorEngine 的逐根更新结果一致；预热期内的值为 NaN
+    """
+    close = pd.Series(bars["close"], dtype="f8")
+    high = pd.Series(bars["high"], dtype="f8")
+    low = pd.Series(bars["low"], dtype="f8")
+    volume = pd.Series(bars["volume"], dtype="f8")
+    count = np.arange(1, len(bars) + 1)
+    p = params
+
+    sma = close.rolling(p.period).mean()
+    std = close.rolling(p.period).std(ddof=0)
+    ema = close.ewm(span=p.period, adjust=False).mean()
+
+    change = close.diff()
+    avg_gain = change.clip(lower=0).ewm(alpha=1 / p.rsi_period, adjust=False).mean()
+    avg_loss = (-change).clip(lower=0).ewm(alpha=1 / p.rsi_period, adjust=False).mean()
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = rsi.where(avg_loss > 0, 100.0)
+
+    prev_close = close.shift()
+    true_range = pd.concat(
+        [high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1
+    ).max(axis=1)
+    atr = true_range.ewm(alpha=1 / p.atr_period, adjust=False).mean()
+
+    fast = close.ewm(span=p.macd_fast, adjust=False).mean()
+    slow = close.ewm(span=p.macd_slow, adjust=False).mean()
+    macd = fast - slow
+    signal = macd.ewm(span=p.macd_signal, adjust=False).mean()
+
+    day = bars["time"] // 86400
+    turnover = (high + low + close) / 3 * volume
+    cum_pv = turnover.groupby(day).cumsum()
+    cum_volume = volume.groupby(day).cumsum()
+    vwap = (cum_pv / cum_volume).where(cum_volume > 0, (high + low + close) / 3)
+
+    def warm(series: pd.Series, bars_needed: int) -> np.ndarray:
+        return np.where(count >= bars_needed, series.to_numpy(), np.nan)
+
+    return {
+        "time": np.asarray(bars["time"]),
+        "close": close.to_numpy(),
+        "sma": warm(sma, p.period),
+        "ema": warm(ema, p.period),
+        "rsi": warm(rsi, p.rsi_period + 1),
+        "atr": warm(atr, p.atr_period),
+        "vwap": vwap.to_numpy(),
+        "bb_upper": warm(sma + p.band_width * std, p.period),
+        "bb_lower": warm(sma - p.band_width * std, p.period),
+        "macd": warm(macd, p.macd_slow),
+        "macd_signal": warm(signal, p.macd_slow + p.macd_signal - 1),
+        "macd_hist": warm(macd - signal, p.macd_slow + p.macd_signal - 1),
+        # 供 IndicatorEngine 接续的未屏蔽递推值
+        "_ema": ema.to_numpy(),
+        "_avg_gain": avg_gain.to_numpy(),
+        "_avg_loss": avg_loss.to_numpy(),
+        "_atr": atr.to_numpy(),
+        "_macd_fast": fast.to_numpy(),
+        "_macd_slow": slow.to_numpy(),
+        "_macd_signal": signal.to_numpy(),
+        "_cum_pv": cum_pv.to_numpy(),
+        "_cum_volume": cum_volume.to_numpy(),
+    }
+
+
+class IndicatorEngine:
+    """技术指标引擎
+
+    首次用整段K线向量化计算，之后每根新K线只做 O(1) 的递推更新；
+    尚未走完的最新K线用 preview 计算，不写入状态。
+    输出只保留最近 max_rows 行，长期缓存的引擎内存占用不随K线数增长
+    """
+
+    def __init__(self, params: IndicatorParams = IndicatorParams(), max_rows: int = 5000):
+        self.params = params
+        self.max_rows = max_rows
+        self._state = _State(window=deque(maxlen=params.period))
+        self._columns: Dict[str, Deque] = {
+            name: deque(maxlen=max_rows) for name in INDICATOR_COLUMNS
+        }
+
+    @classmethod
+    def from_bars(
+        cls,
+        bars: np.ndarray,
+        params: IndicatorParams = IndicatorParams(),
+        max_rows: int = 5000,
+    ) -> "IndicatorEngine":
+        """用一段已完成的K线初始化引擎"""
+        engine = cls(params, max_rows)
+        if not len(bars):
+            return engine
+        values = compute_indicators(bars, params)
+        for name in INDICATOR_COLUMNS:
+            engine._columns[name].extend(values[name][-max_rows:].tolist())
+
+        s = engine._state
+        s.count = len(bars)
+        s.last_time = int(bars["time"][-1])
+        s.window.extend(float(c) for c in bars["close"][-params.period :])
+        s.win_sum = math.fsum(s.window)
+        s.win_sumsq = math.fsum(c * c for c in s.window)
+        s.prev_close = float(bars["close"][-1])
+        for name in (
+            "ema",
+            "avg_gain",
+            "avg_loss",
+            "atr",
+            "macd_fast",
+            "macd_slow",
+            "macd_signal",
+            "cum_pv",
+            "cum_volume",
+        ):
+            setattr(s, name, float(values[f"_{name}"][-1]))
+        s.vwap_day = int(bars["time"][-1]) // 86400
+        return engine
+
+    @property
+    def last_time(self) -> int:
+        return self._state.last_time
+
+    def update(self, bar) -> dict:
+        """写入一根已完成的K线，返回该K线的指标值"""
+        values = self._advance(bar, commit=True)
+        for name in INDICATOR_COLUMNS:
+            self._columns[name].append(values[name])
+        return values
+
+    def preview(self, bar) -> dict:
+        """计算一根未完成K线的指标值，不改变状态"""
+        return self._advance(bar, commit=False)
+
+    def tail(self, n: int, pending=None) -> Dict[str, list]:
+        """最近 n 行指标（最多 max_rows 行），pending 为尚未走完的最新K线"""
+        n = min(n, self.max_rows)
+        rows = {
+            name: list(islice(values, max(len(values) - n, 0), None))
+            for name, values in self._columns.items()
+        }
+        if pending is not None and n:
+            preview = self.preview(pending)
+            for name in INDICATOR_COLUMNS:
+                rows[name] = (rows[name] + [preview[name]])[-n:]
+        return rows
+
+    def _advance(self, bar, commit: bool) -> dict:
+        s, p = self._state, self.params
+        t = int(bar["time"])
+        close, high, low = float(bar["close"]), float(bar["high"]), float(bar["low"])
+        volume = float(bar["volume"])
+        count = s.count + 1
+
+        # SMA 与布林带：滑动窗口的和与平方和
+        dropped = s.window[0] if len(s.window) == p.period else 0.0
+        win_sum = s.win_sum + close - dropped
+        win_sumsq = s.win_sumsq + close * close - dropped * dropped
+        sma = win_sum / p.period if count >= p.period else math.nan
+        std = math.sqrt(max(win_sumsq / p.period - sma * sma, 0.0)) if count >= p.period else math.nan
+
+        ema = _ema(s.ema, close, 2 / (p.period + 1))
+
+        # RSI / ATR：Wilder 平滑
+        if math.isnan(s.prev_close):
+            avg_gain, avg_loss, true_range = s.avg_gain, s.avg_loss, high - low
+        else:
+            change = close - s.prev_close
+            avg_gain = _ema(s.avg_gain, max(change, 0.0), 1 / p.rsi_period)
+            avg_loss = _ema(s.avg_loss, max(-change, 0.0), 1 / p.rsi_period)
+            true_range = max(high - low, abs(high - s.prev_close), abs(low - s.prev_close))
+        if math.isnan(avg_loss):
+            rsi = math.nan
+        elif avg_loss > 0:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        else:
+            rsi = 100.0
+        atr = _ema(s.atr, true_range, 1 / p.atr_period)
+
+        macd_fast = _ema(s.macd_fast, close, 2 / (p.macd_fast + 1))
+        macd_slow = _ema(s.macd_slow, close, 2 / (p.macd_slow + 1))
+        macd = macd_fast - macd_slow
+        macd_signal = _ema(s.macd_signal, macd, 2 / (p.macd_signal + 1))
+
+        # VWAP 按 UTC 日重置
+        day = t // 86400
+        typical = (high + low + close) / 3
+        cum_pv = (s.cum_pv if day == s.vwap_day else 0.0) + typical * volume
+        cum_volume = (s.cum_volume if day == s.vwap_day else 0.0) + volume
+        vwap = cum_pv / cum_volume if cum_volume > 0 else typical
+
+        signal_ready = count >= p.macd_slow + p.macd_signal - 1
+        values = {
+            "time": t,
+            "close": close,
+            "sma": sma,
+            "ema": ema if count >= p.period else math.nan,
+            "rsi": rsi if count >= p.rsi_period + 1 else math.nan,
+            "atr": atr if count >= p.atr_period else math.nan,
+            "vwap": vwap,
+            "bb_upper": sma + p.band_width * std,
+            "bb_lower": sma - p.band_width * std,
+            "macd": macd if count >= p.macd_slow else math.nan,
+            "macd_signal": macd_signal if signal_ready else math.nan,
+            "macd_hist": macd - macd_signal if signal_ready else math.nan,
+        }
+
+        if commit:
+            s.count, s.last_time = count, t
+            s.window.append(close)
+            s.win_sum, s.win_sumsq = win_sum, win_sumsq
+            s.ema, s.prev_close = ema, close
+            s.avg_gain, s.avg_loss, s.atr = avg_gain, avg_loss, atr
+            s.macd_fast, s.macd_slow, s.macd_signal = macd_fast, macd_slow, macd_signal
+            s.vwap_day, s.cum_pv, s.cum_volume = day, cum_pv, cum_volume
+        return values
+
+
+def _ema(previous: float, value: float, alpha: float) -> float:
+    if math.isnan(previous):
+        return value
+    return previous + alpha * (value - previous)
+
+
+class IndicatorCache:
+    """按序列缓存指标引擎，新请求只推进新增的K线
+
+    最多保留 max_engines 个引擎，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, max_rows: int = 5000, max_engines: int = 256):
+        self.max_rows = max_rows
+        self.max_engines = max_engines
+        self._engines: "OrderedDict[Hashable, IndicatorEngine]" = OrderedDict()
+
+    def sync(
+        self, key: Hashable, bars: np.ndarray, params: IndicatorParams = IndicatorParams()
+    ) -> Optional[IndicatorEngine]:
+        """让缓存的引擎追上 bars（最后一根视为未完成，不写入状态）"""
+        if not len(bars):
+            return None
+        cache_key = (key, params)
+        engine = self._engines.get(cache_key)
+        times = bars["time"]
+        # 无缓存、出现缺口或窗口回退时重新计算
+        if (
+            engine is None
+            or engine.last_time < times[0]
+            or engine.last_time >= times[-1]
+        ):
+            engine = IndicatorEngine.from_bars(bars[:-1], params, self.max_rows)
+            self._engines[cache_key] = engine
+        else:
+            start = int(np.searchsorted(times, engine.last_time, side="right"))
+            for bar in bars[start:-1]:
+                engine.update(bar)
+        self._engines.move_to_end(cache_key)
+        while len(self._engines) > self.max_engines:
+            self._engines.popitem(last=False)
+        return engine
+
+
+indicator_cache = IndicatorCache(
+    max_rows=get_settings().INDICATOR_MAX_ROWS,
+    max_engines=get_settings().INDICATOR_MAX_ENGINES,
+)
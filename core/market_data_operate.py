@@ -1,20 +1,181 @@
-from ib_async import Stock
-from core import ib
-from typing import Optional
+import asyncio
+import io
+import json
+import math
+import numpy as np
+import pandas as pd
+from ib_async import Contract, Option, Ticker
+from core import black_scholes
+from core.bar_store import load_bars, backfill_bars, stream_bars, array_to_bars
+from core.config import get_settings
+from core.contract_cache import contract_cache, qualify_stock, qualify_stocks
+from core.history_scheduler import PRIORITY_BACKFILL
+from core.market_depth import depth_cache
+from core.indicators import INDICATOR_COLUMNS, IndicatorParams, indicator_cache
+from core.option_chain import (
+    TRADING_TZ,
+    pick_chain,
+    sec_def_cache,
+    select_expirations,
+    select_strikes,
+)
+from core.tick_recorder import TICK_KINDS, tick_recorder
+from core.quote_cache import quote_cache, wait_for_quote, QuoteLinesExhausted
+from utils.data_convert import format_table
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
 from datetime import datetime, timezone
 
+# 默认需要就绪的报价字段
+QUOTE_FIELDS = ("bid", "ask", "last")
+# 列式/CSV 历史数据的列
+HISTORY_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+# 期权需要就绪的报价字段
+OPTION_FIELDS = ("bid", "ask", "modelGreeks")
+# 期权报价表的列
+OPTION_TABLE_COLUMNS = [
+    "expiry",
+    "strike",
+    "right",
+    "bid",
+    "ask",
+    "last",
+    "iv",
+    "delta",
+    "gamma",
+    "vega",
+    "theta",
+    "und_price",
+    "status",
+]
+# 本地计算的期权曲面表的列
+SURFACE_TABLE_COLUMNS = [
+    "expiry",
+    "strike",
+    "right",
+    "price",
+    "iv",
+    "delta",
+    "gamma",
+    "vega",
+    "theta",
+    "status",
+]
+# 批量报价表的列
+QUOTE_TABLE_COLUMNS = ["symbol", "last", "bid", "ask", "volume", "high", "low", "status"]
 
-def get_stock_quote(symbol: str, exchange: str = "SMART", currency: str = "USD"):
-    """获取股票实时报价"""
-    contract = Stock(symbol, exchange, currency)
-    ib.qualifyContracts(contract)
 
-    # 请求市场数据
-    ticker = ib.reqMktData(contract)
-    try:
-        ib.sleep(2)  # 等待数据返回
-        return (
-            f"""<quote>
+async def get_stock_quote(
+    symbol: str,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    fields: Sequence[str] = QUOTE_FIELDS,
+    timeout: Optional[float] = None,
+):
+    """获取股票实时报价
+
+    行情订阅由 quote_cache 持有，已订阅的合约直接返回内存中的最新数据；
+    新订阅则等待 ticker 更新事件，直到 fields 全部就绪或超过 timeout 秒
+
+    Args:
+        symbol: 股票代码
+        exchange: 交易所
+        currency: 货币
+        fields: 需要就绪的 ticker 字段，如 bid、ask、last
+        timeout: 等待字段就绪的最长时间，默认取 QUOTE_READY_TIMEOUT
+    """
+    if timeout is None:
+        timeout = get_settings().QUOTE_READY_TIMEOUT
+
+    contract = await qualify_stock(symbol, exchange, currency)
+
+    with quote_cache.lease(contract) as (ticker, _):
+        await wait_for_quote(ticker, fields, timeout)
+        return format_quote(contract, ticker), ticker
+
+
+async def get_stock_quotes(
+    symbols: Sequence[str],
+    exchange: str = "SMART",
+    currency: str = "USD",
+    fields: Sequence[str] = QUOTE_FIELDS,
+    timeout: Optional[float] = None,
+):
+    """批量获取股票报价
+
+    未缓存的合约通过一次 qualifyContractsAsync 批量识别，随后并发等待各合约
+    的行情就绪。每个合约单独计时，超时或失败的合约在 status 列中标明，
+    不影响其他合约的结果。
+
+    Returns:
+        (CSV 格式的报价表, {"columns": [...], "rows": [[...], ...]})
+    """
+    settings = get_settings()
+    if timeout is None:
+        timeout = settings.QUOTE_READY_TIMEOUT
+
+    # 去重并保持原有顺序
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+    contracts = dict(
+        zip(symbols, await qualify_stocks(symbols, exchange, currency))
+    )
+
+    semaphore = asyncio.Semaphore(settings.QUOTE_BATCH_CONCURRENCY)
+
+    async def fetch(symbol: str) -> list:
+        contract = contracts[symbol]
+        if not contract.conId:
+            return _quote_row(symbol, None, "unknown contract")
+        async with semaphore:
+            try:
+                with quote_cache.lease(contract) as (ticker, _):
+                    ready = await wait_for_quote(ticker, fields, timeout)
+                    return _quote_row(symbol, ticker, "ok" if ready else "timeout")
+            except QuoteLinesExhausted as e:
+                return _quote_row(symbol, None, str(e))
+
+    rows = await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+    table = {"columns": QUOTE_TABLE_COLUMNS, "rows": rows}
+    return format_table(table), table
+
+
+async def get_market_depth(
+    symbol: str,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    timeout: Optional[float] = None,
+) -> dict:
+    """获取盘口深度快照
+
+    深度订阅由 depth_cache 持有并在调用方之间共享，已订阅的合约直接返回
+    内存中的盘口；新订阅等待首批深度数据，最多 timeout 秒
+
+    Returns:
+        {"symbol", "seq", "bids": [[price, size], ...], "asks": [...], "updated_at"}
+    """
+    if timeout is None:
+        timeout = get_settings().DEPTH_READY_TIMEOUT
+    contract = await qualify_stock(symbol, exchange, currency)
+    with depth_cache.lease(contract) as (book, fresh):
+        if fresh or not book.seq:
+            await depth_cache.wait_for_book(contract, timeout)
+        return {"symbol": contract.symbol, **book.snapshot()}
+
+
+def _quote_row(symbol: str, ticker: Optional[Ticker], status: str) -> list:
+    if ticker is None:
+        return [symbol, None, None, None, None, None, None, status]
+    values = [ticker.last, ticker.bid, ticker.ask, ticker.volume, ticker.high, ticker.low]
+    return [
+        symbol,
+        *(None if value is None or math.isnan(value) else value for value in values),
+        status,
+    ]
+
+
+def format_quote(contract: Contract, ticker: Ticker):
+    """格式化报价"""
+    return f"""<quote>
             <symbol>
                 <value>{contract.symbol}</value>
                 <description>Stock symbol</description>
@@ -43,11 +204,139 @@ def get_stock_quote(symbol: str, exchange: str = "SMART", currency: str = "USD")
                 <value>{ticker.low}</value>
                 <description>Day low</description>
             </low>
-        </quote>""",
-            ticker,
-        )
-    finally:
-        ib.cancelMktData(contract)
+        </quote>"""
+
+
+async def get_historical_bars(
+    symbol: str,
+    duration: str = "1 D",
+    bar_size: str = "1 min",
+    exchange: str = "SMART",
+    currency: str = "USD",
+    end_datetime: Optional[datetime] = None,
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+) -> np.ndarray:
+    """获取历史K线的列式数组（按时间升序，time 为 UTC 秒）
+
+    已存储在本地的区间直接以内存映射读取，只向 IB 请求缺失的尾部或缺口
+    """
+    contract = await qualify_stock(symbol, exchange, currency)
+
+    if end_datetime is None:
+        end_datetime = datetime.now(timezone.utc)
+
+    return await load_bars(
+        contract, duration, bar_size, end_datetime, what_to_show, use_rth
+    )
+
+
+async def backfill_historical_data(
+    symbol: str,
+    duration: str,
+    bar_size: str,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+) -> AsyncIterator[dict]:
+    """回填长时间段的历史K线到本地存储
+
+    缺失区间按 IB 单次请求上限切分，以回填优先级并发排队请求，
+    每完成一个分段产出一次进度，最后产出 {"done": True, "bars": 区间内K线总数}
+    """
+    contract = await qualify_stock(symbol, exchange, currency)
+    end_datetime = datetime.now(timezone.utc)
+
+    async for progress in backfill_bars(
+        contract,
+        duration,
+        bar_size,
+        end_datetime,
+        what_to_show,
+        use_rth,
+        PRIORITY_BACKFILL,
+    ):
+        yield progress
+
+    bars = await load_bars(
+        contract, duration, bar_size, end_datetime, what_to_show, use_rth
+    )
+    yield {"done": True, "bars": len(bars)}
+
+
+async def stream_historical_bars(
+    symbol: str,
+    duration: str = "1 D",
+    bar_size: str = "1 min",
+    exchange: str = "SMART",
+    currency: str = "USD",
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+) -> AsyncIterator[np.ndarray]:
+    """按时间顺序分批产出历史K线，每批不超过 STREAM_CHUNK_ROWS 根"""
+    contract = await qualify_stock(symbol, exchange, currency)
+    async for chunk in stream_bars(
+        contract,
+        duration,
+        bar_size,
+        datetime.now(timezone.utc),
+        what_to_show,
+        use_rth,
+        get_settings().STREAM_CHUNK_ROWS,
+    ):
+        yield chunk
+
+
+async def get_indicators(
+    symbol: str,
+    duration: str = "5 D",
+    bar_size: str = "1 min",
+    tail: int = 1,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
+    params: IndicatorParams = IndicatorParams(),
+):
+    """计算技术指标（SMA、EMA、RSI、ATR、VWAP、布林带、MACD）
+
+    指标引擎按序列缓存，重复请求只对新增K线做增量更新
+
+    Args:
+        tail: 返回最近多少根K线的指标值
+
+    Returns:
+        (CSV 格式的指标表, {"columns": [...], "rows": [[...], ...]})
+    """
+    contract = await qualify_stock(symbol, exchange, currency)
+    bars = await load_bars(
+        contract,
+        duration,
+        bar_size,
+        datetime.now(timezone.utc),
+        what_to_show,
+        use_rth,
+    )
+    engine = indicator_cache.sync(
+        (contract.conId, bar_size, what_to_show, use_rth), bars, params
+    )
+
+    rows = []
+    if engine is not None:
+        columns = engine.tail(tail, pending=bars[-1])
+        for i in range(len(columns["time"])):
+            rows.append(
+                [
+                    datetime.fromtimestamp(columns["time"][i], timezone.utc).isoformat(),
+                    *(
+                        None if math.isnan(columns[name][i]) else round(columns[name][i], 4)
+                        for name in INDICATOR_COLUMNS[1:]
+                    ),
+                ]
+            )
+    table = {"columns": INDICATOR_COLUMNS, "rows": rows}
+    return format_table(table), table
 
 
 async def get_historical_data(
@@ -57,6 +346,8 @@ async def get_historical_data(
     exchange: str = "SMART",
     currency: str = "USD",
     end_datetime: Optional[datetime] = None,
+    what_to_show: str = "TRADES",
+    use_rth: bool = True,
 ):
     """获取历史数据
 
@@ -67,21 +358,20 @@ async def get_historical_data(
         exchange: 交易所
         currency: 货币
         end_datetime: 结束时间，默认为当前时间
+        what_to_show: 数据类型，如 TRADES、MIDPOINT、BID、ASK
+        use_rth: 是否只包含常规交易时段
     """
-    contract = Stock(symbol, exchange, currency)
-    contract = await ib.qualifyContractsAsync(contract)
-
-    if end_datetime is None:
-        end_datetime = datetime.now(timezone.utc)
-
-    bars = await ib.reqHistoricalDataAsync(
-        contract[0],
-        endDateTime=end_datetime,
-        durationStr=duration,
-        barSizeSetting=bar_size,
-        whatToShow="TRADES",
-        useRTH=True,
+    array = await get_historical_bars(
+        symbol,
+        duration,
+        bar_size,
+        exchange,
+        currency,
+        end_datetime,
+        what_to_show,
+        use_rth,
     )
+    bars = array_to_bars(array)
 
     # 最新日期在最上面
     bars.reverse()
@@ -118,18 +408,100 @@ async def get_historical_data(
     return formatted_bars, bars
 
 
+def format_bars_columnar(bars: np.ndarray) -> dict:
+    """K线转为列式结构：time（UTC 秒）与各价格列为等长数组，按时间升序"""
+    return {name: bars[name].tolist() for name in HISTORY_COLUMNS}
+
+
+def format_bars_csv(bars: np.ndarray, header: bool = True) -> str:
+    """K线转为紧凑 CSV（time 为 UTC ISO 时间），按时间升序"""
+    frame = pd.DataFrame({name: bars[name] for name in HISTORY_COLUMNS})
+    frame["time"] = np.char.add(
+        np.datetime_as_string(bars["time"].astype("datetime64[s]"), unit="s"), "Z"
+    )
+    return frame.to_csv(
+        index=False, header=header, float_format="%.10g", lineterminator="\n"
+    )
+
+
+def format_bars_ndjson(bars: np.ndarray) -> str:
+    """K线转为 NDJSON，每行一根K线（time 为 UTC 秒）"""
+    columns = [bars[name].tolist() for name in HISTORY_COLUMNS]
+    return "".join(
+        json.dumps(dict(zip(HISTORY_COLUMNS, row))) + "\n" for row in zip(*columns)
+    )
+
+
+def format_bars_npy(bars: np.ndarray) -> bytes:
+    """结构化数组转为 NumPy .npy 二进制（K线字段见 BAR_DTYPE，逐笔字段见 TICK_DTYPE）"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(bars))
+    return buffer.getvalue()
+
+
+def get_ticks(
+    symbol: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    kind: str = "",
+    after_seq: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> np.ndarray:
+    """查询录制的逐笔成交与报价
+
+    Args:
+        start, end: 时间范围（左闭右开），无时区的时间按 UTC 处理
+        kind: "trade"、"quote"，为空时两者都取
+        after_seq: 只返回 seq 大于该值的记录，用于分页续读
+        limit: 最多返回的条数
+
+    Returns:
+        TICK_DTYPE 结构化数组，按写入顺序排列
+    """
+    if kind and kind not in TICK_KINDS:
+        raise ValueError(f"无效的逐笔类型: {kind}")
+    return tick_recorder.read(
+        symbol,
+        start=_epoch_ns(start),
+        end=_epoch_ns(end),
+        kind=TICK_KINDS.get(kind),
+        after_seq=after_seq,
+        limit=limit,
+    )
+
+
+def format_ticks_columnar(ticks: np.ndarray) -> dict:
+    """逐笔记录转为列式结构：time 为 UTC 秒（微秒精度），kind 为 trade/quote，缺失值为 null"""
+    kinds = {value: name for name, value in TICK_KINDS.items()}
+    columns = {
+        "seq": ticks["seq"].tolist(),
+        "time": (ticks["time"] / 1e9).tolist(),
+        "kind": [kinds.get(value) for value in ticks["kind"].tolist()],
+        "flags": ticks["flags"].tolist(),
+    }
+    for name in ("price", "size", "bid", "bid_size", "ask", "ask_size"):
+        values = ticks[name]
+        columns[name] = np.where(np.isnan(values), None, values).tolist()
+    return columns
+
+
+def _epoch_ns(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000) * 1000
+
+
 async def get_option_chain(
     symbol: str,
     exchange: str = "SMART",
     currency: str = "USD",
 ):
     """获取期权链数据"""
-    stock = Stock(symbol, exchange, currency)
-    await ib.qualifyContractsAsync(stock)
+    stock = await qualify_stock(symbol, exchange, currency)
 
-    chains = await ib.reqSecDefOptParamsAsync(
-        stock.symbol, "", stock.secType, stock.conId
-    )
+    chains = await sec_def_cache.get(stock)
 
     formatted_chains = []
     for chain in chains:
@@ -149,3 +521,248 @@ async def get_option_chain(
         </optionChain>""")
 
     return formatted_chains, chains
+
+
+async def get_option_chain_snapshot(
+    symbol: str,
+    expiries: int = 1,
+    strikes: int = 5,
+    right: str = "",
+    expirations: Optional[Sequence[str]] = None,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    timeout: Optional[float] = None,
+):
+    """获取平值附近的期权报价与希腊值
+
+    期权链参数按标的缓存到当日收盘；选中的期权合约批量识别后，
+    在行情线路预算内并发订阅，等待买价、卖价和模型希腊值就绪
+
+    Args:
+        expiries: 未指定 expirations 时，取最近的几个到期日
+        strikes: 平值行权价上下各取几档
+        right: "C"、"P"，为空时看涨看跌都取
+        expirations: 指定到期日（YYYYMMDD）
+        timeout: 每个合约等待报价就绪的最长秒数，默认取 OPTION_READY_TIMEOUT
+
+    Returns:
+        (CSV 格式的期权报价表, {"columns": [...], "rows": [[...], ...], "spot": 标的价格})
+    """
+    spot, rows = await _snapshot_options(
+        symbol,
+        expiries,
+        strikes,
+        right,
+        expirations,
+        exchange,
+        currency,
+        timeout,
+        OPTION_FIELDS,
+        _option_row,
+    )
+    table = {"columns": OPTION_TABLE_COLUMNS, "rows": rows, "spot": spot}
+    return format_table(table), table
+
+
+async def get_option_surface(
+    symbol: str,
+    expiries: int = 3,
+    strikes: int = 10,
+    rate: Optional[float] = None,
+    dividend: float = 0.0,
+    expirations: Optional[Sequence[str]] = None,
+    exchange: str = "SMART",
+    currency: str = "USD",
+    timeout: Optional[float] = None,
+):
+    """本地计算平值附近的隐含波动率与希腊值曲面
+
+    只订阅买卖价，不等待 IB 逐合约推送模型希腊值；
+    以买卖中间价（缺失时用最新成交价）批量求解 Black-Scholes 隐含波动率，
+    再向量化计算 delta/gamma/vega/theta。曲面上行权价不低于标的价格的取看涨期权，
+    低于标的价格的取看跌期权
+
+    Args:
+        rate: 无风险利率，默认取 RISK_FREE_RATE
+        dividend: 连续股息率
+
+    Returns:
+        (CSV 格式的期权报价表,
+         {"columns": [...], "rows": [[...], ...], "spot": 标的价格,
+          "surface": {"expiries": [...], "strikes": [...], "iv": [[...], ...]}})
+    """
+    if rate is None:
+        rate = get_settings().RISK_FREE_RATE
+    spot, quotes = await _snapshot_options(
+        symbol,
+        expiries,
+        strikes,
+        "",
+        expirations,
+        exchange,
+        currency,
+        timeout,
+        ("bid", "ask"),
+        lambda option, ticker, status: (option, _mid_price(ticker), status),
+    )
+
+    now = datetime.now(timezone.utc)
+    option_price = np.array([mid for _, mid, _ in quotes], dtype="f8")
+    strike = np.array([option.strike for option, _, _ in quotes], dtype="f8")
+    years = np.array(
+        [_years_to_expiry(option.lastTradeDateOrContractMonth, now) for option, _, _ in quotes],
+        dtype="f8",
+    )
+    is_call = np.array([option.right == "C" for option, _, _ in quotes], dtype=bool)
+
+    iv = black_scholes.implied_vol(option_price, spot, strike, years, rate, dividend, is_call)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        greeks = black_scholes.greeks(spot, strike, years, rate, dividend, iv, is_call)
+
+    values = np.column_stack(
+        [option_price, iv, *(greeks[name] for name in ("delta", "gamma", "vega", "theta"))]
+    ).tolist()
+    rows = [
+        [
+            option.lastTradeDateOrContractMonth,
+            option.strike,
+            option.right,
+            *(_number(value) for value in row_values),
+            status,
+        ]
+        for (option, _, status), row_values in zip(quotes, values)
+    ]
+
+    surface_expiries = sorted({row[0] for row in rows})
+    surface_strikes = sorted({row[1] for row in rows})
+    grid = {
+        (row[0], row[1]): row[4]
+        for row in rows
+        if (row[2] == "C") == (row[1] >= spot)
+    }
+    table = {
+        "columns": SURFACE_TABLE_COLUMNS,
+        "rows": rows,
+        "spot": spot,
+        "surface": {
+            "expiries": surface_expiries,
+            "strikes": surface_strikes,
+            "iv": [
+                [grid.get((expiry, strike)) for strike in surface_strikes]
+                for expiry in surface_expiries
+            ],
+        },
+    }
+    return format_table(table), table
+
+
+async def _snapshot_options(
+    symbol: str,
+    expiries: int,
+    strikes: int,
+    right: str,
+    expirations: Optional[Sequence[str]],
+    exchange: str,
+    currency: str,
+    timeout: Optional[float],
+    fields: Sequence[str],
+    make_row: Callable[[Contract, Optional[Ticker], str], Any],
+):
+    """订阅平值附近的期权并在行情释放前用 make_row 提取每个合约的数据
+
+    Returns:
+        (标的价格, [make_row(option, ticker, status), ...])
+    """
+    settings = get_settings()
+    if timeout is None:
+        timeout = settings.OPTION_READY_TIMEOUT
+
+    underlying = await qualify_stock(symbol, exchange, currency)
+    chain = pick_chain(await sec_def_cache.get(underlying), exchange)
+    if chain is None:
+        raise ValueError(f"{symbol} 在 {exchange} 没有期权链")
+
+    with quote_cache.lease(underlying) as (ticker, _):
+        await wait_for_quote(ticker, QUOTE_FIELDS, settings.QUOTE_READY_TIMEOUT)
+        spot = ticker.marketPrice()
+        if math.isnan(spot):
+            spot = ticker.close
+    if spot is None or math.isnan(spot):
+        raise ValueError(f"无法获取 {symbol} 的标的价格")
+
+    rights = [right.upper()] if right else ["C", "P"]
+    options = [
+        Option(
+            underlying.symbol,
+            expiry,
+            strike,
+            option_right,
+            exchange,
+            multiplier=chain.multiplier,
+            currency=currency,
+            tradingClass=chain.tradingClass,
+        )
+        for expiry in select_expirations(chain.expirations, expiries, expirations)
+        for strike in select_strikes(chain.strikes, spot, strikes)
+        for option_right in rights
+    ]
+    options = [option for option in await contract_cache.qualify(*options) if option.conId]
+
+    semaphore = asyncio.Semaphore(
+        min(settings.OPTION_CHAIN_CONCURRENCY, quote_cache.max_lines)
+    )
+
+    async def fetch(option: Contract):
+        async with semaphore:
+            try:
+                with quote_cache.lease(option) as (option_ticker, _):
+                    ready = await wait_for_quote(option_ticker, fields, timeout)
+                    return make_row(option, option_ticker, "ok" if ready else "timeout")
+            except QuoteLinesExhausted as e:
+                return make_row(option, None, str(e))
+
+    rows = await asyncio.gather(*(fetch(option) for option in options))
+    return spot, rows
+
+
+def _option_row(option: Contract, ticker: Optional[Ticker], status: str) -> list:
+    greeks = ticker.modelGreeks if ticker is not None else None
+    values = [
+        ticker.bid if ticker else None,
+        ticker.ask if ticker else None,
+        ticker.last if ticker else None,
+        *(
+            getattr(greeks, name) if greeks else None
+            for name in ("impliedVol", "delta", "gamma", "vega", "theta", "undPrice")
+        ),
+    ]
+    return [
+        option.lastTradeDateOrContractMonth,
+        option.strike,
+        option.right,
+        *(_number(value) for value in values),
+        status,
+    ]
+
+
+def _mid_price(ticker: Optional[Ticker]) -> float:
+    """买卖中间价，买卖价不完整时退回最新成交价"""
+    if ticker is None:
+        return math.nan
+    bid, ask = ticker.bid, ticker.ask
+    if bid is not None and ask is not None and bid > 0 and ask > 0:
+        return (bid + ask) / 2
+    last = ticker.last
+    return math.nan if last is None else last
+
+
+def _years_to_expiry(expiry: str, now: datetime) -> float:
+    """距到期日纽约时间 16:00 收盘的年数"""
+    close = datetime.strptime(expiry[:8], "%Y%m%d").replace(
+        hour=16, tzinfo=TRADING_TZ
+    )
+    return max((close - now).total_seconds(), 0.0) / (365 * 86400)
+
+
+def _number(value):
+    return None if value is None or math.isnan(value) else value
@@ -0,0 +1,287 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from ib_async import Contract, MktDepthData, Ticker
+from core import ib
+from core.config import get_settings
+from utils.logger import logger
+
+# IB 深度事件的买卖方向与操作类型
+SIDES = ("ask", "bid")
+OPERATIONS = ("insert", "update", "delete")
+
+DeltaListener = Callable[[Contract, List[dict], int], None]
+
+
+class DepthLinesExhausted(Exception):
+    """深度订阅已全部被占用（IB 对深度订阅单独限额，远小于行情线路）"""
+
+
+class DepthBook:
+    """数组存储的盘口
+
+    买卖两侧各一组定长的价格、数量数组，按 IB 深度事件原地更新：
+    - insert：在 position 插入新档位，其后档位下移，超出 rows 的档位丢弃
+    - update：覆盖 position 处的档位
+    - delete：删除 position 处的档位，其后档位上移
+    每个事件生成一条增量并递增 seq，客户端按 seq 判断是否漏收
+    """
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.price = np.full((2, rows), np.nan)
+        self.size = np.zeros((2, rows))
+        self.depth = [0, 0]
+        self.seq = 0
+        self.updated_at = 0.0
+
+    def apply(self, tick: MktDepthData) -> Optional[dict]:
+        """应用一个深度事件，返回对应的增量；越界事件被忽略"""
+        side, position, operation = tick.side, tick.position, tick.operation
+        if side not in (0, 1) or operation not in (0, 1, 2):
+            return None
+        if not 0 <= position < self.rows:
+            return None
+        price, size = self.price[side], self.size[side]
+
+        if operation == 0:
+            price[position + 1 :] = price[position:-1]
+            size[position + 1 :] = size[position:-1]
+            price[position], size[position] = tick.price, tick.size
+            self.depth[side] = min(max(self.depth[side], position) + 1, self.rows)
+        elif operation == 1:
+            price[position], size[position] = tick.price, tick.size
+            self.depth[side] = max(self.depth[side], position + 1)
+        else:
+            if position >= self.depth[side]:
+                return None
+            price[position:-1] = price[position + 1 :]
+            size[position:-1] = size[position + 1 :]
+            price[-1], size[-1] = np.nan, 0.0
+            self.depth[side] -= 1
+
+        self.seq += 1
+        self.updated_at = time.time()
+        delta = {
+            "seq": self.seq,
+            "side": SIDES[side],
+            "op": OPERATIONS[operation],
+            "position": position,
+        }
+        if operation != 2:
+            delta["price"] = tick.price
+            delta["size"] = tick.size
+        return delta
+
+    def levels(self, side: int) -> List[List[float]]:
+        """一侧的有效档位 [[price, size], ...]"""
+        depth = self.depth[side]
+        return [
+            [None if math.isnan(price) else price, size]
+            for price, size in zip(
+                self.price[side, :depth].tolist(), self.size[side, :depth].tolist()
+            )
+        ]
+
+    def snapshot(self) -> dict:
+        return {
+            "seq": self.seq,
+            "bids": self.levels(1),
+            "asks": self.levels(0),
+            "updated_at": self.updated_at,
+        }
+
+
+@dataclass
+class _DepthEntry:
+    contract: Contract
+    ticker: Ticker
+    book: DepthBook
+    handler: Callable[[Ticker], None]
+    ref_count: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class DepthCache:
+    """市场深度订阅缓存
+
+    TWS 同时允许的深度订阅很少，每个合约（按 conId）只保持一个 reqMktDepth 订阅，
+    由所有快照请求和 WebSocket 客户端共享：
+    - 引用计数归零后订阅继续保留，空闲超过 idle_ttl 秒才取消
+    - 同时订阅数不超过 max_lines，满额时回收最久未使用的空闲订阅
+    - 每批深度事件应用到盘口后，以增量列表通知 listeners
+    """
+
+    def __init__(self, idle_ttl: float, max_lines: int, rows: int, smart_depth: bool):
+        self.idle_ttl = idle_ttl
+        self.max_lines = max_lines
+        self.rows = rows
+        self.smart_depth = smart_depth
+        self._entries: Dict[int, _DepthEntry] = {}
+        self._listeners: List[DeltaListener] = []
+
+    def add_listener(self, listener: DeltaListener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: DeltaListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def get(self, con_id: int) -> Optional[DepthBook]:
+        entry = self._entries.get(con_id)
+        return entry.book if entry else None
+
+    def acquire(self, contract: Contract) -> Tuple[DepthBook, bool]:
+        """获取合约的盘口并增加引用计数
+
+        Returns:
+            (book, fresh)，fresh 为 True 表示刚刚发起订阅，盘口尚为空
+        """
+        self.evict_idle()
+
+        entry = self._entries.get(contract.conId)
+        fresh = entry is None
+        if fresh:
+            if len(self._entries) >= self.max_lines:
+                self._evict_lru()
+            book = DepthBook(self.rows)
+            ticker = ib.reqMktDepth(contract, self.rows, self.smart_depth)
+            handler = self._make_handler(contract, book)
+            ticker.updateEvent += handler
+            entry = _DepthEntry(contract, ticker, book, handler)
+            self._entries[contract.conId] = entry
+            logger.debug(f"新建深度订阅: {contract.symbol} ({contract.conId})")
+
+        entry.ref_count += 1
+        entry.last_used = time.monotonic()
+        return entry.book, fresh
+
+    def release(self, contract: Contract):
+        """释放一次引用，订阅保留到空闲超时"""
+        entry = self._entries.get(contract.conId)
+        if entry is None:
+            return
+        entry.ref_count = max(entry.ref_count - 1, 0)
+        entry.last_used = time.monotonic()
+        if entry.ref_count == 0:
+            self._schedule_eviction()
+
+    @contextmanager
+    def lease(self, contract: Contract) -> Iterator[Tuple[DepthBook, bool]]:
+        """在 with 块内持有盘口引用"""
+        book, fresh = self.acquire(contract)
+        try:
+            yield book, fresh
+        finally:
+            self.release(contract)
+
+    async def wait_for_book(self, contract: Contract, timeout: float) -> bool:
+        """等待盘口收到第一批深度事件
+
+        Returns:
+            盘口是否在截止时间前已有数据
+        """
+        entry = self._entries.get(contract.conId)
+        if entry is None:
+            return False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not entry.book.seq:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(entry.ticker.updateEvent, remaining)
+            except asyncio.TimeoutError:
+                break
+        return bool(entry.book.seq)
+
+    def evict_idle(self):
+        """取消空闲超时的订阅"""
+        now = time.monotonic()
+        expired = [
+            con_id
+            for con_id, entry in self._entries.items()
+            if entry.ref_count == 0 and now - entry.last_used >= self.idle_ttl
+        ]
+        for con_id in expired:
+            self._cancel(con_id)
+
+    def clear(self):
+        """丢弃全部订阅（连接断开后订阅已失效，无需再取消）"""
+        for entry in self._entries.values():
+            entry.ticker.updateEvent -= entry.handler
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "lines_in_use": len(self._entries),
+            "max_lines": self.max_lines,
+            "rows": self.rows,
+            "books": [
+                {
+                    "symbol": entry.contract.symbol,
+                    "ref_count": entry.ref_count,
+                    "seq": entry.book.seq,
+                }
+                for entry in self._entries.values()
+            ],
+        }
+
+    def _make_handler(self, contract: Contract, book: DepthBook):
+        def on_update(ticker: Ticker):
+            # 深度与报价共用同一个 ticker，只处理本批次的深度事件
+            if not ticker.domTicks:
+                return
+            deltas = [delta for delta in map(book.apply, ticker.domTicks) if delta]
+            if not deltas:
+                return
+            for listener in list(self._listeners):
+                try:
+                    listener(contract, deltas, book.seq)
+                except Exception as e:
+                    logger.error(f"深度增量推送失败: {contract.symbol} {str(e)}")
+
+        return on_update
+
+    def _evict_lru(self):
+        idle = [
+            (entry.last_used, con_id)
+            for con_id, entry in self._entries.items()
+            if entry.ref_count == 0
+        ]
+        if not idle:
+            raise DepthLinesExhausted(
+                f"盘口深度订阅已用尽（DEPTH_MAX_LINES={self.max_lines} 条均在使用中）"
+            )
+        _, con_id = min(idle)
+        self._cancel(con_id)
+
+    def _cancel(self, con_id: int):
+        entry = self._entries.pop(con_id)
+        entry.ticker.updateEvent -= entry.handler
+        if ib.isConnected():
+            ib.cancelMktDepth(entry.contract, self.smart_depth)
+        logger.debug(f"取消深度订阅: {entry.contract.symbol} ({con_id})")
+
+    def _schedule_eviction(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_later(self.idle_ttl, self.evict_idle)
+
+
+depth_cache = DepthCache(
+    idle_ttl=get_settings().DEPTH_IDLE_TTL,
+    max_lines=get_settings().DEPTH_MAX_LINES,
+    rows=get_settings().DEPTH_ROWS,
+    smart_depth=get_settings().DEPTH_SMART,
+)
+ib.disconnectedEvent += depth_cache.clear
@@ -0,0 +1,75 @@
+import bisect
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+from ib_async import Contract, OptionChain
+from core import ib
+from utils.logger import logger
+
+# 以美东日期作为交易日
+TRADING_TZ = ZoneInfo("America/New_York")
+
+
+def trading_day() -> date:
+    return datetime.now(TRADING_TZ).date()
+
+
+class SecDefCache:
+    """期权链参数缓存
+
+    按标的 conId 缓存 reqSecDefOptParams 的结果（到期日、行权价列表），
+    同一交易日内只请求一次
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[date, List[OptionChain]]] = {}
+
+    async def get(self, underlying: Contract) -> List[OptionChain]:
+        """获取标的的期权链参数"""
+        today = trading_day()
+        entry = self._entries.get(underlying.conId)
+        if entry and entry[0] == today:
+            return entry[1]
+
+        chains = await ib.reqSecDefOptParamsAsync(
+            underlying.symbol, "", underlying.secType, underlying.conId
+        )
+        self._entries[underlying.conId] = (today, chains)
+        logger.debug(f"缓存期权链参数: {underlying.symbol} ({len(chains)} 个交易所)")
+        return chains
+
+    def clear(self):
+        self._entries.clear()
+
+
+def pick_chain(chains: Sequence[OptionChain], exchange: str) -> Optional[OptionChain]:
+    """选出指定交易所的期权链，同一交易所有多个交易类别时取行权价最多的"""
+    candidates = [chain for chain in chains if chain.exchange == exchange]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda chain: len(chain.strikes))
+
+
+def select_expirations(
+    expirations: Sequence[str], count: int, wanted: Optional[Sequence[str]] = None
+) -> List[str]:
+    """选出指定的到期日，未指定时取今天起最近的 count 个"""
+    expirations = sorted(expirations)
+    if wanted:
+        return [expiry for expiry in expirations if expiry in set(wanted)]
+    today = trading_day().strftime("%Y%m%d")
+    return [expiry for expiry in expirations if expiry >= today][:count]
+
+
+def select_strikes(strikes: Sequence[float], spot: float, width: int) -> List[float]:
+    """选出离 spot 最近的行权价及其上下各 width 档"""
+    strikes = sorted(strikes)
+    center = bisect.bisect_left(strikes, spot)
+    if center == len(strikes) or (
+        center > 0 and spot - strikes[center - 1] < strikes[center] - spot
+    ):
+        center -= 1
+    return strikes[max(center - width, 0) : center + width + 1]
+
+
+sec_def_cache = SecDefCache()
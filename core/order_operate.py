@@ -1,7 +1,10 @@
+import asyncio
+import time
 from ib_async import (
     Order,
-    Stock,
+    OrderStatus,
     LimitOrder,
+    Stock,
     MarketOrder,
     StopOrder,
     StopLimitOrder,
@@ -9,8 +12,29 @@ from ib_async import (
 )
 from core.constant import OrderAction, OrderType
 from core import ib
-from typing import Optional
+from core.config import get_settings
+from core.contract_cache import contract_cache, qualify_stock
+from core.order_registry import order_registry
+from typing import Callable, Dict, List, Optional, Tuple
 from core.websocket import websocket_manager
+from utils.data_convert import format_table, order_price
+
+# TWS 已接受订单的状态；其余完成状态（Cancelled、Inactive 等）视为被拒绝
+ACCEPTED_STATES = frozenset(
+    {OrderStatus.PreSubmitted, OrderStatus.Submitted, OrderStatus.Filled}
+)
+
+# 修改订单时 price / stop_price 对应的 Order 字段，None 表示该订单类型不支持
+PRICE_FIELDS = {
+    OrderType.LIMIT.value: ("lmtPrice", None),
+    OrderType.MARKET.value: (None, None),
+    OrderType.STOP.value: ("auxPrice", "auxPrice"),
+    OrderType.STOP_LIMIT.value: ("lmtPrice", "auxPrice"),
+    OrderType.MARKET_IF_TOUCHED.value: ("auxPrice", "auxPrice"),
+    OrderType.LIMIT_IF_TOUCHED.value: ("lmtPrice", "auxPrice"),
+    OrderType.TRAIL.value: (None, "trailStopPrice"),
+    OrderType.TRAIL_LIMIT.value: (None, "trailStopPrice"),
+}
 
 
 async def place_limit_order(
@@ -21,16 +45,13 @@ async def place_limit_order(
     exchange: str = "SMART",
     currency: str = "USD",
     tif: str = "DAY",
+    ack: bool = False,
+    ack_timeout: Optional[float] = None,
 ):
     """下限价单"""
     order = LimitOrder(action=action, totalQuantity=quantity, lmtPrice=price, tif=tif)
-    contract = Stock(symbol, exchange, currency)
-    trade = ib.placeOrder(contract, order)
-    if trade:
-        # 异步发送WebSocket通知
-        await _send_order_notification_async(trade, "创建")
-        return format_order_response(trade), trade
-    return None, None
+    contract = await qualify_stock(symbol, exchange, currency)
+    return await _submit_order(contract, order, ack, ack_timeout)
 
 
 async def place_market_order(
@@ -39,19 +60,16 @@ async def place_market_order(
     action: str = OrderAction.BUY.value,
     exchange: str = "SMART",
     currency: str = "USD",
+    ack: bool = False,
+    ack_timeout: Optional[float] = None,
 ):
     """下市价单"""
     order = MarketOrder(
         action=action,
         totalQuantity=quantity,
     )
-    contract = Stock(symbol, exchange, currency)
-    trade = ib.placeOrder(contract, order)
-    if trade:
-        # 异步发送WebSocket通知
-        await _send_order_notification_async(trade, "创建")
-        return format_order_response(trade), trade
-    return None, None
+    contract = await qualify_stock(symbol, exchange, currency)
+    return await _submit_order(contract, order, ack, ack_timeout)
 
 
 async def place_stop_order(
@@ -61,6 +79,8 @@ async def place_stop_order(
     action: str = OrderAction.SELL.value,
     exchange: str = "SMART",
     currency: str = "USD",
+    ack: bool = False,
+    ack_timeout: Optional[float] = None,
 ):
     """下止损单"""
     order = StopOrder(
@@ -68,13 +88,8 @@ async def place_stop_order(
         totalQuantity=quantity,
         stopPrice=stop_price,
     )
-    contract = Stock(symbol, exchange, currency)
-    trade = ib.placeOrder(contract, order)
-    if trade:
-        # 异步发送WebSocket通知
-        await _send_order_notification_async(trade, "创建")
-        return format_order_response(trade), trade
-    return None, None
+    contract = await qualify_stock(symbol, exchange, currency)
+    return await _submit_order(contract, order, ack, ack_timeout)
 
 
 async def place_stop_limit_order(
@@ -85,6 +100,8 @@ async def place_stop_limit_order(
     action: str = OrderAction.SELL.value,
     exchange: str = "SMART",
     currency: str = "USD",
+    ack: bool = False,
+    ack_timeout: Optional[float] = None,
 ):
     """下止损限价单"""
     order = StopLimitOrder(
@@ -93,56 +110,262 @@ async def place_stop_limit_order(
         stopPrice=stop_price,
         lmtPrice=limit_price,
     )
-    contract = Stock(symbol, exchange, currency)
-    trade = ib.placeOrder(contract, order)
-    if trade:
-        # 异步发送WebSocket通知
-        await _send_order_notification_async(trade, "创建")
-        return format_order_response(trade), trade
-    return None, None
+    contract = await qualify_stock(symbol, exchange, currency)
+    return await _submit_order(contract, order, ack, ack_timeout)
+
+
+# 批量下单结果表格的列
+BATCH_COLUMNS = [
+    "leg",
+    "role",
+    "symbol",
+    "order_id",
+    "parent_id",
+    "action",
+    "quantity",
+    "order_type",
+    "price",
+    "status",
+    "acknowledged",
+    "latency_ms",
+    "error",
+]
+
+
+async def place_batch_orders(
+    legs: List[dict],
+    ack: bool = True,
+    ack_timeout: Optional[float] = None,
+):
+    """批量下单
+
+    每个 leg 为 {"symbol", "quantity", "action"="BUY", "order_type"="LMT", "price", "stop_price",
+    "tif"="DAY", "exchange"="SMART", "currency"="USD"}，另可指定：
+    - "take_profit" / "stop_loss": 组成括号单，父单之后附加反向的止盈限价单和止损单，
+      父单与前面的子单 transmit=False，最后一个子单提交时 TWS 才一并生效
+    - "oca_group"（及 "oca_type"，默认 1）: 同名的 leg 组成 OCA 组，一个成交后取消其余
+
+    所有合约并发识别一次，全部订单在一轮中提交，再并发等待各订单的确认。
+    任一 leg 参数无效时不提交任何订单；合约无法识别的 leg 单独记为失败
+
+    Returns:
+        (CSV 格式的逐单结果, [{"leg", "role", "trade", "ack", "error"}, ...])
+    """
+    orders = [_build_leg_orders(i, leg) for i, leg in enumerate(legs)]
+
+    keys = {
+        _leg_contract_key(leg): Stock(*_leg_contract_key(leg)) for leg in legs
+    }
+    contracts = dict(zip(keys, await contract_cache.qualify(*keys.values())))
+
+    timeout = get_settings().ORDER_ACK_TIMEOUT if ack_timeout is None else ack_timeout
+    results: List[dict] = []
+    started = time.perf_counter()
+    for i, (leg, leg_orders) in enumerate(zip(legs, orders)):
+        contract = contracts[_leg_contract_key(leg)]
+        if not contract.conId:
+            error = f"无法识别合约: {leg['symbol']}"
+            results.extend(
+                {"leg": i, "role": role, "trade": None, "ack": None, "error": error}
+                for role, _ in leg_orders
+            )
+            continue
+        parent, *children = [order for _, order in leg_orders]
+        if children:
+            # 子单通过 parentId 关联父单，父单需先分配 orderId
+            parent.orderId = ib.client.getReqId()
+            for child in children:
+                child.parentId = parent.orderId
+        for role, order in leg_orders:
+            trade = ib.placeOrder(contract, order)
+            results.append(
+                {"leg": i, "role": role, "trade": trade, "ack": None, "error": None}
+            )
+
+    placed = [result for result in results if result["trade"] is not None]
+    if ack:
+        acks = await asyncio.gather(
+            *(wait_for_ack(result["trade"], timeout, started) for result in placed)
+        )
+        for result, leg_ack in zip(placed, acks):
+            result["ack"] = leg_ack
+    # 异步发送WebSocket通知
+    await asyncio.gather(
+        *(_send_order_notification_async(result["trade"], "创建") for result in placed)
+    )
+    return format_table(_batch_table(results)), results
+
+
+def _leg_contract_key(leg: dict) -> Tuple[str, str, str]:
+    return (
+        leg["symbol"].upper(),
+        leg.get("exchange", "SMART"),
+        leg.get("currency", "USD"),
+    )
+
+
+def _build_leg_orders(index: int, leg: dict) -> List[Tuple[str, Order]]:
+    """把一个 leg 转为 [(角色, Order), ...]，括号单为 父单、止盈单、止损单"""
+    try:
+        if not leg.get("symbol"):
+            raise ValueError("缺少 symbol")
+        quantity = leg.get("quantity")
+        if not quantity or quantity <= 0:
+            raise ValueError("quantity 必须大于 0")
+        action = leg.get("action", OrderAction.BUY.value).upper()
+        if action not in (OrderAction.BUY.value, OrderAction.SELL.value):
+            raise ValueError(f"无效的 action: {action}")
+
+        order = _build_order(
+            leg.get("order_type", OrderType.LIMIT.value).upper(),
+            action,
+            quantity,
+            leg.get("price"),
+            leg.get("stop_price"),
+        )
+        order.tif = leg.get("tif", "DAY")
+        orders = [("order", order)]
+
+        take_profit, stop_loss = leg.get("take_profit"), leg.get("stop_loss")
+        if take_profit is not None or stop_loss is not None:
+            if leg.get("oca_group"):
+                raise ValueError("括号单不能再加入 OCA 组")
+            reverse = (
+                OrderAction.SELL.value if action == OrderAction.BUY.value else OrderAction.BUY.value
+            )
+            orders = [("parent", order)]
+            if take_profit is not None:
+                orders.append(
+                    ("take_profit", LimitOrder(reverse, quantity, take_profit, tif=order.tif))
+                )
+            if stop_loss is not None:
+                orders.append(
+                    ("stop_loss", StopOrder(reverse, quantity, stop_loss, tif=order.tif))
+                )
+            # 只有最后一个子单 transmit，TWS 收到后整组一起生效
+            for _, bracket_order in orders[:-1]:
+                bracket_order.transmit = False
+        elif leg.get("oca_group"):
+            order.ocaGroup = leg["oca_group"]
+            order.ocaType = leg.get("oca_type", 1)
+        return orders
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"第 {index} 个订单无效: {str(e)}") from e
+
+
+def _build_order(
+    order_type: str,
+    action: str,
+    quantity: float,
+    price: Optional[float],
+    stop_price: Optional[float],
+) -> Order:
+    if order_type == OrderType.MARKET.value:
+        return MarketOrder(action, quantity)
+    if order_type == OrderType.LIMIT.value and price is not None:
+        return LimitOrder(action, quantity, price)
+    if order_type == OrderType.STOP.value and stop_price is not None:
+        return StopOrder(action, quantity, stop_price)
+    if order_type == OrderType.STOP_LIMIT.value and None not in (price, stop_price):
+        return StopLimitOrder(action, quantity, price, stop_price)
+    raise ValueError(f"{order_type} 订单缺少价格或不支持批量提交")
+
+
+def _batch_table(results: List[dict]) -> dict:
+    rows = []
+    for result in results:
+        trade, leg_ack = result["trade"], result["ack"] or {}
+        order = trade.order if trade else None
+        rows.append(
+            [
+                result["leg"],
+                result["role"],
+                trade.contract.symbol if trade else None,
+                order.orderId if order else None,
+                (order.parentId or None) if order else None,
+                order.action if order else None,
+                order.totalQuantity if order else None,
+                order.orderType if order else None,
+                order_price(order) if order else None,
+                trade.orderStatus.status if trade else None,
+                leg_ack.get("acknowledged"),
+                leg_ack.get("latency_ms"),
+                result["error"] or leg_ack.get("message"),
+            ]
+        )
+    return {"columns": BATCH_COLUMNS, "rows": rows}
 
 
 async def modify_order(
     order_id: int,
     new_quantity: Optional[int] = None,
     new_price: Optional[float] = None,
+    new_stop_price: Optional[float] = None,
+    ack: bool = False,
+    ack_timeout: Optional[float] = None,
 ):
-    """修改订单"""
-    trades = ib.trades()
-    for trade in trades:
-        if trade.order.orderId == order_id:
-            # 创建新订单，保持原有参数
-            new_order = trade.order
-            if new_quantity is not None:
-                new_order.totalQuantity = new_quantity
-            if new_price is not None:
-                if new_order.orderType == OrderType.LIMIT.value:
-                    new_order.lmtPrice = new_price
-                elif new_order.orderType in [
-                    OrderType.STOP.value,
-                    OrderType.STOP_LIMIT.value,
-                ]:
-                    new_order.stopPrice = new_price
-
-            # 取消原订单并提交新订单
-            ib.cancelOrder(trade.order)
-            modified_trade = ib.placeOrder(trade.contract, new_order)
-            if modified_trade:
-                # 异步发送WebSocket通知
-                await _send_order_notification_async(modified_trade, "修改")
-                return format_order_response(modified_trade), modified_trade
-    return None, None
+    """原地修改订单
+
+    以相同的 orderId 重新提交订单，TWS 直接修改挂单，不先撤单再下单，保留排队优先级。
+    price 为限价（止损单、触价单为触发价），stop_price 为触发价（追踪止损单为止损价）。
+    ack 为 True 时等待 TWS 确认修改；修改被拒绝时恢复本地订单的原参数
+
+    Returns:
+        (格式化的订单, Trade)；ack 模式下第二项为 {"trade": Trade, "ack": 确认结果}
+    """
+    trade = order_registry.get(order_id)
+    if trade is None:
+        return None, None
+    if trade.isDone():
+        raise ValueError(f"订单 {order_id} 已{trade.orderStatus.status}，无法修改")
+
+    order = trade.order
+    changes = {}
+    if new_quantity is not None:
+        changes["totalQuantity"] = new_quantity
+    price_field, stop_field = PRICE_FIELDS.get(order.orderType, (None, None))
+    for value, field, name in (
+        (new_price, price_field, "price"),
+        (new_stop_price, stop_field, "stop_price"),
+    ):
+        if value is None:
+            continue
+        if field is None:
+            raise ValueError(f"{order.orderType} 订单不支持修改 {name}")
+        changes[field] = value
+    if not changes:
+        raise ValueError("没有需要修改的参数")
+
+    previous = {field: getattr(order, field) for field in changes}
+    for field, value in changes.items():
+        setattr(order, field, value)
+    modify_index = len(trade.log)
+    started = time.perf_counter()
+    ib.placeOrder(trade.contract, order)
+
+    result = None
+    if ack:
+        result = await _wait_for_modify_ack(
+            trade,
+            modify_index,
+            get_settings().ORDER_ACK_TIMEOUT if ack_timeout is None else ack_timeout,
+            started,
+        )
+        if result["rejected"]:
+            for field, value in previous.items():
+                setattr(order, field, value)
+
+    # 异步发送WebSocket通知
+    await _send_order_notification_async(trade, "修改")
+    if result is None:
+        return format_order_response(trade), trade
+    return format_order_response(trade), {"trade": trade, "ack": result}
 
 
 async def cancel_order(order_id: int):
     """取消订单"""
     # 先获取订单信息用于通知
-    trades = ib.trades()
-    canceled_trade = None
-    for trade in trades:
-        if trade.order.orderId == order_id:
-            canceled_trade = trade
-            break
+    canceled_trade = order_registry.get(order_id)
 
     order = Order()
     order.orderId = order_id
@@ -163,18 +386,151 @@ async def cancel_order(order_id: int):
     )
 
 
-async def get_order_status(order_id: Optional[int] = None):
-    """获取订单状态"""
-    trades = ib.trades()
+async def get_order_status(
+    order_id: Optional[int] = None,
+    symbol: Optional[str] = None,
+    status: Optional[str] = None,
+    active: Optional[bool] = None,
+):
+    """获取订单状态
+
+    指定 order_id 时返回单个订单，否则按标的、状态筛选订单列表，
+    active 为 True/False 时只返回未完成/已完成的订单
+    """
     if order_id is None:
+        trades = order_registry.find(symbol, status, active)
         return [format_order_response(trade) for trade in trades], trades
-    else:
-        for trade in trades:
-            if trade.order.orderId == order_id:
-                return format_order_response(trade), trade
+    trade = order_registry.get(order_id)
+    if trade is not None:
+        return format_order_response(trade), trade
     return None, None
 
 
+async def wait_for_ack(
+    trade: Trade, timeout: float, started: Optional[float] = None
+) -> dict:
+    """等待 TWS 确认订单：已接受（PreSubmitted/Submitted/Filled）、被拒绝或取消，或超时
+
+    Args:
+        started: 提交订单时的 time.perf_counter()，默认为调用时
+
+    Returns:
+        {"status", "acknowledged", "rejected", "timed_out", "latency_ms", "message"}，
+        latency_ms 为从提交到收到确认的耗时，message 为 TWS 最近一条错误信息
+    """
+    if started is None:
+        started = time.perf_counter()
+    timed_out = await _wait_until(
+        trade,
+        lambda updates: trade.orderStatus.status in ACCEPTED_STATES or trade.isDone(),
+        started + timeout,
+    )
+
+    errors = [entry for entry in trade.log if entry.errorCode]
+    status = trade.orderStatus.status
+    return {
+        "status": status,
+        "acknowledged": status in ACCEPTED_STATES,
+        "rejected": trade.isDone() and status != OrderStatus.Filled,
+        "timed_out": timed_out,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        "message": errors[-1].message if errors else None,
+    }
+
+
+async def _wait_for_modify_ack(
+    trade: Trade, modify_index: int, timeout: float, started: float
+) -> dict:
+    """等待 TWS 回报修改结果：openOrder 或 Modified 状态表示已接受，
+    修改之后出现的错误表示被拒绝（原订单仍按原参数有效）"""
+
+    def modify_errors():
+        return [entry for entry in trade.log[modify_index:] if entry.errorCode]
+
+    def done(updates: List[str]) -> bool:
+        return (
+            "open_order" in updates
+            or any(entry.message == "Modified" for entry in trade.log[modify_index:])
+            or bool(modify_errors())
+            or trade.isDone()
+        )
+
+    timed_out = await _wait_until(trade, done, started + timeout)
+    errors = modify_errors()
+    return {
+        "status": trade.orderStatus.status,
+        "acknowledged": not timed_out and not errors and not trade.isDone(),
+        "rejected": bool(errors),
+        "timed_out": timed_out,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        "message": errors[-1].message if errors else None,
+    }
+
+
+async def _wait_until(
+    trade: Trade, predicate: Callable[[List[str]], bool], deadline: float
+) -> bool:
+    """等待订单的状态或 openOrder 回报，直到 predicate(已收到的回报) 为真
+
+    Returns:
+        是否在 deadline（time.perf_counter()）前超时
+    """
+    updates: List[str] = []
+    wake = asyncio.Event()
+
+    def on_status(updated: Trade):
+        updates.append("status")
+        wake.set()
+
+    def on_open_order(updated: Trade):
+        if updated is trade:
+            updates.append("open_order")
+            wake.set()
+
+    trade.statusEvent += on_status
+    ib.openOrderEvent += on_open_order
+    try:
+        while not predicate(updates):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return True
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), remaining)
+            except asyncio.TimeoutError:
+                return True
+        return False
+    finally:
+        trade.statusEvent -= on_status
+        ib.openOrderEvent -= on_open_order
+
+
+async def _submit_order(
+    contract, order: Order, ack: bool, ack_timeout: Optional[float]
+):
+    """提交订单；ack 为 True 时等待 TWS 确认后再返回真实结果
+
+    Returns:
+        (格式化的订单, Trade)；ack 模式下第二项为 {"trade": Trade, "ack": 确认结果}
+    """
+    started = time.perf_counter()
+    trade = ib.placeOrder(contract, order)
+    if not trade:
+        return None, None
+    result = None
+    if ack:
+        result = await wait_for_ack(
+            trade,
+            get_settings().ORDER_ACK_TIMEOUT if ack_timeout is None else ack_timeout,
+            started,
+        )
+    # 异步发送WebSocket通知
+    await _send_order_notification_async(trade, "创建")
+    if result is None:
+        return format_order_response(trade), trade
+    return format_order_response(trade), {"trade": trade, "ack": result}
+
+
 def format_order_response(trade: Trade):
     """格式化订单响应"""
     return f"""<orderStatus>
@@ -199,7 +555,7 @@ def format_order_response(trade: Trade):
             <description>Order quantity</description>
         </quantity>
         <price>
-            <value>{getattr(trade.order, "lmtPrice", None) or getattr(trade.order, "stopPrice", None)}</value>
+            <value>{order_price(trade.order)}</value>
             <description>Order price</description>
         </price>
         <status>
@@ -0,0 +1,127 @@
+from typing import Dict, Iterable, List, Optional
+from ib_async import Fill, OrderStatus, Trade
+from core import ib
+
+
+class OrderRegistry:
+    """订单索引
+
+    由 ib_async 的订单与成交事件维护，按 orderId、permId、标的和状态建立索引，
+    查找单个订单为 O(1)，按标的或状态筛选只访问对应分组，不再线性扫描 ib.trades()。
+    连接建立后用 ib.trades() 重建一次，以包含启动时同步的已有订单
+    """
+
+    def __init__(self):
+        # 以 Trade 对象的 id 为键，保持加入顺序
+        self._trades: Dict[int, Trade] = {}
+        self._by_order_id: Dict[int, Trade] = {}
+        self._by_perm_id: Dict[int, Trade] = {}
+        self._by_symbol: Dict[str, Dict[int, Trade]] = {}
+        self._by_status: Dict[str, Dict[int, Trade]] = {}
+        self._status: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._trades)
+
+    def add(self, trade: Trade):
+        """加入或更新订单的索引，重复调用只更新变化的部分"""
+        key = id(trade)
+        self._trades[key] = trade
+        if trade.order.orderId:
+            self._by_order_id[trade.order.orderId] = trade
+        if trade.order.permId:
+            self._by_perm_id[trade.order.permId] = trade
+        self._by_symbol.setdefault(trade.contract.symbol, {})[key] = trade
+
+        status = trade.orderStatus.status
+        previous = self._status.get(key)
+        if previous != status:
+            if previous is not None:
+                bucket = self._by_status[previous]
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._by_status[previous]
+            self._by_status.setdefault(status, {})[key] = trade
+            self._status[key] = status
+
+    def get(self, order_id: int) -> Optional[Trade]:
+        return self._by_order_id.get(order_id)
+
+    def get_by_perm_id(self, perm_id: int) -> Optional[Trade]:
+        return self._by_perm_id.get(perm_id)
+
+    def trades(self) -> List[Trade]:
+        return list(self._trades.values())
+
+    def find(
+        self,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None,
+        active: Optional[bool] = None,
+    ) -> List[Trade]:
+        """按标的、状态筛选订单，active 为 True/False 时只返回未完成/已完成的订单"""
+        if status is not None:
+            statuses: Optional[Iterable[str]] = [status]
+        elif active is not None:
+            statuses = [
+                s
+                for s in self._by_status
+                if (s in OrderStatus.ActiveStates) == active
+            ]
+        else:
+            statuses = None
+
+        if symbol is not None:
+            trades = self._by_symbol.get(symbol.upper(), {})
+            if statuses is None:
+                return list(trades.values())
+            wanted = set(statuses)
+            return [
+                trade for key, trade in trades.items() if self._status[key] in wanted
+            ]
+        if statuses is None:
+            return self.trades()
+        return [
+            trade
+            for s in statuses
+            for trade in self._by_status.get(s, {}).values()
+        ]
+
+    def rebuild(self, trades: Optional[Iterable[Trade]] = None):
+        """清空后按 trades（默认 ib.trades()）重建索引"""
+        self.clear()
+        for trade in ib.trades() if trades is None else trades:
+            self.add(trade)
+
+    def clear(self):
+        self._trades.clear()
+        self._by_order_id.clear()
+        self._by_perm_id.clear()
+        self._by_symbol.clear()
+        self._by_status.clear()
+        self._status.clear()
+
+    def stats(self) -> dict:
+        return {
+            "orders": len(self),
+            "by_status": {status: len(trades) for status, trades in self._by_status.items()},
+        }
+
+    def _on_trade(self, trade: Trade):
+        self.add(trade)
+
+    def _on_fill(self, trade: Trade, fill: Fill):
+        self.add(trade)
+
+    def _on_connected(self):
+        self.rebuild()
+
+
+order_registry = OrderRegistry()
+ib.newOrderEvent += order_registry._on_trade
+ib.openOrderEvent += order_registry._on_trade
+ib.orderModifyEvent += order_registry._on_trade
+ib.orderStatusEvent += order_registry._on_trade
+ib.cancelOrderEvent += order_registry._on_trade
+ib.execDetailsEvent += order_registry._on_fill
+ib.connectedEvent += order_registry._on_connected
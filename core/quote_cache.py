@@ -0,0 +1,170 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Sequence, Tuple
+from ib_async import Contract, Ticker
+from core import ib
+from core.config import get_settings
+from utils.logger import logger
+
+
+class QuoteLinesExhausted(Exception):
+    """行情线路已全部被占用"""
+
+
+@dataclass
+class _QuoteEntry:
+    contract: Contract
+    ticker: Ticker
+    ref_count: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class QuoteCache:
+    """实时行情订阅缓存
+
+    每个已识别合约（按 conId）只保持一个 reqMktData 订阅：
+    - 引用计数记录正在使用该 ticker 的调用方，使用中的订阅不会被回收
+    - 引用归零后订阅继续保留，空闲超过 idle_ttl 秒才取消
+    - 同时占用的行情线路不超过 max_lines，满额时回收最久未使用的空闲订阅
+    """
+
+    def __init__(self, idle_ttl: float, max_lines: int):
+        self.idle_ttl = idle_ttl
+        self.max_lines = max_lines
+        self._entries: Dict[int, _QuoteEntry] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def acquire(self, contract: Contract) -> Tuple[Ticker, bool]:
+        """获取合约的行情 ticker 并增加引用计数
+
+        Returns:
+            (ticker, fresh)，fresh 为 True 表示刚刚发起订阅，数据尚未到达
+        """
+        self.evict_idle()
+
+        entry = self._entries.get(contract.conId)
+        fresh = entry is None
+        if fresh:
+            self._misses += 1
+            if len(self._entries) >= self.max_lines:
+                self._evict_lru()
+            ticker = ib.reqMktData(contract)
+            entry = _QuoteEntry(contract, ticker)
+            self._entries[contract.conId] = entry
+            logger.debug(f"新建行情订阅: {contract.symbol} ({contract.conId})")
+        else:
+            self._hits += 1
+
+        entry.ref_count += 1
+        entry.last_used = time.monotonic()
+        return entry.ticker, fresh
+
+    def release(self, contract: Contract):
+        """释放一次引用，订阅保留到空闲超时"""
+        entry = self._entries.get(contract.conId)
+        if entry is None:
+            return
+        entry.ref_count = max(entry.ref_count - 1, 0)
+        entry.last_used = time.monotonic()
+        if entry.ref_count == 0:
+            self._schedule_eviction()
+
+    @contextmanager
+    def lease(self, contract: Contract) -> Iterator[Tuple[Ticker, bool]]:
+        """在 with 块内持有 ticker 引用"""
+        ticker, fresh = self.acquire(contract)
+        try:
+            yield ticker, fresh
+        finally:
+            self.release(contract)
+
+    def evict_idle(self):
+        """取消空闲超时的订阅"""
+        now = time.monotonic()
+        expired = [
+            con_id
+            for con_id, entry in self._entries.items()
+            if entry.ref_count == 0 and now - entry.last_used >= self.idle_ttl
+        ]
+        for con_id in expired:
+            self._cancel(con_id)
+
+    def clear(self):
+        """丢弃全部订阅（连接断开后订阅已失效，无需再取消）"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "lines_in_use": len(self._entries),
+            "max_lines": self.max_lines,
+            "leased": sum(1 for entry in self._entries.values() if entry.ref_count),
+            "hits": self._hits,
+            "misses": self._misses,
+            "symbols": [entry.contract.symbol for entry in self._entries.values()],
+        }
+
+    def _evict_lru(self):
+        idle = [
+            (entry.last_used, con_id)
+            for con_id, entry in self._entries.items()
+            if entry.ref_count == 0
+        ]
+        if not idle:
+            raise QuoteLinesExhausted(
+                f"行情线路已用尽（{self.max_lines} 条均在使用中）"
+            )
+        _, con_id = min(idle)
+        self._cancel(con_id)
+
+    def _cancel(self, con_id: int):
+        entry = self._entries.pop(con_id)
+        if ib.isConnected():
+            ib.cancelMktData(entry.contract)
+        logger.debug(f"取消行情订阅: {entry.contract.symbol} ({con_id})")
+
+    def _schedule_eviction(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_later(self.idle_ttl, self.evict_idle)
+
+
+def quote_ready(ticker: Ticker, fields: Sequence[str]) -> bool:
+    """判断 ticker 的指定字段是否都已有有效数据"""
+    for name in fields:
+        value = getattr(ticker, name, None)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return False
+    return True
+
+
+async def wait_for_quote(ticker: Ticker, fields: Sequence[str], timeout: float) -> bool:
+    """等待 ticker 更新事件直到指定字段就绪或超时
+
+    Returns:
+        字段是否在截止时间前全部就绪
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not quote_ready(ticker, fields):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        try:
+            await asyncio.wait_for(ticker.updateEvent, remaining)
+        except asyncio.TimeoutError:
+            return quote_ready(ticker, fields)
+    return True
+
+
+quote_cache = QuoteCache(
+    idle_ttl=get_settings().QUOTE_CACHE_IDLE_TTL,
+    max_lines=get_settings().QUOTE_CACHE_MAX_LINES,
+)
+ib.disconnectedEvent += quote_cache.clear
@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+from ib_async import Contract, RealTimeBar, RealTimeBarList
+from core import ib
+from core.bar_store import bar_time, parse_bar_size
+from core.config import get_settings
+from utils.logger import logger
+
+# reqRealTimeBars 只提供 5 秒K线
+BASE_BAR_SECONDS = 5
+
+BarListener = Callable[[Contract, Dict[str, dict]], None]
+
+
+class BarAggregator:
+    """把 5 秒K线聚合为更大周期
+
+    每收到一根 5 秒K线都返回当前周期的K线，complete 表示该周期已走完
+    （收到的是周期内最后一根 5 秒K线），无需等待下一根K线才确认收盘
+    """
+
+    def __init__(self, seconds: int):
+        if seconds % BASE_BAR_SECONDS:
+            raise ValueError(f"K线周期必须是 {BASE_BAR_SECONDS} 秒的整数倍: {seconds}")
+        self.seconds = seconds
+        self._bar: Optional[dict] = None
+        self._turnover = 0.0
+
+    def update(self, bar: dict) -> dict:
+        start = bar["time"] - bar["time"] % self.seconds
+        current = self._bar
+        if current is None or current["time"] != start:
+            current = self._bar = {
+                "time": start,
+                "open": bar["open"],
+                "high": bar["high"],
+                "low": bar["low"],
+                "close": bar["close"],
+                "volume": 0.0,
+                "wap": bar["wap"],
+                "count": 0,
+            }
+            self._turnover = 0.0
+        current["high"] = max(current["high"], bar["high"])
+        current["low"] = min(current["low"], bar["low"])
+        current["close"] = bar["close"]
+        current["volume"] += bar["volume"]
+        current["count"] += bar["count"]
+        self._turnover += bar["wap"] * bar["volume"]
+        if current["volume"] > 0:
+            current["wap"] = self._turnover / current["volume"]
+        complete = (bar["time"] + BASE_BAR_SECONDS) % self.seconds == 0
+        return {**current, "complete": complete}
+
+
+def realtime_bar_dict(bar: RealTimeBar) -> dict:
+    return {
+        "time": bar_time(bar.time),
+        "open": bar.open_,
+        "high": bar.high,
+        "low": bar.low,
+        "close": bar.close,
+        "volume": float(bar.volume),
+        "wap": bar.wap,
+        "count": bar.count,
+    }
+
+
+@dataclass
+class _BarSubscription:
+    contract: Contract
+    bars: RealTimeBarList
+    aggregators: Dict[str, BarAggregator]
+    ref_count: int = 0
+    last_bar: Dict[str, dict] = field(default_factory=dict)
+
+
+class RealTimeBarHub:
+    """实时K线订阅中心
+
+    每个合约（按 conId）只保持一个 reqRealTimeBars 订阅，由所有客户端共享；
+    每根 5 秒K线到达后在服务端聚合为 bar_sizes 中的各个周期，
+    以 {bar_size: bar} 通知 listeners。最后一个引用释放时取消订阅
+    """
+
+    def __init__(self, bar_sizes: Sequence[str], what_to_show: str, use_rth: bool):
+        self.bar_sizes = list(bar_sizes)
+        self.what_to_show = what_to_show
+        self.use_rth = use_rth
+        self._seconds = {size: parse_bar_size(size) for size in self.bar_sizes}
+        self._subscriptions: Dict[int, _BarSubscription] = {}
+        self._listeners: List[BarListener] = []
+
+    def add_listener(self, listener: BarListener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def acquire(self, contract: Contract) -> Dict[str, dict]:
+        """增加合约的引用计数，首次引用时发起订阅
+
+        Returns:
+            各周期最近一次推送的K线，新订阅为空
+        """
+        subscription = self._subscriptions.get(contract.conId)
+        if subscription is None:
+            bars = ib.reqRealTimeBars(
+                contract, BASE_BAR_SECONDS, self.what_to_show, self.use_rth
+            )
+            subscription = _BarSubscription(
+                contract,
+                bars,
+                {
+                    size: BarAggregator(seconds)
+                    for size, seconds in self._seconds.items()
+                    if seconds != BASE_BAR_SECONDS
+                },
+            )
+            bars.updateEvent += self._make_handler(subscription)
+            self._subscriptions[contract.conId] = subscription
+            logger.debug(f"新建实时K线订阅: {contract.symbol} ({contract.conId})")
+        subscription.ref_count += 1
+        return dict(subscription.last_bar)
+
+    def release(self, contract: Contract):
+        """释放一次引用，没有引用时取消订阅"""
+        subscription = self._subscriptions.get(contract.conId)
+        if subscription is None:
+            return
+        subscription.ref_count -= 1
+        if subscription.ref_count <= 0:
+            del self._subscriptions[contract.conId]
+            subscription.bars.updateEvent.clear()
+            if ib.isConnected():
+                ib.cancelRealTimeBars(subscription.bars)
+            logger.debug(f"取消实时K线订阅: {contract.symbol} ({contract.conId})")
+
+    def clear(self):
+        """丢弃全部订阅（连接断开后订阅已失效，无需再取消）"""
+        for subscription in self._subscriptions.values():
+            subscription.bars.updateEvent.clear()
+        self._subscriptions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "bar_sizes": self.bar_sizes,
+            "subscriptions": [
+                {
+                    "symbol": subscription.contract.symbol,
+                    "ref_count": subscription.ref_count,
+                }
+                for subscription in self._subscriptions.values()
+            ],
+        }
+
+    def _make_handler(self, subscription: _BarSubscription):
+        def on_bar(bars: RealTimeBarList, has_new_bar: bool):
+            if not has_new_bar:
+                return
+            for raw in list(bars):
+                bar = realtime_bar_dict(raw)
+                updates = {}
+                for size in self.bar_sizes:
+                    aggregator = subscription.aggregators.get(size)
+                    updates[size] = (
+                        aggregator.update(bar) if aggregator else {**bar, "complete": True}
+                    )
+                subscription.last_bar.update(updates)
+                for listener in list(self._listeners):
+                    try:
+                        listener(subscription.contract, updates)
+                    except Exception as e:
+                        logger.error(
+                            f"实时K线推送失败: {subscription.contract.symbol} {str(e)}"
+                        )
+            # RealTimeBarList 会无限增长，处理后即清空
+            bars.clear()
+
+        return on_bar
+
+
+realtime_bar_hub = RealTimeBarHub(
+    bar_sizes=get_settings().REALTIME_BAR_SIZES,
+    what_to_show=get_settings().REALTIME_BAR_WHAT_TO_SHOW,
+    use_rth=get_settings().REALTIME_BAR_USE_RTH,
+)
+ib.disconnectedEvent += realtime_bar_hub.clear
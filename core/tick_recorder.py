@@ -0,0 +1,285 @@
+import asyncio
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ib_async import Contract, Ticker, TickByTickAllLast, TickByTickBidAsk
+from core import ib
+from core.config import get_settings
+from core.contract_cache import qualify_stocks
+from utils.logger import logger
+
+# 逐笔记录类型
+KIND_TRADE = 1
+KIND_QUOTE = 2
+TICK_KINDS = {"trade": KIND_TRADE, "quote": KIND_QUOTE}
+
+# 定长逐笔记录：seq 为写入序号，time 为 UTC 纳秒；
+# 成交记录使用 price/size，报价记录使用 bid/bid_size/ask/ask_size；
+# flags 位 0/1 为成交的 pastLimit/unreported，或报价的 bidPastLow/askPastHigh
+TICK_DTYPE = np.dtype(
+    [
+        ("seq", "<i8"),
+        ("time", "<i8"),
+        ("kind", "u1"),
+        ("flags", "u1"),
+        ("price", "<f8"),
+        ("size", "<f8"),
+        ("bid", "<f8"),
+        ("bid_size", "<f8"),
+        ("ask", "<f8"),
+        ("ask_size", "<f8"),
+    ]
+)
+_HEADER_DTYPE = np.dtype([("magic", "S8"), ("capacity", "<i8"), ("count", "<i8")])
+_HEADER_BYTES = 64
+_MAGIC = b"IBTICKS1"
+_NAN = float("nan")
+
+
+class TickRing:
+    """单个标的的逐笔环形文件
+
+    文件由 64 字节头部（容量与累计写入条数）和 capacity 条定长记录组成，
+    通过 memmap 直接读写：追加只写入新记录和头部计数，写满后覆盖最旧的记录。
+    只读打开的进程可以在写入进程运行时查询，头部计数在记录写完后才更新
+    """
+
+    def __init__(self, path: str, capacity: int = 0, readonly: bool = False):
+        self.path = Path(path)
+        if not self.path.exists():
+            if readonly:
+                raise FileNotFoundError(f"逐笔文件不存在: {path}")
+            self._create(capacity)
+        mode = "r" if readonly else "r+"
+        self._header = np.memmap(self.path, _HEADER_DTYPE, mode, shape=(1,))
+        if self._header["magic"][0] != _MAGIC:
+            raise ValueError(f"无效的逐笔文件: {path}")
+        self.capacity = int(self._header["capacity"][0])
+        self._records = np.memmap(
+            self.path, TICK_DTYPE, mode, offset=_HEADER_BYTES, shape=(self.capacity,)
+        )
+
+    @property
+    def count(self) -> int:
+        """累计写入条数（含已被覆盖的记录）"""
+        return int(self._header["count"][0])
+
+    def append(self, records: np.ndarray):
+        """追加一批记录，seq 按写入顺序自动编号"""
+        n = len(records)
+        if not n:
+            return
+        count = self.count
+        if n > self.capacity:
+            records = records[-self.capacity :]
+            count += n - self.capacity
+            n = self.capacity
+        records = records.copy()
+        records["seq"] = np.arange(count, count + n)
+
+        start = count % self.capacity
+        first = min(n, self.capacity - start)
+        self._records[start : start + first] = records[:first]
+        self._records[: n - first] = records[first:]
+        self._header["count"] = count + n
+
+    def read(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        kind: Optional[int] = None,
+        after_seq: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> np.ndarray:
+        """按时间（UTC 纳秒，左闭右开）、类型和序号查询，结果按写入顺序排列
+
+        Args:
+            after_seq: 只返回 seq 大于该值的记录，用于分页续读
+            limit: 最多返回的条数（取最早的记录）
+        """
+        count = self.count
+        head = count % self.capacity
+        # 写满后最旧的记录从 head 开始
+        segments = (
+            [self._records[head:], self._records[:head]]
+            if count > self.capacity
+            else [self._records[:count]]
+        )
+        selected = []
+        remaining = limit
+        for segment in segments:
+            mask = np.ones(len(segment), dtype=bool)
+            if start is not None:
+                mask &= segment["time"] >= start
+            if end is not None:
+                mask &= segment["time"] < end
+            if kind is not None:
+                mask &= segment["kind"] == kind
+            if after_seq is not None:
+                mask &= segment["seq"] > after_seq
+            rows = segment[mask]
+            if remaining is not None:
+                rows = rows[:remaining]
+                remaining -= len(rows)
+            selected.append(np.array(rows))
+            if remaining == 0:
+                break
+        return np.concatenate(selected) if selected else np.empty(0, TICK_DTYPE)
+
+    def flush(self):
+        self._records.flush()
+        self._header.flush()
+
+    def _create(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("逐笔文件容量必须大于 0")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            header = np.zeros(1, _HEADER_DTYPE)
+            header["magic"], header["capacity"] = _MAGIC, capacity
+            f.write(header.tobytes().ljust(_HEADER_BYTES, b"\0"))
+            # 稀疏文件，未写入的部分不占磁盘
+            f.truncate(_HEADER_BYTES + capacity * TICK_DTYPE.itemsize)
+
+
+def ticks_to_records(ticks: Sequence) -> np.ndarray:
+    """把 ticker.tickByTicks 中的成交与买卖报价转为定长记录，其他类型忽略"""
+    rows = []
+    for tick in ticks:
+        time_ns = int(tick.time.timestamp() * 1_000_000) * 1000
+        if isinstance(tick, TickByTickAllLast):
+            attrib = tick.tickAttribLast
+            flags = attrib.pastLimit | attrib.unreported << 1
+            rows.append(
+                (0, time_ns, KIND_TRADE, flags, tick.price, tick.size, _NAN, _NAN, _NAN, _NAN)
+            )
+        elif isinstance(tick, TickByTickBidAsk):
+            attrib = tick.tickAttribBidAsk
+            flags = attrib.bidPastLow | attrib.askPastHigh << 1
+            rows.append(
+                (
+                    0,
+                    time_ns,
+                    KIND_QUOTE,
+                    flags,
+                    _NAN,
+                    _NAN,
+                    tick.bidPrice,
+                    tick.bidSize,
+                    tick.askPrice,
+                    tick.askSize,
+                )
+            )
+    return np.array(rows, dtype=TICK_DTYPE)
+
+
+class TickRecorder:
+    """逐笔成交与报价录制器
+
+    为每个标的订阅 reqTickByTickData 的 AllLast 与 BidAsk，
+    每批事件转为定长记录后直接追加到该标的的环形文件，不经过 Python 对象列表或日志
+    """
+
+    def __init__(self, root: str, capacity: int):
+        self.root = Path(root)
+        self.capacity = capacity
+        self._rings: Dict[str, TickRing] = {}
+        self._tickers: Dict[str, Tuple[Ticker, Callable[[Ticker], None]]] = {}
+        self._contracts: Dict[str, Contract] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._contracts)
+
+    def ring_path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper()}.ticks"
+
+    async def start(
+        self, symbols: Sequence[str], exchange: str = "SMART", currency: str = "USD"
+    ) -> List[str]:
+        """开始录制，已在录制的标的跳过
+
+        Returns:
+            本次新开始录制的标的
+        """
+        pending = [s.upper() for s in symbols if s.upper() not in self._contracts]
+        started = []
+        for symbol, contract in zip(
+            pending, await qualify_stocks(pending, exchange, currency)
+        ):
+            if not contract.conId:
+                logger.warning(f"逐笔录制跳过无法识别的合约: {symbol}")
+                continue
+            ring = self._rings.get(symbol) or TickRing(
+                str(self.ring_path(symbol)), self.capacity
+            )
+            self._rings[symbol] = ring
+            ib.reqTickByTickData(contract, "AllLast")
+            ticker = ib.reqTickByTickData(contract, "BidAsk")
+            handler = self._make_handler(ring)
+            ticker.updateEvent += handler
+            self._tickers[symbol] = (ticker, handler)
+            self._contracts[symbol] = contract
+            started.append(symbol)
+        if started:
+            logger.info(f"开始逐笔录制: {started}")
+        return started
+
+    def stop(self, symbols: Optional[Sequence[str]] = None):
+        """停止录制并把数据刷到磁盘，symbols 为空时停止全部"""
+        for symbol in [s.upper() for s in symbols] if symbols else self.symbols:
+            contract = self._contracts.pop(symbol, None)
+            if contract is None:
+                continue
+            ticker, handler = self._tickers.pop(symbol)
+            ticker.updateEvent -= handler
+            if ib.isConnected():
+                ib.cancelTickByTickData(contract, "AllLast")
+                ib.cancelTickByTickData(contract, "BidAsk")
+            self._rings[symbol].flush()
+            logger.info(f"停止逐笔录制: {symbol}")
+
+    def read(self, symbol: str, **query) -> np.ndarray:
+        """查询逐笔记录，正在录制的标的直接读取内存映射，否则只读打开文件"""
+        symbol = symbol.upper()
+        ring = self._rings.get(symbol) or TickRing(str(self.ring_path(symbol)), readonly=True)
+        return ring.read(**query)
+
+    def stats(self) -> dict:
+        return {
+            "recording": self.symbols,
+            "capacity": self.capacity,
+            "record_bytes": TICK_DTYPE.itemsize,
+            "rings": {
+                symbol: {"count": ring.count, "capacity": ring.capacity}
+                for symbol, ring in self._rings.items()
+            },
+        }
+
+    def _make_handler(self, ring: TickRing):
+        def on_update(ticker: Ticker):
+            if ticker.tickByTicks:
+                ring.append(ticks_to_records(ticker.tickByTicks))
+
+        return on_update
+
+    def _on_disconnected(self):
+        # 连接断开后订阅已失效，重连时重新订阅
+        for symbol in self.symbols:
+            ticker, handler = self._tickers.pop(symbol)
+            ticker.updateEvent -= handler
+            self._contracts.pop(symbol)
+            self._rings[symbol].flush()
+
+    def _on_connected(self):
+        symbols = get_settings().TICK_RECORDER_SYMBOLS
+        if symbols:
+            asyncio.ensure_future(self.start(symbols))
+
+
+tick_recorder = TickRecorder(
+    root=get_settings().TICK_RECORDER_DIR,
+    capacity=get_settings().TICK_RING_CAPACITY,
+)
+ib.connectedEvent += tick_recorder._on_connected
+ib.disconnectedEvent += tick_recorder._on_disconnected
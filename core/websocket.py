@@ -3,8 +3,14 @@ import json
 from datetime import datetime
 from typing import Dict, Set, Optional, List
 from fastapi import WebSocket, WebSocketDisconnect
-from ib_async import Trade
+from ib_async import CommissionReport, Contract, Fill, Trade
 from core import ib
+from core.config import get_settings
+from core.contract_cache import qualify_stock
+from core.market_depth import DepthLinesExhausted, depth_cache
+from core.order_registry import order_registry
+from core.realtime_bars import realtime_bar_hub
+from utils.data_convert import format_trade, order_price
 from utils.logger import logger
 
 
@@ -16,12 +22,22 @@ class WebSocketManager:
         self.active_connections: Dict[str, WebSocket] = {}
         # 订阅的消息类型
         self.subscriptions: Dict[str, Set[str]] = {}
-        # 订单监听任务
-        self._order_monitoring_task: Optional[asyncio.Task] = None
         # 市场数据监听任务
         self._market_data_task: Optional[asyncio.Task] = None
-        # 上一次的订单状态
-        self._last_order_states: Dict[int, str] = {}
+        # 订单事件：有客户端订阅 order_update 时才挂在 ib 事件上，按到达顺序排队推送
+        self._order_events_attached = False
+        self._order_queue: Optional[asyncio.Queue] = None
+        self._order_task: Optional[asyncio.Task] = None
+        # 盘口深度订阅：conId -> 客户端，客户端 -> {conId: 合约}
+        self._depth_clients: Dict[int, Set[str]] = {}
+        self._client_depth: Dict[str, Dict[int, Contract]] = {}
+        # 实时K线订阅：conId -> {客户端: K线周期}，客户端 -> {conId: 合约}
+        self._bar_clients: Dict[int, Dict[str, Set[str]]] = {}
+        self._client_bars: Dict[str, Dict[int, Contract]] = {}
+        self._market_data_queue: Optional[asyncio.Queue] = None
+        # 盘口增量按到达顺序排队推送
+        self._depth_queue: Optional[asyncio.Queue] = None
+        self._depth_task: Optional[asyncio.Task] = None
 
     async def connect(self, websocket: WebSocket, client_id: str):
         """建立WebSocket连接"""
@@ -44,15 +60,6 @@ class WebSocketManager:
                 },
             )
 
-            # 启动订单监听（如果还没有启动）
-            if (
-                self._order_monitoring_task is None
-                or self._order_monitoring_task.done()
-            ):
-                self._order_monitoring_task = asyncio.create_task(
-                    self._monitor_orders()
-                )
-
         except Exception as e:
             logger.error(f"WebSocket连接失败: {str(e)}")
             raise
@@ -63,15 +70,24 @@ class WebSocketManager:
             del self.active_connections[client_id]
         if client_id in self.subscriptions:
             del self.subscriptions[client_id]
+        for contract in list(self._client_depth.get(client_id, {}).values()):
+            self._release_depth(client_id, contract)
+        self._client_depth.pop(client_id, None)
+        for contract in list(self._client_bars.get(client_id, {}).values()):
+            self._release_bars(client_id, contract)
+        self._client_bars.pop(client_id, None)
+        self._sync_order_events()
 
         logger.info(f"客户端 {client_id} 已断开WebSocket连接")
 
         # 如果没有活跃连接，停止监听任务
         if not self.active_connections:
-            if self._order_monitoring_task and not self._order_monitoring_task.done():
-                self._order_monitoring_task.cancel()
+            if self._order_task and not self._order_task.done():
+                self._order_task.cancel()
             if self._market_data_task and not self._market_data_task.done():
                 self._market_data_task.cancel()
+            if self._depth_task and not self._depth_task.done():
+                self._depth_task.cancel()
 
     async def send_to_client(self, client_id: str, message: dict):
         """向特定客户端发送消息"""
@@ -115,6 +131,7 @@ class WebSocketManager:
 
         for msg_type in message_types:
             self.subscriptions[client_id].add(msg_type)
+        self._sync_order_events()
 
         logger.info(f"客户端 {client_id} 订阅了消息类型: {message_types}")
 
@@ -134,6 +151,7 @@ class WebSocketManager:
         if client_id in self.subscriptions:
             for msg_type in message_types:
                 self.subscriptions[client_id].discard(msg_type)
+        self._sync_order_events()
 
         logger.info(f"客户端 {client_id} 取消订阅了消息类型: {message_types}")
 
@@ -148,64 +166,266 @@ class WebSocketManager:
             },
         )
 
-    async def _monitor_orders(self):
-        """监听订单状态变化"""
-        logger.info("开始监听订单状态变化")
-
-        while self.active_connections:
+    async def subscribe_depth(
+        self, client_id: str, symbol: str, exchange: str = "SMART", currency: str = "USD"
+    ):
+        """客户端订阅盘口深度
+
+        先推送一次 depth_snapshot，之后只推送 depth_update 增量。
+        同一合约的深度订阅在所有客户端之间共享；客户端应丢弃 seq 不大于快照 seq 的增量，
+        发现 seq 不连续时重新订阅以获取新快照
+        """
+        contract = await qualify_stock(symbol, exchange, currency)
+        if contract.conId not in self._client_depth.get(client_id, {}):
             try:
-                if ib.isConnected():
-                    # 获取当前所有订单
-                    trades = ib.trades()
+                depth_cache.acquire(contract)
+            except DepthLinesExhausted as e:
+                await self.send_to_client(
+                    client_id,
+                    {
+                        "type": "error",
+                        "message": str(e),
+                        "timestamp": datetime.now().isoformat(),
+                    },
+                )
+                return
+            depth_cache.add_listener(self._on_depth_delta)
+            self._client_depth.setdefault(client_id, {})[contract.conId] = contract
+            self._depth_clients.setdefault(contract.conId, set()).add(client_id)
+            logger.info(f"客户端 {client_id} 订阅了盘口深度: {contract.symbol}")
+
+        book = depth_cache.get(contract.conId)
+        if not book.seq:
+            await depth_cache.wait_for_book(
+                contract, get_settings().DEPTH_READY_TIMEOUT
+            )
+        await self.send_to_client(
+            client_id,
+            {
+                "type": "depth_snapshot",
+                "symbol": contract.symbol,
+                "data": book.snapshot(),
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
 
-                    for trade in trades:
-                        perm_id = trade.order.permId
-                        current_status = trade.orderStatus.status
-
-                        # 检查订单状态是否有变化
-                        if (
-                            perm_id not in self._last_order_states
-                            or self._last_order_states[perm_id] != current_status
-                        ):
-                            # 更新订单状态记录
-                            self._last_order_states[perm_id] = current_status
-
-                            # 准备订单状态消息
-                            order_message = {
-                                "type": "order_update",
-                                "data": {
-                                    "perm_id": perm_id,
-                                    "order_id": trade.order.orderId,
-                                    "symbol": trade.contract.symbol,
-                                    "action": trade.order.action,
-                                    "quantity": trade.order.totalQuantity,
-                                    "order_type": trade.order.orderType,
-                                    "status": current_status,
-                                    "filled": trade.filled(),
-                                    "remaining": trade.remaining(),
-                                    "avg_fill_price": trade.orderStatus.avgFillPrice,
-                                    "price": (
-                                        getattr(trade.order, "lmtPrice", None)
-                                        or getattr(trade.order, "stopPrice", None)
-                                    ),
-                                    "why_held": trade.orderStatus.whyHeld,
-                                },
-                                "timestamp": datetime.now().isoformat(),
-                            }
+    async def unsubscribe_depth(
+        self, client_id: str, symbol: str, exchange: str = "SMART", currency: str = "USD"
+    ):
+        """客户端取消订阅盘口深度"""
+        contract = await qualify_stock(symbol, exchange, currency)
+        self._release_depth(client_id, contract)
+        logger.info(f"客户端 {client_id} 取消订阅了盘口深度: {contract.symbol}")
 
-                            # 广播订单状态更新
-                            await self.broadcast(order_message, "order_update")
+        await self.send_to_client(
+            client_id,
+            {
+                "type": "depth_unsubscription",
+                "status": "success",
+                "symbol": contract.symbol,
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
 
-                            logger.info(f"订单 {perm_id} 状态更新: {current_status}")
+    def _release_depth(self, client_id: str, contract: Contract):
+        if self._client_depth.get(client_id, {}).pop(contract.conId, None) is None:
+            return
+        clients = self._depth_clients.get(contract.conId, set())
+        clients.discard(client_id)
+        if not clients:
+            self._depth_clients.pop(contract.conId, None)
+        depth_cache.release(contract)
+
+    def _on_depth_delta(self, contract: Contract, deltas: List[dict], seq: int):
+        """深度事件回调：只把有客户端订阅的合约增量放入推送队列"""
+        if not self._depth_clients.get(contract.conId):
+            return
+        if self._depth_task is None or self._depth_task.done():
+            self._depth_queue = asyncio.Queue()
+            self._depth_task = asyncio.create_task(self._push_depth())
+        self._depth_queue.put_nowait((contract, deltas, seq))
+
+    async def _push_depth(self):
+        """按到达顺序推送盘口增量，保证同一合约的 seq 有序"""
+        while True:
+            contract, deltas, seq = await self._depth_queue.get()
+            clients = self._depth_clients.get(contract.conId)
+            if not clients:
+                continue
+            message = {
+                "type": "depth_update",
+                "symbol": contract.symbol,
+                "data": {"seq": seq, "deltas": deltas},
+                "timestamp": datetime.now().isoformat(),
+            }
+            await asyncio.gather(
+                *(self.send_to_client(client_id, message) for client_id in list(clients)),
+                return_exceptions=True,
+            )
 
-                # 等待一段时间再检查
-                await asyncio.sleep(1)
+    async def subscribe_bars(
+        self,
+        client_id: str,
+        symbol: str,
+        bar_sizes: Optional[List[str]] = None,
+        exchange: str = "SMART",
+        currency: str = "USD",
+    ):
+        """客户端订阅实时K线
+
+        同一合约只保持一个 reqRealTimeBars 订阅，5 秒K线在服务端聚合为
+        1 分钟、5 分钟等周期，通过 market_data 消息推送给订阅了该合约的客户端
+        """
+        bar_sizes = bar_sizes or realtime_bar_hub.bar_sizes
+        unknown = set(bar_sizes) - set(realtime_bar_hub.bar_sizes)
+        if unknown:
+            raise ValueError(
+                f"不支持的K线周期: {sorted(unknown)}，可选: {realtime_bar_hub.bar_sizes}"
+            )
+        contract = await qualify_stock(symbol, exchange, currency)
+        if client_id in self._bar_clients.get(contract.conId, {}):
+            latest = {}
+        else:
+            # acquire 失败时不留下空的订阅记录
+            latest = realtime_bar_hub.acquire(contract)
+            realtime_bar_hub.add_listener(self._on_realtime_bar)
+            self._client_bars.setdefault(client_id, {})[contract.conId] = contract
+        clients = self._bar_clients.setdefault(contract.conId, {})
+        clients[client_id] = set(bar_sizes)
+        logger.info(f"客户端 {client_id} 订阅了实时K线: {contract.symbol} {bar_sizes}")
 
-            except Exception as e:
-                logger.error(f"订单监听过程中出现错误: {str(e)}")
-                await asyncio.sleep(5)  # 错误时等待更长时间
+        await self.send_to_client(
+            client_id,
+            {
+                "type": "bars_subscription",
+                "status": "success",
+                "symbol": contract.symbol,
+                "bar_sizes": bar_sizes,
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
+        latest = {size: bar for size, bar in latest.items() if size in clients[client_id]}
+        if latest:
+            await self.send_market_data(contract.symbol, latest, client_id)
+
+    async def unsubscribe_bars(
+        self, client_id: str, symbol: str, exchange: str = "SMART", currency: str = "USD"
+    ):
+        """客户端取消订阅实时K线"""
+        contract = await qualify_stock(symbol, exchange, currency)
+        self._release_bars(client_id, contract)
+        logger.info(f"客户端 {client_id} 取消订阅了实时K线: {contract.symbol}")
 
-        logger.info("订单监听任务结束")
+        await self.send_to_client(
+            client_id,
+            {
+                "type": "bars_unsubscription",
+                "status": "success",
+                "symbol": contract.symbol,
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
+
+    def _release_bars(self, client_id: str, contract: Contract):
+        if self._client_bars.get(client_id, {}).pop(contract.conId, None) is None:
+            return
+        clients = self._bar_clients.get(contract.conId, {})
+        clients.pop(client_id, None)
+        if not clients:
+            self._bar_clients.pop(contract.conId, None)
+        realtime_bar_hub.release(contract)
+
+    def _on_realtime_bar(self, contract: Contract, updates: Dict[str, dict]):
+        """实时K线回调：放入推送队列，按到达顺序推送"""
+        if not self._bar_clients.get(contract.conId):
+            return
+        if self._market_data_task is None or self._market_data_task.done():
+            self._market_data_queue = asyncio.Queue()
+            self._market_data_task = asyncio.create_task(self._push_market_data())
+        self._market_data_queue.put_nowait((contract, updates))
+
+    async def _push_market_data(self):
+        """每个客户端只收到自己订阅的K线周期"""
+        while True:
+            contract, updates = await self._market_data_queue.get()
+            sends = []
+            for client_id, bar_sizes in list(self._bar_clients.get(contract.conId, {}).items()):
+                data = {size: bar for size, bar in updates.items() if size in bar_sizes}
+                if data:
+                    sends.append(self.send_market_data(contract.symbol, data, client_id))
+            if sends:
+                await asyncio.gather(*sends, return_exceptions=True)
+
+    def _sync_order_events(self):
+        """有客户端订阅 order_update 时挂上订单事件，没有时全部摘除"""
+        wanted = any("order_update" in subs for subs in self.subscriptions.values())
+        if wanted == self._order_events_attached:
+            return
+        if wanted:
+            ib.orderStatusEvent += self._on_order_status
+            ib.execDetailsEvent += self._on_exec_details
+            ib.commissionReportEvent += self._on_commission_report
+            logger.info("开始推送订单事件")
+        else:
+            ib.orderStatusEvent -= self._on_order_status
+            ib.execDetailsEvent -= self._on_exec_details
+            ib.commissionReportEvent -= self._on_commission_report
+            logger.info("停止推送订单事件")
+        self._order_events_attached = wanted
+
+    def _on_order_status(self, trade: Trade):
+        self._queue_order_update(trade, "status")
+
+    def _on_exec_details(self, trade: Trade, fill: Fill):
+        execution = fill.execution
+        self._queue_order_update(
+            trade,
+            "fill",
+            {
+                "exec_id": execution.execId,
+                "time": execution.time.isoformat(),
+                "side": execution.side,
+                "shares": execution.shares,
+                "price": execution.price,
+                "cum_qty": execution.cumQty,
+                "avg_price": execution.avgPrice,
+                "exchange": execution.exchange,
+            },
+        )
+
+    def _on_commission_report(self, trade: Trade, fill: Fill, report: CommissionReport):
+        self._queue_order_update(
+            trade,
+            "commission",
+            {
+                "exec_id": report.execId,
+                "commission": report.commission,
+                "currency": report.currency,
+                "realized_pnl": report.realizedPNL,
+            },
+        )
+
+    def _queue_order_update(self, trade: Trade, event: str, detail: Optional[dict] = None):
+        """订单事件回调：在事件发生时生成消息，放入推送队列"""
+        data = {**format_trade(trade), "why_held": trade.orderStatus.whyHeld}
+        if detail is not None:
+            data[event] = detail
+        message = {
+            "type": "order_update",
+            "event": event,
+            "data": data,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if self._order_task is None or self._order_task.done():
+            self._order_queue = asyncio.Queue()
+            self._order_task = asyncio.create_task(self._push_orders())
+        self._order_queue.put_nowait(message)
+
+    async def _push_orders(self):
+        """按 TWS 报告的顺序推送订单更新"""
+        while True:
+            message = await self._order_queue.get()
+            await self.broadcast(message, "order_update")
 
     async def send_order_notification(self, trade: Trade, action: str = "created"):
         """发送订单通知"""
@@ -219,10 +439,7 @@ class WebSocketManager:
                 "quantity": trade.order.totalQuantity,
                 "order_type": trade.order.orderType,
                 "status": trade.orderStatus.status,
-                "price": (
-                    getattr(trade.order, "lmtPrice", None)
-                    or getattr(trade.order, "stopPrice", None)
-                ),
+                "price": order_price(trade.order),
             },
             "message": f"订单{action}成功",
             "timestamp": datetime.now().isoformat(),
@@ -240,8 +457,10 @@ class WebSocketManager:
 
         await self.broadcast(message, "account_update")
 
-    async def send_market_data(self, symbol: str, market_data: dict):
-        """发送市场数据"""
+    async def send_market_data(
+        self, symbol: str, market_data: dict, client_id: Optional[str] = None
+    ):
+        """发送市场数据，指定 client_id 时只发给该客户端"""
         message = {
             "type": "market_data",
             "symbol": symbol,
@@ -249,7 +468,10 @@ class WebSocketManager:
             "timestamp": datetime.now().isoformat(),
         }
 
-        await self.broadcast(message, "market_data")
+        if client_id is not None:
+            await self.send_to_client(client_id, message)
+        else:
+            await self.broadcast(message, "market_data")
 
     async def send_error_notification(self, error_message: str, error_code: str = None):
         """发送错误通知"""
@@ -275,6 +497,35 @@ class WebSocketManager:
                 message_types = message.get("message_types", [])
                 await self.unsubscribe(client_id, message_types)
 
+            elif msg_type in ("subscribe_depth", "unsubscribe_depth"):
+                symbol = message.get("symbol")
+                if not symbol:
+                    raise ValueError("缺少 symbol")
+                handler = (
+                    self.subscribe_depth
+                    if msg_type == "subscribe_depth"
+                    else self.unsubscribe_depth
+                )
+                await handler(
+                    client_id,
+                    symbol,
+                    message.get("exchange", "SMART"),
+                    message.get("currency", "USD"),
+                )
+
+            elif msg_type in ("subscribe_bars", "unsubscribe_bars"):
+                symbol = message.get("symbol")
+                if not symbol:
+                    raise ValueError("缺少 symbol")
+                exchange = message.get("exchange", "SMART")
+                currency = message.get("currency", "USD")
+                if msg_type == "subscribe_bars":
+                    await self.subscribe_bars(
+                        client_id, symbol, message.get("bar_sizes"), exchange, currency
+                    )
+                else:
+                    await self.unsubscribe_bars(client_id, symbol, exchange, currency)
+
             elif msg_type == "ping":
                 # 心跳检测
                 await self.send_to_client(
@@ -284,7 +535,9 @@ class WebSocketManager:
             elif msg_type == "get_orders":
                 # 获取当前订单状态
                 if ib.isConnected():
-                    trades = ib.trades()
+                    trades = order_registry.find(
+                        message.get("symbol"), message.get("status"), message.get("active")
+                    )
                     orders_data = []
                     for trade in trades:
                         orders_data.append(
@@ -298,10 +551,7 @@ class WebSocketManager:
                                 "filled": trade.filled(),
                                 "remaining": trade.remaining(),
                                 "avg_fill_price": trade.orderStatus.avgFillPrice,
-                                "price": (
-                                    getattr(trade.order, "lmtPrice", None)
-                                    or getattr(trade.order, "stopPrice", None)
-                                ),
+                                "price": order_price(trade.order),
                             }
                         )
 
@@ -1,14 +1,30 @@
 # 创建 MCP 实例
-from fastmcp import FastMCP
+import json
+from fastmcp import FastMCP, Context
 from core.info_operate import get_portfolio, get_pnl, get_account_summary
 from core.order_operate import (
     place_limit_order,
     place_market_order,
+    place_batch_orders,
     cancel_order,
     get_order_status,
 )
 from core.websocket import websocket_manager
-from core.market_data_operate import get_stock_quote, get_historical_data
+from core.market_data_operate import (
+    get_stock_quote,
+    get_stock_quotes,
+    get_historical_data,
+    get_historical_bars,
+    format_bars_columnar,
+    format_bars_csv,
+    backfill_historical_data,
+    get_indicators,
+    get_option_chain_snapshot,
+    get_option_surface,
+)
+from core.fundamental_operate import get_fundamental_bundle
+from core.fundamental_screener import universe_table
+from utils.data_convert import format_table, order_price
 
 mcp = FastMCP(
     name="trading",
@@ -65,16 +81,150 @@ async def request_stock_quote(symbol: str) -> str:
 
 
 @mcp.tool()
-async def request_historical_data(symbol: str, duration: str, bar_size: str) -> str:
+async def request_stock_quotes(symbols: list[str]) -> str:
+    """
+    Request quotes for multiple symbols in one call
+    Args:
+        symbols: Stock symbols, e.g. ["AAPL", "MSFT"]
+    Returns:
+        CSV table with one row per symbol; the status column is "ok",
+        "timeout" (partial data) or an error message
+    """
+    table, _ = await get_stock_quotes(symbols)
+    return table
+
+
+@mcp.tool()
+async def request_historical_data(
+    symbol: str, duration: str, bar_size: str, format: str = "xml"
+) -> str:
     """
     Request historical data
     Args:
         duration: Duration of the data
         bar_size: Size of the bars
+        format: "xml" (verbose, newest first), "csv" (compact, oldest first,
+            recommended for large ranges) or "columnar" (JSON arrays per field)
+    """
+    if format == "xml":
+        formatted_data, _ = await get_historical_data(symbol, duration, bar_size)
+        return formatted_data
+
+    bars = await get_historical_bars(symbol, duration, bar_size)
+    if format == "csv":
+        return format_bars_csv(bars)
+    if format == "columnar":
+        return json.dumps(format_bars_columnar(bars))
+    raise ValueError(f"Unsupported format: {format}")
+
+
+@mcp.tool()
+async def request_indicators(
+    symbol: str, bar_size: str = "1 min", duration: str = "5 D", tail: int = 1
+) -> str:
+    """
+    Compute technical indicators (SMA, EMA, RSI, ATR, VWAP, Bollinger bands, MACD)
+    Args:
+        symbol: Stock symbol
+        bar_size: Size of the bars, e.g. "1 min", "1 hour", "1 day"
+        duration: History used for the calculation, e.g. "5 D", "1 Y"
+        tail: Number of most recent bars to return
+    Returns:
+        CSV table with one row per bar (UTC time), empty cells while warming up
+    """
+    table, _ = await get_indicators(symbol, duration, bar_size, tail)
+    return table
+
+
+@mcp.tool()
+async def request_option_chain(
+    symbol: str, expiries: int = 1, strikes: int = 5, right: str = ""
+) -> str:
+    """
+    Request option quotes and greeks around the money
+    Args:
+        symbol: Underlying stock symbol
+        expiries: Number of nearest expirations to include
+        strikes: Number of strikes above and below the at-the-money strike
+        right: "C" for calls, "P" for puts, empty for both
+    Returns:
+        CSV table with bid/ask/last, implied volatility and greeks per option
+    """
+    table, _ = await get_option_chain_snapshot(symbol, expiries, strikes, right)
+    return table
+
+
+@mcp.tool()
+async def request_option_surface(symbol: str, expiries: int = 3, strikes: int = 10) -> str:
+    """
+    Compute the implied volatility and greeks surface locally from option mid prices
+    Args:
+        symbol: Underlying stock symbol
+        expiries: Number of nearest expirations to include
+        strikes: Number of strikes above and below the at-the-money strike
+    Returns:
+        CSV table with mid price, Black-Scholes implied volatility and greeks per option
     """
-    formatted_data, _ = await get_historical_data(symbol, duration, bar_size)
+    table, _ = await get_option_surface(symbol, expiries, strikes)
+    return table
 
-    return formatted_data
+
+@mcp.tool()
+async def request_fundamental_bundle(symbol: str, reports: str = "") -> str:
+    """
+    Fetch several fundamental reports for one stock concurrently
+    Args:
+        symbol: Stock symbol
+        reports: Comma separated reports: profile, financials, estimates, ownership; empty for all
+    Returns:
+        XML with one element per report, plus an error element for each report that failed
+    """
+    bundle, _ = await get_fundamental_bundle(
+        symbol, reports=reports.split(",") if reports else None
+    )
+    return bundle
+
+
+@mcp.tool()
+async def screen_stocks(
+    filter: str = "", sort: str = "", limit: int = 50, columns: str = ""
+) -> str:
+    """
+    Screen the prefetched stock universe by fundamental metrics
+    Args:
+        filter: Expression over metrics, e.g. "pe < 15 and revenue_growth > 10"
+        sort: Metric to sort by, prefix with "-" for descending, e.g. "-market_cap"
+        limit: Maximum number of rows to return
+        columns: Comma separated metrics to return, empty for all
+    Returns:
+        CSV table with one row per matching stock, empty cells for missing metrics
+    """
+    table = universe_table.screen(
+        filter or None, sort or None, limit, columns.split(",") if columns else None
+    )
+    return format_table(table)
+
+
+@mcp.tool()
+async def backfill_historical_data_range(
+    symbol: str, duration: str, bar_size: str, ctx: Context
+) -> str:
+    """
+    Backfill a long range of historical bars (e.g. 5 Y of 1 min bars) into the local store
+    Args:
+        symbol: Stock symbol
+        duration: Duration to backfill, e.g. "1 Y", "5 Y"
+        bar_size: Size of the bars, e.g. "1 min"
+    Returns:
+        Number of bars stored for the range
+    """
+    result = {}
+    async for progress in backfill_historical_data(symbol, duration, bar_size):
+        if progress.get("done"):
+            result = progress
+        else:
+            await ctx.report_progress(progress["completed"], progress["total"])
+    return f"Backfilled {result.get('bars', 0)} {bar_size} bars of {symbol} over {duration}"
 
 
 @mcp.tool()
@@ -94,6 +244,24 @@ async def create_market_order(symbol: str, quantity: int) -> str:
     return formatted_order
 
 
+@mcp.tool()
+async def create_batch_orders(orders: list[dict], ack: bool = True) -> str:
+    """
+    Place a basket of orders in one pass
+    Args:
+        orders: Order legs, each with symbol, quantity, action ("BUY"/"SELL"),
+            order_type ("LMT", "MKT", "STP", "STP LMT"), price and stop_price.
+            Add take_profit and/or stop_loss to make a bracket order,
+            or give legs the same oca_group name so a fill cancels the others
+        ack: Wait for TWS to acknowledge every order before returning
+    Returns:
+        CSV table with one row per placed order: order id, status, acknowledgement latency and errors
+    """
+    # place_batch_orders 已逐单推送创建通知，这里不再重复发送
+    table, _ = await place_batch_orders(orders, ack=ack)
+    return table
+
+
 @mcp.tool()
 async def cancel_existing_order(order_id: int) -> str:
     """
@@ -131,10 +299,7 @@ async def _send_mcp_order_notification(trade, action: str):
                 "action": trade.order.action,
                 "quantity": trade.order.totalQuantity,
                 "order_type": trade.order.orderType,
-                "price": (
-                    getattr(trade.order, "lmtPrice", None)
-                    or getattr(trade.order, "stopPrice", None)
-                ),
+                "price": order_price(trade.order),
                 "status": trade.orderStatus.status,
             },
             "source": "MCP",
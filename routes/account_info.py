@@ -1,10 +1,10 @@
 import asyncio
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import StreamingResponse
 from core import ib
 from core.config import get_settings
-from utils.data_convert import format_account_summary, ApiResponse
-from typing import AsyncGenerator
+from utils.data_convert import format_account_summary, stream_trades, ApiResponse
+from typing import AsyncGenerator, Literal
 
 account_info_router = APIRouter(tags=["account_info"])
 
@@ -105,6 +105,13 @@ async def get_account_portfolio():
 
 
 @account_info_router.get("/trades")
-async def get_account_trades():
+async def get_account_trades(
+    format: Literal["json", "ndjson", "csv"] = Query(
+        default="json", description="返回格式：json, ndjson, csv"
+    ),
+):
     trades = ib.trades()
-    return ApiResponse.success(trades)
+    if format == "json":
+        return ApiResponse.success(trades)
+    return stream_trades(trades, format)
+
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Body, Query
+from fastapi.responses import Response
+from typing import List, Literal, Optional
 from core.fundamental_operate import (
     get_company_profile,
+    get_company_snapshot,
     get_financial_statements,
+    get_financial_table,
     get_analyst_estimates,
+    get_fundamental_bundle,
     get_ownership_data,
 )
-from utils.data_convert import ApiResponse
+from core.fundamental_cache import fundamental_cache
+from core.fundamental_screener import universe_prefetcher, universe_table
+from core.config import get_settings
+from utils.data_convert import ApiResponse, format_table
 
 fundamental_router = APIRouter(tags=["fundamental"])
 
@@ -14,9 +22,19 @@ fundamental_router = APIRouter(tags=["fundamental"])
 async def get_profile(
     symbol: str,
     exchange: str = Query(default="SMART", description="交易所代码"),
+    format: Literal["xml", "table"] = Query(
+        default="xml", description="返回格式：xml（原始报告）或 table（解析后的概况与指标）"
+    ),
+    fields: Optional[str] = Query(default=None, description="逗号分隔的指标名，仅 table 格式有效"),
 ):
     """获取公司概况"""
     try:
+        if format == "table":
+            return ApiResponse.success(
+                await get_company_snapshot(
+                    symbol, exchange, fields.split(",") if fields else None
+                )
+            )
         _, profile = await get_company_profile(symbol, exchange)
         return ApiResponse.success(profile)
     except Exception as e:
@@ -27,9 +45,36 @@ async def get_profile(
 async def get_financials(
     symbol: str,
     exchange: str = Query(default="SMART", description="交易所代码"),
+    format: Literal["xml", "table", "csv"] = Query(
+        default="xml", description="返回格式：xml（原始报告）、table 或 csv（解析后的报表）"
+    ),
+    statement: Optional[Literal["INC", "BAL", "CAS"]] = Query(
+        default=None, description="INC 利润表、BAL 资产负债表、CAS 现金流量表"
+    ),
+    period_type: Optional[Literal["Annual", "Interim"]] = Query(
+        default=None, description="Annual 年报或 Interim 季报"
+    ),
+    start: Optional[str] = Query(default=None, description="期间截止日期下限（YYYY-MM-DD）"),
+    end: Optional[str] = Query(default=None, description="期间截止日期上限（YYYY-MM-DD）"),
+    items: Optional[str] = Query(default=None, description="逗号分隔的科目代码，如 SREV,NINC"),
+    limit: Optional[int] = Query(default=None, ge=1, description="只返回最近的几个期间"),
 ):
     """获取财务报表"""
     try:
+        if format != "xml":
+            csv, table = await get_financial_table(
+                symbol,
+                exchange,
+                statement,
+                period_type,
+                start,
+                end,
+                items.split(",") if items else None,
+                limit,
+            )
+            if format == "csv":
+                return Response(csv, media_type="text/csv")
+            return ApiResponse.success(table)
         _, statements = await get_financial_statements(symbol, exchange)
         return ApiResponse.success(statements)
     except Exception as e:
@@ -60,3 +105,80 @@ async def get_ownership(
         return ApiResponse.success(ownership)
     except Exception as e:
         return ApiResponse.error(f"获取所有权数据失败: {str(e)}")
+
+
+@fundamental_router.get("/bundle/{symbol}")
+async def get_bundle(
+    symbol: str,
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    reports: Optional[str] = Query(
+        default=None,
+        description="逗号分隔的报告名：profile,financials,estimates,ownership，为空时全部",
+    ),
+):
+    """并发获取多份基本面报告"""
+    try:
+        _, bundle = await get_fundamental_bundle(
+            symbol, exchange, reports.split(",") if reports else None
+        )
+        return ApiResponse.success(bundle)
+    except Exception as e:
+        return ApiResponse.error(f"获取基本面报告失败: {str(e)}")
+
+
+@fundamental_router.get("/cache")
+async def get_fundamental_cache_stats():
+    """获取基本面报告缓存状态"""
+    return ApiResponse.success(fundamental_cache.stats())
+
+
+@fundamental_router.get("/screener")
+async def screen_universe(
+    filter: Optional[str] = Query(
+        default=None, description="筛选表达式，如 pe < 15 and revenue_growth > 10"
+    ),
+    sort: Optional[str] = Query(default=None, description="排序字段，前缀 - 表示降序，如 -market_cap"),
+    limit: Optional[int] = Query(default=None, ge=1, description="最多返回的行数"),
+    columns: Optional[str] = Query(default=None, description="逗号分隔的返回字段，为空时全部"),
+    format: Literal["table", "csv"] = Query(default="table", description="返回格式"),
+):
+    """在预取的股票池指标上向量化筛选"""
+    try:
+        table = universe_table.screen(
+            filter, sort, limit, columns.split(",") if columns else None
+        )
+        if format == "csv":
+            return Response(format_table(table), media_type="text/csv")
+        return ApiResponse.success(table)
+    except Exception as e:
+        return ApiResponse.error(f"筛选失败: {str(e)}")
+
+
+@fundamental_router.get("/screener/prefetch")
+async def get_prefetch_status():
+    """获取股票池预取进度与指标表状态"""
+    return ApiResponse.success(
+        {"prefetch": universe_prefetcher.status(), "table": universe_table.stats()}
+    )
+
+
+@fundamental_router.post("/screener/prefetch/start")
+async def start_prefetch(
+    symbols: List[str] = Body(
+        default=[], embed=True, description="股票代码列表，为空时使用 SCREENER_UNIVERSE"
+    ),
+):
+    """在后台开始预取股票池基本面"""
+    symbols = symbols or get_settings().SCREENER_UNIVERSE
+    if not symbols:
+        return ApiResponse.error("没有要预取的标的，请传入 symbols 或配置 SCREENER_UNIVERSE")
+    if not universe_prefetcher.start(symbols):
+        return ApiResponse.error("预取任务已在运行")
+    return ApiResponse.success(universe_prefetcher.status())
+
+
+@fundamental_router.post("/screener/prefetch/stop")
+async def stop_prefetch():
+    """停止正在运行的预取任务"""
+    universe_prefetcher.stop()
+    return ApiResponse.success(universe_prefetcher.status())
@@ -1,9 +1,33 @@
+import json
 from fastapi import APIRouter, Query
+from fastapi.responses import Response, StreamingResponse
+from datetime import datetime
+from typing import Literal, Optional
 from core.market_data_operate import (
     get_stock_quote,
+    get_stock_quotes,
+    get_market_depth,
     get_historical_data,
+    get_historical_bars,
+    format_bars_columnar,
+    format_bars_csv,
+    format_bars_ndjson,
+    format_bars_npy,
+    stream_historical_bars,
+    backfill_historical_data,
+    get_indicators,
     get_option_chain,
+    get_ticks,
+    format_ticks_columnar,
+    get_option_chain_snapshot,
+    get_option_surface,
 )
+from core.contract_cache import contract_cache
+from core.history_scheduler import history_scheduler
+from core.indicators import IndicatorParams
+from core.market_depth import depth_cache
+from core.quote_cache import quote_cache
+from core.tick_recorder import tick_recorder
 from utils.data_convert import ApiResponse
 
 market_data_router = APIRouter(tags=["market_data"])
@@ -14,15 +38,73 @@ async def get_quote(
     symbol: str,
     exchange: str = Query(default="SMART", description="交易所代码"),
     currency: str = Query(default="USD", description="货币代码"),
+    timeout: Optional[float] = Query(default=None, description="等待报价就绪的最长秒数"),
 ):
     """获取股票实时报价"""
     try:
-        _, quote = get_stock_quote(symbol, exchange, currency)
+        _, quote = await get_stock_quote(symbol, exchange, currency, timeout=timeout)
         return ApiResponse.success(quote)
     except Exception as e:
         return ApiResponse.error(f"获取报价失败: {str(e)}")
 
 
+@market_data_router.get("/quotes")
+async def get_quotes(
+    symbols: str = Query(..., description="逗号分隔的股票代码，如 AAPL,MSFT"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    timeout: Optional[float] = Query(default=None, description="每个合约等待报价就绪的最长秒数"),
+):
+    """批量获取股票实时报价"""
+    try:
+        _, table = await get_stock_quotes(
+            symbols.split(","), exchange, currency, timeout=timeout
+        )
+        return ApiResponse.success(table)
+    except Exception as e:
+        return ApiResponse.error(f"批量获取报价失败: {str(e)}")
+
+
+@market_data_router.get("/quote-cache")
+async def get_quote_cache_stats():
+    """获取行情订阅缓存状态"""
+    return ApiResponse.success(quote_cache.stats())
+
+
+@market_data_router.get("/depth/{symbol}")
+async def get_depth(
+    symbol: str,
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    timeout: Optional[float] = Query(default=None, description="新订阅等待首批深度数据的最长秒数"),
+):
+    """获取盘口深度快照"""
+    try:
+        return ApiResponse.success(
+            await get_market_depth(symbol, exchange, currency, timeout)
+        )
+    except Exception as e:
+        return ApiResponse.error(f"获取盘口深度失败: {str(e)}")
+
+
+@market_data_router.get("/depth-cache")
+async def get_depth_cache_stats():
+    """获取深度订阅缓存状态"""
+    return ApiResponse.success(depth_cache.stats())
+
+
+@market_data_router.get("/contract-cache")
+async def get_contract_cache_stats():
+    """获取合约识别缓存状态"""
+    return ApiResponse.success(contract_cache.stats())
+
+
+@market_data_router.get("/history-scheduler")
+async def get_history_scheduler_stats():
+    """获取历史数据请求队列状态"""
+    return ApiResponse.success(history_scheduler.stats())
+
+
 @market_data_router.get("/history/{symbol}")
 async def get_history(
     symbol: str,
@@ -32,21 +114,176 @@ async def get_history(
     ),
     exchange: str = Query(default="SMART", description="交易所代码"),
     currency: str = Query(default="USD", description="货币代码"),
+    what_to_show: str = Query(default="TRADES", description="数据类型，如 TRADES, MIDPOINT"),
+    use_rth: bool = Query(default=True, description="是否只包含常规交易时段"),
+    format: Literal["bars", "columnar", "csv", "ndjson", "npy"] = Query(
+        default="bars", description="返回格式：bars, columnar, csv, ndjson, npy"
+    ),
 ):
     """获取历史数据"""
+    if format in ("csv", "ndjson"):
+        return StreamingResponse(
+            _stream_history(
+                format, symbol, duration, bar_size, exchange, currency, what_to_show, use_rth
+            ),
+            media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        )
+
     try:
+        if format != "bars":
+            bars = await get_historical_bars(
+                symbol,
+                duration=duration,
+                bar_size=bar_size,
+                exchange=exchange,
+                currency=currency,
+                what_to_show=what_to_show,
+                use_rth=use_rth,
+            )
+            if format == "npy":
+                return Response(
+                    format_bars_npy(bars), media_type="application/octet-stream"
+                )
+            return ApiResponse.success(format_bars_columnar(bars))
+
         _, raw_bars = await get_historical_data(
             symbol,
             duration=duration,
             bar_size=bar_size,
             exchange=exchange,
             currency=currency,
+            what_to_show=what_to_show,
+            use_rth=use_rth,
         )
         return ApiResponse.success(raw_bars)
     except Exception as e:
         return ApiResponse.error(f"获取历史数据失败: {str(e)}")
 
 
+async def _stream_history(format: str, *args):
+    """按时间顺序分块输出 CSV 或 NDJSON，出错时以最后一行报告错误"""
+    first = True
+    try:
+        async for bars in stream_historical_bars(*args):
+            if format == "csv":
+                yield format_bars_csv(bars, header=first)
+            else:
+                yield format_bars_ndjson(bars)
+            first = False
+    except Exception as e:
+        message = f"获取历史数据失败: {str(e)}"
+        yield f"# {message}\n" if format == "csv" else json.dumps({"error": message}) + "\n"
+
+
+@market_data_router.get("/history/{symbol}/backfill")
+async def backfill_history(
+    symbol: str,
+    duration: str = Query(..., description="回填时长，如 1 Y, 5 Y"),
+    bar_size: str = Query(default="1 min", description="K线周期，如 1 min, 5 mins, 1 hour"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    what_to_show: str = Query(default="TRADES", description="数据类型，如 TRADES, MIDPOINT"),
+    use_rth: bool = Query(default=True, description="是否只包含常规交易时段"),
+):
+    """回填长时间段历史数据，以 SSE 推送每个分段的进度"""
+
+    async def progress():
+        try:
+            async for event in backfill_historical_data(
+                symbol, duration, bar_size, exchange, currency, what_to_show, use_rth
+            ):
+                yield ApiResponse.success(event).sse_encode()
+        except Exception as e:
+            yield ApiResponse.error(f"回填历史数据失败: {str(e)}").sse_encode()
+
+    return StreamingResponse(progress(), media_type="text/event-stream")
+
+
+@market_data_router.get("/ticks/{symbol}")
+async def get_recorded_ticks(
+    symbol: str,
+    start: Optional[datetime] = Query(default=None, description="起始时间（含），ISO 格式或 UTC 秒"),
+    end: Optional[datetime] = Query(default=None, description="结束时间（不含），ISO 格式或 UTC 秒"),
+    kind: Literal["", "trade", "quote"] = Query(default="", description="trade 或 quote，为空时两者都取"),
+    after_seq: Optional[int] = Query(default=None, description="只返回 seq 大于该值的记录"),
+    limit: int = Query(default=10000, ge=1, description="最多返回的条数"),
+    format: Literal["columnar", "npy"] = Query(default="columnar", description="返回格式：columnar, npy"),
+):
+    """查询录制的逐笔成交与报价"""
+    try:
+        ticks = get_ticks(symbol, start, end, kind, after_seq, limit)
+        if format == "npy":
+            return Response(format_bars_npy(ticks), media_type="application/octet-stream")
+        return ApiResponse.success(format_ticks_columnar(ticks))
+    except FileNotFoundError:
+        return ApiResponse.error(f"没有 {symbol} 的逐笔录制数据")
+    except Exception as e:
+        return ApiResponse.error(f"查询逐笔数据失败: {str(e)}")
+
+
+@market_data_router.get("/tick-recorder")
+async def get_tick_recorder_stats():
+    """获取逐笔录制状态"""
+    return ApiResponse.success(tick_recorder.stats())
+
+
+@market_data_router.post("/tick-recorder/start")
+async def start_tick_recorder(
+    symbols: str = Query(..., description="逗号分隔的股票代码"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+):
+    """开始录制逐笔成交与报价"""
+    try:
+        started = await tick_recorder.start(
+            [s.strip() for s in symbols.split(",") if s.strip()], exchange, currency
+        )
+        return ApiResponse.success({"started": started, "recording": tick_recorder.symbols})
+    except Exception as e:
+        return ApiResponse.error(f"开始逐笔录制失败: {str(e)}")
+
+
+@market_data_router.post("/tick-recorder/stop")
+async def stop_tick_recorder(
+    symbols: Optional[str] = Query(default=None, description="逗号分隔的股票代码，为空时停止全部"),
+):
+    """停止录制逐笔成交与报价"""
+    tick_recorder.stop([s.strip() for s in symbols.split(",")] if symbols else None)
+    return ApiResponse.success({"recording": tick_recorder.symbols})
+
+
+@market_data_router.get("/indicators/{symbol}")
+async def get_symbol_indicators(
+    symbol: str,
+    duration: str = Query(default="5 D", description="计算所用数据时长"),
+    bar_size: str = Query(default="1 min", description="K线周期"),
+    tail: int = Query(default=1, ge=1, description="返回最近多少根K线的指标值"),
+    period: int = Query(default=20, ge=2, description="SMA、EMA、布林带周期"),
+    rsi_period: int = Query(default=14, ge=2, description="RSI 周期"),
+    atr_period: int = Query(default=14, ge=1, description="ATR 周期"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    use_rth: bool = Query(default=True, description="是否只包含常规交易时段"),
+):
+    """计算技术指标"""
+    try:
+        _, table = await get_indicators(
+            symbol,
+            duration,
+            bar_size,
+            tail,
+            exchange,
+            currency,
+            use_rth=use_rth,
+            params=IndicatorParams(
+                period=period, rsi_period=rsi_period, atr_period=atr_period
+            ),
+        )
+        return ApiResponse.success(table)
+    except Exception as e:
+        return ApiResponse.error(f"计算技术指标失败: {str(e)}")
+
+
 @market_data_router.get("/options/{symbol}")
 async def get_options(
     symbol: str,
@@ -59,3 +296,61 @@ async def get_options(
         return ApiResponse.success(chains)
     except Exception as e:
         return ApiResponse.error(f"获取期权链数据失败: {str(e)}")
+
+
+@market_data_router.get("/options/{symbol}/chain")
+async def get_options_chain(
+    symbol: str,
+    expiries: int = Query(default=1, ge=1, description="最近的几个到期日"),
+    strikes: int = Query(default=5, ge=0, description="平值上下各取几档行权价"),
+    right: str = Query(default="", description="C 或 P，为空时两者都取"),
+    expirations: Optional[str] = Query(default=None, description="逗号分隔的到期日（YYYYMMDD）"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    timeout: Optional[float] = Query(default=None, description="每个合约等待报价就绪的最长秒数"),
+):
+    """获取平值附近的期权报价与希腊值"""
+    try:
+        _, table = await get_option_chain_snapshot(
+            symbol,
+            expiries,
+            strikes,
+            right,
+            expirations.split(",") if expirations else None,
+            exchange,
+            currency,
+            timeout,
+        )
+        return ApiResponse.success(table)
+    except Exception as e:
+        return ApiResponse.error(f"获取期权报价失败: {str(e)}")
+
+
+@market_data_router.get("/options/{symbol}/surface")
+async def get_options_surface(
+    symbol: str,
+    expiries: int = Query(default=3, ge=1, description="最近的几个到期日"),
+    strikes: int = Query(default=10, ge=0, description="平值上下各取几档行权价"),
+    rate: Optional[float] = Query(default=None, description="无风险利率，默认取 RISK_FREE_RATE"),
+    dividend: float = Query(default=0.0, ge=0, description="连续股息率"),
+    expirations: Optional[str] = Query(default=None, description="逗号分隔的到期日（YYYYMMDD）"),
+    exchange: str = Query(default="SMART", description="交易所代码"),
+    currency: str = Query(default="USD", description="货币代码"),
+    timeout: Optional[float] = Query(default=None, description="每个合约等待报价就绪的最长秒数"),
+):
+    """本地计算平值附近的隐含波动率与希腊值曲面"""
+    try:
+        _, table = await get_option_surface(
+            symbol,
+            expiries,
+            strikes,
+            rate,
+            dividend,
+            expirations.split(",") if expirations else None,
+            exchange,
+            currency,
+            timeout,
+        )
+        return ApiResponse.success(table)
+    except Exception as e:
+        return ApiResponse.error(f"计算期权曲面失败: {str(e)}")
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Query
 from core.order_operate import (
     place_limit_order,
     place_market_order,
     place_stop_order,
     place_stop_limit_order,
+    place_batch_orders,
     modify_order,
     cancel_order,
     get_order_status,
 )
 from core.constant import OrderAction
-from utils.data_convert import ApiResponse
-from typing import Optional
+from utils.data_convert import stream_trades, ApiResponse
+from typing import List, Literal, Optional
 
 trading_router = APIRouter(tags=["trading"])
 
@@ -24,6 +25,8 @@ async def create_limit_order(
     exchange: str = Body("SMART", description="交易所"),
     currency: str = Body("USD", description="货币"),
     tif: str = Body("DAY", description="订单有效期"),
+    ack: bool = Body(False, description="是否等待 TWS 确认订单后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
 ):
     """创建限价单"""
     try:
@@ -35,6 +38,8 @@ async def create_limit_order(
             exchange=exchange,
             currency=currency,
             tif=tif,
+            ack=ack,
+            ack_timeout=ack_timeout,
         )
         return ApiResponse.success(order)
     except Exception as e:
@@ -48,6 +53,8 @@ async def create_market_order(
     action: str = Body(OrderAction.BUY.value, description="交易方向(BUY/SELL)"),
     exchange: str = Body("SMART", description="交易所"),
     currency: str = Body("USD", description="货币"),
+    ack: bool = Body(False, description="是否等待 TWS 确认订单后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
 ):
     """创建市价单"""
     try:
@@ -57,6 +64,8 @@ async def create_market_order(
             action=action,
             exchange=exchange,
             currency=currency,
+            ack=ack,
+            ack_timeout=ack_timeout,
         )
         return ApiResponse.success(order)
     except Exception as e:
@@ -71,6 +80,8 @@ async def create_stop_order(
     action: str = Body(OrderAction.SELL.value, description="交易方向(BUY/SELL)"),
     exchange: str = Body("SMART", description="交易所"),
     currency: str = Body("USD", description="货币"),
+    ack: bool = Body(False, description="是否等待 TWS 确认订单后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
 ):
     """创建止损单"""
     try:
@@ -81,6 +92,8 @@ async def create_stop_order(
             action=action,
             exchange=exchange,
             currency=currency,
+            ack=ack,
+            ack_timeout=ack_timeout,
         )
         return ApiResponse.success(order)
     except Exception as e:
@@ -96,6 +109,8 @@ async def create_stop_limit_order(
     action: str = Body(OrderAction.SELL.value, description="交易方向(BUY/SELL)"),
     exchange: str = Body("SMART", description="交易所"),
     currency: str = Body("USD", description="货币"),
+    ack: bool = Body(False, description="是否等待 TWS 确认订单后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
 ):
     """创建止损限价单"""
     try:
@@ -107,24 +122,50 @@ async def create_stop_limit_order(
             action=action,
             exchange=exchange,
             currency=currency,
+            ack=ack,
+            ack_timeout=ack_timeout,
         )
         return ApiResponse.success(order)
     except Exception as e:
         return ApiResponse.error(f"创建止损限价单失败: {str(e)}")
 
 
+@trading_router.post("/orders/batch")
+async def create_batch_orders(
+    orders: List[dict] = Body(
+        ...,
+        description="订单列表，每项含 symbol、quantity、action、order_type、price、stop_price，"
+        "可选 take_profit/stop_loss（括号单）或 oca_group（OCA 组）",
+    ),
+    ack: bool = Body(True, description="是否等待 TWS 确认各订单后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
+):
+    """批量下单：并发识别合约，一轮提交全部订单并返回逐单确认结果"""
+    try:
+        _, results = await place_batch_orders(orders, ack=ack, ack_timeout=ack_timeout)
+        return ApiResponse.success(results)
+    except Exception as e:
+        return ApiResponse.error(f"批量下单失败: {str(e)}")
+
+
 @trading_router.put("/order/{order_id}")
 async def update_order(
     order_id: int,
     quantity: Optional[int] = Body(None, description="新数量"),
-    price: Optional[float] = Body(None, description="新价格"),
+    price: Optional[float] = Body(None, description="新价格（限价，止损单与触价单为触发价）"),
+    stop_price: Optional[float] = Body(None, description="新触发价（止损限价单、触价单、追踪止损单）"),
+    ack: bool = Body(False, description="是否等待 TWS 确认修改后再返回"),
+    ack_timeout: Optional[float] = Body(None, description="等待确认的最长时间（秒），默认 ORDER_ACK_TIMEOUT"),
 ):
-    """修改订单"""
+    """原地修改订单（保留 orderId 与排队优先级）"""
     try:
         _, order = await modify_order(
             order_id=order_id,
             new_quantity=quantity,
             new_price=price,
+            new_stop_price=stop_price,
+            ack=ack,
+            ack_timeout=ack_timeout,
         )
         return ApiResponse.success(order)
     except Exception as e:
@@ -152,10 +193,19 @@ async def get_order(order_id: int):
 
 
 @trading_router.get("/orders")
-async def get_orders():
-    """获取所有订单"""
+async def get_orders(
+    format: Literal["json", "ndjson", "csv"] = Query(
+        default="json", description="返回格式：json, ndjson, csv"
+    ),
+    symbol: Optional[str] = Query(default=None, description="只返回该标的的订单"),
+    status: Optional[str] = Query(default=None, description="只返回该状态的订单，如 Submitted、Filled"),
+    active: Optional[bool] = Query(default=None, description="true 只返回未完成订单，false 只返回已完成订单"),
+):
+    """获取订单列表，可按标的与状态筛选"""
     try:
-        _, orders = await get_order_status()
+        _, orders = await get_order_status(symbol=symbol, status=status, active=active)
+        if format != "json":
+            return stream_trades(orders, format)
         return ApiResponse.success(orders)
     except Exception as e:
         return ApiResponse.error(f"获取订单列表失败: {str(e)}")
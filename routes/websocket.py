@@ -2,6 +2,7 @@ import json
 import uuid
 from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from core.realtime_bars import realtime_bar_hub
 from core.websocket import websocket_manager
 from utils.logger import logger
 
@@ -19,14 +20,20 @@ async def websocket_endpoint(
     支持的消息类型：
     - subscribe: 订阅消息类型
     - unsubscribe: 取消订阅消息类型
+    - subscribe_depth: 订阅盘口深度（symbol、exchange、currency）
+    - unsubscribe_depth: 取消订阅盘口深度
+    - subscribe_bars: 订阅实时K线（symbol、bar_sizes、exchange、currency）
+    - unsubscribe_bars: 取消订阅实时K线
     - ping: 心跳检测
     - get_orders: 获取当前订单状态
 
     推送的消息类型：
-    - order_update: 订单状态更新
+    - order_update: 订单状态更新、成交与佣金回报（事件驱动，event 为 status/fill/commission）
     - order_notification: 订单通知
     - account_update: 账户信息更新
-    - market_data: 市场数据
+    - market_data: 市场数据（实时K线，按 bar_size 分组）
+    - depth_snapshot: 盘口深度快照（订阅后推送一次）
+    - depth_update: 盘口深度增量（按 seq 连续编号）
     - error: 错误通知
     """
 
@@ -88,6 +95,7 @@ async def get_websocket_status():
         "total_subscriptions": sum(
             len(subs) for subs in websocket_manager.subscriptions.values()
         ),
+        "realtime_bars": realtime_bar_hub.stats(),
     }
 
 
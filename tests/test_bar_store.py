@@ -0,0 +1,322 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock, patch
+import numpy as np
+import pytest
+from ib_async import BarData, BarDataList
+from core.history_scheduler import HistoryScheduler
+from core.bar_store import (
+    BarStore,
+    backfill_bars,
+    load_bars,
+    bars_to_array,
+    plan_chunks,
+    resample_bars,
+    stream_bars,
+    subtract_intervals,
+)
+
+END = datetime(2025, 6, 12, 20, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler():
+    """每个用例使用独立的调度器，避免复用其他用例的请求结果"""
+    scheduler = HistoryScheduler(
+        max_requests=60,
+        window=600,
+        max_concurrent=50,
+        identical_interval=15,
+        contract_max_requests=5,
+        contract_window=2,
+    )
+    with patch("core.bar_store.history_scheduler", scheduler):
+        yield scheduler
+
+
+def make_bars(start: datetime, count: int):
+    return [
+        BarData(
+            date=start + timedelta(minutes=i),
+            open=100.0 + i,
+            high=101.0 + i,
+            low=99.0 + i,
+            close=100.5 + i,
+            volume=1000,
+            average=100.2 + i,
+            barCount=10,
+        )
+        for i in range(count)
+    ]
+
+
+def test_subtract_intervals_finds_gaps_and_tail():
+    assert subtract_intervals(0, 100, [(10, 20), (30, 50)]) == [
+        (0, 10),
+        (20, 30),
+        (50, 100),
+    ]
+    assert subtract_intervals(0, 100, [(0, 100)]) == []
+
+
+def test_repeat_request_only_fetches_tail(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        start = endDateTime - timedelta(seconds=int(durationStr.split()[0]))
+        minutes = int((endDateTime - start).total_seconds() // 60)
+        return make_bars(start, minutes)
+
+    with (
+        patch("core.bar_store.bar_store", BarStore(str(tmp_path))),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        first = asyncio.run(load_bars(contract, "3600 S", "1 min", END))
+        second = asyncio.run(
+            load_bars(contract, "3600 S", "1 min", END + timedelta(minutes=5))
+        )
+
+    tail_call = mock_ib.reqHistoricalDataAsync.await_args_list[1]
+    assert mock_ib.reqHistoricalDataAsync.await_count == 2
+    assert tail_call.kwargs["durationStr"] == "300 S"
+    assert len(first) == 60
+    assert second["time"][0] == END.timestamp() - 55 * 60
+    assert second["time"][-1] == END.timestamp() + 4 * 60
+    assert (second["time"][1:] > second["time"][:-1]).all()
+
+
+def test_plan_chunks_respects_bar_size_limits():
+    week = 7 * 86400
+    chunks = plan_chunks(0, week, "1 min")
+
+    assert len(chunks) == 7
+    assert chunks[0] == (week - 86400, week)
+    assert chunks[-1] == (0, 86400)
+    assert plan_chunks(0, week, "1 hour") == [(0, week)]
+
+
+def test_long_range_is_fetched_in_concurrent_chunks(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        return make_bars(endDateTime - timedelta(minutes=2), 2)
+
+    async def scenario():
+        return [
+            progress
+            async for progress in backfill_bars(contract, "3 D", "1 min", END)
+        ]
+
+    with (
+        patch("core.bar_store.bar_store", BarStore(str(tmp_path))),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        progress = asyncio.run(scenario())
+        bars = asyncio.run(load_bars(contract, "3 D", "1 min", END))
+
+    assert [p["completed"] for p in progress] == [1, 2, 3]
+    assert mock_ib.reqHistoricalDataAsync.await_count == 3
+    assert len(bars) == 6
+    assert (bars["time"][1:] > bars["time"][:-1]).all()
+
+
+def test_failed_chunk_is_not_marked_covered(tmp_path, fresh_scheduler):
+    contract = Mock(conId=1, symbol="AAPL")
+    store = BarStore(str(tmp_path))
+    calls = []
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        calls.append(endDateTime)
+        if len(calls) == 1:
+            # RaiseRequestErrors 关闭时，节流违规以 errorEvent 加空结果返回
+            fresh_scheduler._on_error(7, 162, "Historical data request pacing violation", contract)
+            bars = BarDataList()
+            bars.reqId = 7
+            return bars
+        return make_bars(endDateTime - timedelta(minutes=2), 2)
+
+    async def scenario():
+        return [
+            progress
+            async for progress in backfill_bars(contract, "3600 S", "1 min", END)
+        ]
+
+    with (
+        patch("core.bar_store.bar_store", store),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        failed = asyncio.run(scenario())
+        assert store.coverage((1, "1 min", "TRADES", True)) == []
+        fresh_scheduler._recent.clear()
+        retried = asyncio.run(scenario())
+
+    assert failed[0]["error"] is not None and failed[0]["bars"] == 0
+    assert retried[0]["error"] is None and retried[0]["bars"] == 2
+    assert store.coverage((1, "1 min", "TRADES", True)) == [
+        (int(END.timestamp()) - 3600, int(END.timestamp()))
+    ]
+
+
+def session_request(*sessions):
+    """模拟 IB：只在给定的 (开盘, 收盘) 时段内返回 1 分钟K线"""
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        start = endDateTime - timedelta(seconds=int(durationStr.split()[0]))
+        bars = []
+        for open_, close in sessions:
+            first, last = max(start, open_), min(endDateTime, close)
+            if first < last:
+                bars += make_bars(first, int((last - first).total_seconds() // 60))
+        return bars
+
+    return request
+
+
+def test_one_day_on_sunday_returns_last_session(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+    thursday = (datetime(2025, 6, 12, 13, 30, tzinfo=timezone.utc), datetime(2025, 6, 12, 20, 0, tzinfo=timezone.utc))
+    friday = (datetime(2025, 6, 13, 13, 30, tzinfo=timezone.utc), datetime(2025, 6, 13, 20, 0, tzinfo=timezone.utc))
+    sunday = datetime(2025, 6, 15, 18, 0, tzinfo=timezone.utc)
+
+    with (
+        patch("core.bar_store.bar_store", BarStore(str(tmp_path))),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=session_request(thursday, friday))
+        bars = asyncio.run(load_bars(contract, "1 D", "1 min", sunday))
+        # 盘中请求只返回当天已走过的部分，不含前一天
+        midday = asyncio.run(
+            load_bars(contract, "1 D", "1 min", datetime(2025, 6, 13, 16, 0, tzinfo=timezone.utc))
+        )
+
+    assert len(bars) == 390
+    assert bars["time"][0] == friday[0].timestamp()
+    assert bars["time"][-1] == friday[1].timestamp() - 60
+    assert midday["time"][0] == friday[0].timestamp() and len(midday) == 151
+
+
+def test_long_backfill_merges_chunks_in_few_writes(tmp_path, fresh_scheduler):
+    contract = Mock(conId=1, symbol="AAPL")
+    store = BarStore(str(tmp_path))
+    fresh_scheduler._contract_limit = (100, 2)
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        return make_bars(endDateTime - timedelta(minutes=10), 10)
+
+    async def scenario():
+        return [p async for p in backfill_bars(contract, "60 D", "1 min", END)]
+
+    with (
+        patch("core.bar_store.bar_store", store),
+        patch.object(store, "write", wraps=store.write) as write,
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        progress = asyncio.run(scenario())
+
+    assert len(progress) == 60
+    assert write.call_count <= 8
+    assert len(store.read((1, "1 min", "TRADES", True))) == 600
+    assert store.coverage((1, "1 min", "TRADES", True)) == [
+        (int(END.timestamp()) - 60 * 86400, int(END.timestamp()))
+    ]
+
+
+def test_load_without_store_handles_empty_range():
+    contract = Mock(conId=1, symbol="AAPL")
+    with patch("core.bar_store.bar_store", None):
+        bars = asyncio.run(load_bars(contract, "0 S", "1 min", END))
+    assert len(bars) == 0
+
+
+def test_resample_aggregates_ohlcv():
+    bars = bars_to_array(make_bars(END - timedelta(minutes=10), 10))
+    five_min = resample_bars(bars, 300)
+
+    assert len(five_min) == 2
+    first = five_min[0]
+    assert first["time"] == END.timestamp() - 600
+    assert (first["open"], first["close"]) == (100.0, 104.5)
+    assert (first["high"], first["low"]) == (105.0, 99.0)
+    assert (first["volume"], first["barCount"]) == (5000, 50)
+    assert first["average"] == 102.2
+
+
+def test_covered_range_is_resampled_without_ib_request(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+    store = BarStore(str(tmp_path))
+    base = bars_to_array(make_bars(END - timedelta(hours=2), 120))
+    store.write(
+        (1, "1 min", "TRADES", True),
+        base,
+        [(int(END.timestamp()) - 7200, int(END.timestamp()))],
+    )
+
+    with (
+        patch("core.bar_store.bar_store", store),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        hourly = asyncio.run(load_bars(contract, "3600 S", "1 hour", END))
+
+    mock_ib.reqHistoricalDataAsync.assert_not_called()
+    assert len(hourly) == 1
+    assert hourly[0]["time"] == END.timestamp() - 3600
+    assert hourly[0]["volume"] == 60 * 1000
+
+
+def test_missing_base_tail_is_fetched_then_resampled(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+    store = BarStore(str(tmp_path))
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    minute = now.replace(second=0)
+    # 基础K线只覆盖到 5 秒前
+    base = bars_to_array(make_bars(minute - timedelta(hours=2), 120))
+    store.write(
+        (1, "1 min", "TRADES", True),
+        base,
+        [(int(base["time"][0]), int(now.timestamp()) - 5)],
+    )
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        return make_bars(minute - timedelta(minutes=1), 2)
+
+    with (
+        patch("core.bar_store.bar_store", store),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        bars = asyncio.run(load_bars(contract, "3600 S", "5 mins", now))
+
+    mock_ib.reqHistoricalDataAsync.assert_awaited_once()
+    call = mock_ib.reqHistoricalDataAsync.await_args
+    assert (call.kwargs["barSizeSetting"], call.kwargs["durationStr"]) == ("1 min", "60 S")
+    assert bars["time"][-1] == int(minute.timestamp()) - int(minute.timestamp()) % 300
+    assert (bars["time"][1:] - bars["time"][:-1] == 300).all()
+
+
+def test_stream_yields_ordered_batches(tmp_path):
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def request(contract, endDateTime, durationStr, **kwargs):
+        return make_bars(endDateTime - timedelta(minutes=3), 3)
+
+    async def scenario():
+        return [
+            chunk.copy()
+            async for chunk in stream_bars(contract, "3 D", "1 min", END, chunk_rows=2)
+        ]
+
+    with (
+        patch("core.bar_store.bar_store", BarStore(str(tmp_path))),
+        patch("core.history_scheduler.ib") as mock_ib,
+    ):
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        chunks = asyncio.run(scenario())
+
+    times = np.concatenate([chunk["time"] for chunk in chunks])
+    assert max(len(chunk) for chunk in chunks) <= 2
+    assert len(times) == 9
+    assert (times[1:] > times[:-1]).all()
@@ -0,0 +1,51 @@
+import numpy as np
+from core import black_scholes
+
+
+def test_norm_cdf_matches_known_values():
+    x = np.array([-1.96, 0.0, 1.0, 1.96])
+    expected = np.array([0.0249979, 0.5, 0.8413447, 0.9750021])
+    assert np.allclose(black_scholes.norm_cdf(x), expected, atol=1e-6)
+
+
+def test_price_satisfies_put_call_parity():
+    spot, strike, years, rate, dividend, vol = 100.0, 95.0, 0.5, 0.04, 0.01, 0.25
+    call = black_scholes.price(spot, strike, years, rate, dividend, vol, True)
+    put = black_scholes.price(spot, strike, years, rate, dividend, vol, False)
+    parity = spot * np.exp(-dividend * years) - strike * np.exp(-rate * years)
+    assert np.isclose(call - put, parity, atol=1e-5)
+
+
+def test_implied_vol_round_trips_batch():
+    strike = np.array([95.0, 90.0, 100.0, 110.0, 120.0, 100.0])
+    years = np.array([0.02, 0.1, 0.25, 0.5, 1.0, 2.0])
+    vol = np.array([0.15, 0.3, 0.5, 0.8, 0.2, 1.5])
+    is_call = np.array([True, False, True, False, True, False])
+    prices = black_scholes.price(100.0, strike, years, 0.045, 0.0, vol, is_call)
+
+    iv = black_scholes.implied_vol(prices, 100.0, strike, years, 0.045, 0.0, is_call)
+
+    assert np.allclose(iv, vol, atol=1e-4)
+
+
+def test_implied_vol_rejects_prices_outside_bounds():
+    iv = black_scholes.implied_vol(
+        np.array([5.0, 150.0, np.nan, 3.0]),
+        100.0,
+        np.array([90.0, 100.0, 100.0, 100.0]),
+        np.array([0.5, 0.5, 0.5, 0.0]),
+        0.0,
+        0.0,
+        True,
+    )
+    # 低于内在价值、高于标的价格、缺失价格、已到期
+    assert np.isnan(iv).all()
+
+
+def test_greeks_scaling():
+    greeks = black_scholes.greeks(100.0, 100.0, 1.0, 0.0, 0.0, 0.2, np.array([True, False]))
+    assert np.isclose(greeks["delta"][0] - greeks["delta"][1], 1.0)
+    assert greeks["gamma"] > 0
+    # vega 以每 1% 波动率计：S·φ(d1)·√T / 100，d1 = σ√T / 2
+    assert np.isclose(greeks["vega"], black_scholes.norm_pdf(0.1))
+    assert (greeks["theta"] < 0).all()
@@ -0,0 +1,48 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+from ib_async import Stock
+from core.contract_cache import ContractCache
+
+
+async def qualify(*contracts):
+    for contract in contracts:
+        contract.conId = 265598
+        contract.primaryExchange = "NASDAQ"
+    return list(contracts)
+
+
+def test_cached_contracts_skip_qualification(tmp_path):
+    cache = ContractCache(str(tmp_path / "contracts.db"), ttl=60)
+
+    with patch("core.contract_cache.ib") as mock_ib:
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=qualify)
+        asyncio.run(cache.qualify(Stock("AAPL", "SMART", "USD")))
+        (contract,) = asyncio.run(cache.qualify(Stock("AAPL", "SMART", "USD")))
+
+    mock_ib.qualifyContractsAsync.assert_awaited_once()
+    assert contract.conId == 265598
+    assert cache.stats()["hits"] == 1
+
+
+def test_contracts_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "contracts.db")
+    with patch("core.contract_cache.ib") as mock_ib:
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=qualify)
+        asyncio.run(ContractCache(path, ttl=60).qualify(Stock("AAPL", "SMART", "USD")))
+
+    restored = ContractCache(path, ttl=60)
+    contract = restored.get(("AAPL", "STK", "SMART", "USD"))
+
+    assert contract.conId == 265598
+    assert contract.primaryExchange == "NASDAQ"
+
+
+def test_expired_contracts_are_requalified(tmp_path):
+    cache = ContractCache(None, ttl=0)
+
+    with patch("core.contract_cache.ib") as mock_ib:
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=qualify)
+        asyncio.run(cache.qualify(Stock("AAPL", "SMART", "USD")))
+        asyncio.run(cache.qualify(Stock("AAPL", "SMART", "USD")))
+
+    assert mock_ib.qualifyContractsAsync.await_count == 2
@@ -0,0 +1,35 @@
+from ib_async import MarketOrder, Stock, StopLimitOrder, StopOrder, Trade
+from utils.data_convert import format_table, format_trade, iter_csv, iter_ndjson
+
+
+def test_rows_are_streamed_in_chunks():
+    rows = [{"order_id": i, "symbol": "AAPL"} for i in range(5)]
+
+    csv_chunks = list(iter_csv(iter(rows), ["order_id", "symbol"], chunk_rows=2))
+    ndjson_chunks = list(iter_ndjson(iter(rows), chunk_rows=2))
+
+    assert csv_chunks[0] == "order_id,symbol\n0,AAPL\n1,AAPL\n"
+    assert "".join(csv_chunks).count("\n") == 6
+    assert len(ndjson_chunks) == 3
+    assert ndjson_chunks[-1] == '{"order_id": 4, "symbol": "AAPL"}\n'
+
+
+def test_format_table_quotes_csv_values():
+    table = {"columns": ["name", "value"], "rows": [['Cash, "Total"', 1.5], ["Revenue", None]]}
+    assert format_table(table) == 'name,value\n"Cash, ""Total""",1.5\nRevenue,'
+
+
+def test_format_trade_reports_set_order_price():
+    contract = Stock("AAPL", "SMART", "USD")
+    market, stop, limit = (
+        Trade(contract, order)
+        for order in (
+            MarketOrder("BUY", 10),
+            StopOrder("SELL", 10, 145.0),
+            StopLimitOrder("SELL", 10, 144.0, 145.0),
+        )
+    )
+
+    assert format_trade(market)["price"] is None
+    assert format_trade(stop)["price"] == 145.0
+    assert format_trade(limit)["price"] == 144.0
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+import pytest
+from core.fundamental_cache import FundamentalCache
+
+REPORT = "<ReportSnapshot>" + "<Issue>AAPL</Issue>" * 500 + "</ReportSnapshot>"
+
+
+@pytest.fixture
+def mock_ib():
+    with patch("core.fundamental_cache.ib") as mock:
+        mock.reqFundamentalDataAsync = AsyncMock(return_value=REPORT)
+        yield mock
+
+
+def make_cache(path=None, ttl=60.0, max_stale=3600.0):
+    return FundamentalCache(path, {"ReportSnapshot": ttl}, default_ttl=60.0, max_stale=max_stale)
+
+
+def test_fresh_reports_are_served_from_disk(tmp_path, mock_ib):
+    path = str(tmp_path / "fundamentals.db")
+    contract = Mock(conId=265598, symbol="AAPL")
+
+    async def run():
+        await make_cache(path).get(contract, "ReportSnapshot")
+        # 重启后从磁盘读取
+        restored = make_cache(path)
+        return restored, await restored.get(contract, "ReportSnapshot")
+
+    restored, report = asyncio.run(run())
+
+    assert report == REPORT
+    mock_ib.reqFundamentalDataAsync.assert_awaited_once()
+    assert restored.stats()["hits"] == 1
+
+
+class RecordingDb:
+    """记录 SQLite 调用所在线程的连接代理"""
+
+    def __init__(self, db):
+        self.db = db
+        self.threads = set()
+
+    def execute(self, *args):
+        self.threads.add(threading.get_ident())
+        return self.db.execute(*args)
+
+    def commit(self):
+        self.threads.add(threading.get_ident())
+        self.db.commit()
+
+
+def test_disk_io_runs_off_the_event_loop(tmp_path, mock_ib):
+    cache = make_cache(str(tmp_path / "fundamentals.db"))
+    cache._db = RecordingDb(cache._db)
+    contract = Mock(conId=265598, symbol="AAPL")
+
+    async def run():
+        await cache.get(contract, "ReportSnapshot")
+        return await cache.get(contract, "ReportSnapshot")
+
+    assert asyncio.run(run()) == REPORT
+    assert cache.stats()["hits"] == 1
+    assert cache._db.threads and threading.get_ident() not in cache._db.threads
+
+
+def test_stale_reports_are_returned_and_refreshed(mock_ib):
+    cache = make_cache(ttl=0)
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def run():
+        await cache.get(contract, "ReportSnapshot")
+        mock_ib.reqFundamentalDataAsync.return_value = "<new/>"
+        stale = await cache.get(contract, "ReportSnapshot")
+        await asyncio.gather(*cache._refreshing)
+        cache.ttls["ReportSnapshot"] = 60
+        return stale, await cache.get(contract, "ReportSnapshot")
+
+    stale, refreshed = asyncio.run(run())
+
+    assert stale == REPORT
+    assert refreshed == "<new/>"
+    assert cache.stats()["stale_hits"] == 1
+    assert mock_ib.reqFundamentalDataAsync.await_count == 2
+
+
+def test_concurrent_misses_are_coalesced_and_empty_reports_not_cached(mock_ib):
+    cache = make_cache()
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def run():
+        return await asyncio.gather(*(cache.get(contract, "ReportSnapshot") for _ in range(3)))
+
+    assert asyncio.run(run()) == [REPORT] * 3
+    assert mock_ib.reqFundamentalDataAsync.await_count == 1
+    assert cache.stats()["compression_ratio"] > 10
+
+    mock_ib.reqFundamentalDataAsync.return_value = ""
+    asyncio.run(cache.get(Mock(conId=2, symbol="XYZ"), "ReportSnapshot"))
+    assert cache.stats()["reports"] == 1
+
+
+def test_cancelled_caller_does_not_strand_coalesced_waiters(mock_ib):
+    cache = make_cache()
+    contract = Mock(conId=1, symbol="AAPL")
+    release = asyncio.Event()
+
+    async def request(contract, reportType):
+        await release.wait()
+        return REPORT
+
+    mock_ib.reqFundamentalDataAsync.side_effect = request
+
+    async def run():
+        first = asyncio.create_task(cache.get(contract, "ReportSnapshot"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get(contract, "ReportSnapshot"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await asyncio.wait_for(second, 1)
+
+    first, report = asyncio.run(run())
+
+    assert first.cancelled()
+    assert report == REPORT
+    assert mock_ib.reqFundamentalDataAsync.await_count == 1
+    assert cache.stats()["reports"] == 1 and cache.stats()["in_flight"] == 0
+
+
+def test_bundle_qualifies_once_and_fetches_concurrently(mock_ib):
+    from core import fundamental_operate
+
+    cache = make_cache()
+    contract = Mock(conId=7, symbol="AAPL")
+    running, peak = 0, 0
+
+    async def fetch(contract, reportType):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if reportType == "ReportsOwnership":
+            raise RuntimeError("no subscription")
+        return "" if reportType == "RESC" else f"<{reportType}/>"
+
+    mock_ib.reqFundamentalDataAsync.side_effect = fetch
+    qualify = AsyncMock(return_value=contract)
+    with patch.object(fundamental_operate, "fundamental_cache", cache), patch.object(
+        fundamental_operate, "qualify_stock", qualify
+    ):
+        xml, bundle = asyncio.run(fundamental_operate.get_fundamental_bundle("AAPL"))
+
+    qualify.assert_awaited_once()
+    assert peak == 4
+    assert bundle["reports"] == {
+        "profile": "<ReportSnapshot/>",
+        "financials": "<ReportsFinStatements/>",
+    }
+    assert set(bundle["errors"]) == {"estimates", "ownership"}
+    assert "<profile><ReportSnapshot/></profile>" in xml
+
+    with pytest.raises(ValueError):
+        asyncio.run(fundamental_operate.get_fundamental_bundle("AAPL", reports=["news"]))
@@ -0,0 +1,105 @@
+from core.fundamental_parser import parse_company_snapshot, parse_financial_statements
+
+FIN_STATEMENTS = """<?xml version="1.0" encoding="UTF-8"?>
+<ReportFinancialStatements Major="1" Minor="0" Revision="1">
+  <CoGeneralInfo><ReportingCurrency Code="USD">U.S. Dollars</ReportingCurrency></CoGeneralInfo>
+  <FinancialStatements>
+    <COAMap>
+      <mapItem coaItem="SREV" statementType="INC" lineID="10" precision="1">Revenue</mapItem>
+      <mapItem coaItem="NINC" statementType="INC" lineID="20" precision="1">Net Income</mapItem>
+      <mapItem coaItem="ACAE" statementType="BAL" lineID="10" precision="1">Cash &amp; Equivalents, Total</mapItem>
+    </COAMap>
+    <AnnualPeriods>
+      <FiscalPeriod Type="Annual" EndDate="2023-09-30" FiscalYear="2023">
+        <Statement Type="INC">
+          <FPHeader><PeriodLength>12</PeriodLength></FPHeader>
+          <lineItem coaCode="SREV">383285.0</lineItem>
+          <lineItem coaCode="NINC">96995.0</lineItem>
+        </Statement>
+        <Statement Type="BAL">
+          <lineItem coaCode="ACAE">29965.0</lineItem>
+        </Statement>
+      </FiscalPeriod>
+      <FiscalPeriod Type="Annual" EndDate="2022-09-24" FiscalYear="2022">
+        <Statement Type="INC">
+          <lineItem coaCode="SREV">394328.0</lineItem>
+          <lineItem coaCode="NINC">99803.0</lineItem>
+        </Statement>
+      </FiscalPeriod>
+    </AnnualPeriods>
+    <InterimPeriods>
+      <FiscalPeriod Type="Interim" EndDate="2024-03-30" FiscalYear="2024" FiscalPeriodNumber="2">
+        <Statement Type="INC">
+          <lineItem coaCode="SREV">90753.0</lineItem>
+        </Statement>
+      </FiscalPeriod>
+    </InterimPeriods>
+  </FinancialStatements>
+</ReportFinancialStatements>"""
+
+SNAPSHOT = """<?xml version="1.0" encoding="UTF-8"?>
+<ReportSnapshot Major="1" Minor="0" Revision="1">
+  <CoIDs>
+    <CoID Type="CompanyName">Apple Inc.</CoID>
+  </CoIDs>
+  <CoGeneralInfo>
+    <Employees LastUpdated="2023-09-30">161000</Employees>
+    <SharesOut Date="2024-04-19" TotalFloat="15308606000.0">15337686000.0</SharesOut>
+    <ReportingCurrency Code="USD">U.S. Dollars</ReportingCurrency>
+  </CoGeneralInfo>
+  <TextInfo><Text Type="Business Summary">Apple Inc. designs phones.</Text></TextInfo>
+  <Ratios PriceCurrency="USD">
+    <Group ID="Price and Volume">
+      <Ratio FieldName="NPRICE" Type="N">189.84000</Ratio>
+      <Ratio FieldName="PDATE" Type="D">2024-05-03T00:00:00</Ratio>
+    </Group>
+    <Group ID="Valuation">
+      <Ratio FieldName="PEEXCLXOR" Type="N">29.5</Ratio>
+    </Group>
+  </Ratios>
+  <ForecastData ConsensusType="Mean">
+    <Ratio FieldName="ConsRecom" Type="N"><Value PeriodType="CURR">2.0</Value></Ratio>
+    <Ratio FieldName="TargetPrice" Type="N"><Value PeriodType="CURR">190.5</Value></Ratio>
+  </ForecastData>
+</ReportSnapshot>"""
+
+
+def test_financial_statements_select_by_statement_and_period():
+    statements = parse_financial_statements(FIN_STATEMENTS)
+
+    assert len(statements) == 6
+    assert statements.statements == ["BAL", "INC"]
+
+    table = statements.select(statement="inc", period_type="annual", items=["SREV"])
+    assert table["currency"] == "USD"
+    assert table["rows"] == [
+        ["INC", "Annual", "2022-09-24", 2022, 0, "SREV", "Revenue", 394328.0],
+        ["INC", "Annual", "2023-09-30", 2023, 0, "SREV", "Revenue", 383285.0],
+    ]
+
+
+def test_financial_statements_date_range_and_limit():
+    statements = parse_financial_statements(FIN_STATEMENTS)
+
+    ranged = statements.select(start="2023-01-01", end="2023-12-31")
+    assert {row[2] for row in ranged["rows"]} == {"2023-09-30"}
+    assert len(ranged["rows"]) == 3
+
+    latest = statements.select(statement="INC", limit=1)
+    assert latest["rows"] == [["INC", "Interim", "2024-03-30", 2024, 2, "SREV", "Revenue", 90753.0]]
+
+
+def test_company_snapshot():
+    snapshot = parse_company_snapshot(SNAPSHOT)
+
+    assert snapshot.info["CompanyName"] == "Apple Inc."
+    assert snapshot.info["Employees"] == 161000
+    assert snapshot.info["TotalFloat"] == 15308606000.0
+
+    selected = snapshot.select(["nprice", "PDATE", "TargetPrice"])
+    assert selected["ratios"]["rows"] == [
+        ["Price and Volume", "NPRICE", 189.84],
+        ["Price and Volume", "PDATE", "2024-05-03T00:00:00"],
+    ]
+    assert selected["forecasts"]["rows"] == [["TargetPrice", "CURR", 190.5]]
+    assert len(snapshot.select()["ratios"]["rows"]) == 3
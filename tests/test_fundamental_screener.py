@@ -0,0 +1,125 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+import numpy as np
+import pytest
+from core import fundamental_screener
+from core.fundamental_cache import FundamentalCache
+from core.fundamental_parser import CompanySnapshot
+from core.fundamental_screener import UniversePrefetcher, UniverseTable, snapshot_metrics
+
+METRICS = {"pe": "PEEXCLXOR", "revenue_growth": "TTMREVCHG", "market_cap": "MKTCAP"}
+
+
+def make_table():
+    table = UniverseTable(list(METRICS))
+    table.upsert("aapl", {"pe": 29.5, "revenue_growth": 2.1, "market_cap": 2900.0})
+    table.upsert("XOM", {"pe": 12.0, "revenue_growth": -8.0, "market_cap": 450.0})
+    table.upsert("INTC", {"revenue_growth": -14.0, "market_cap": 130.0})
+    table.upsert("CVX", {"pe": 13.5, "revenue_growth": 12.0, "market_cap": 290.0})
+    return table
+
+
+def test_filter_expressions_are_vectorized():
+    table = make_table()
+
+    cheap = table.screen("pe < 15", sort="-market_cap", columns=["pe"])
+    assert cheap == {"columns": ["symbol", "pe"], "rows": [["XOM", 12.0], ["CVX", 13.5]], "matched": 2}
+
+    # 缺失的 pe 不满足比较，not 取反时才被选中
+    assert table.screen("0 < pe < 20 and revenue_growth > 10")["rows"][0][0] == "CVX"
+    assert [row[0] for row in table.screen("not pe > 0")["rows"]] == ["INTC"]
+    assert table.screen("(market_cap / pe > 90) | (revenue_growth < -10)", sort="market_cap")[
+        "matched"
+    ] == 2
+    assert table.screen(limit=1, sort="pe")["rows"][0][0] == "XOM"
+
+
+def test_invalid_expressions_are_rejected():
+    table = make_table()
+    for expression in ("pe <", "__import__('os')", "eps > 1", "1 < 2"):
+        with pytest.raises(ValueError):
+            table.screen(expression)
+
+
+def test_table_grows_and_round_trips(tmp_path):
+    table = UniverseTable(list(METRICS))
+    for i in range(100):
+        table.upsert(f"S{i}", {"pe": float(i)})
+    table.upsert("S5", {"pe": 50.0})
+    path = str(tmp_path / "universe.npz")
+    table.save(path)
+
+    restored = UniverseTable(["pe", "beta"])
+    restored.load(path)
+
+    assert len(restored) == 100
+    assert restored.screen("pe == 50")["rows"] == [["S5", 50.0, None], ["S50", 50.0, None]]
+    assert np.isnan(restored.column("beta")).all()
+
+
+def test_snapshot_metrics_reads_ratios_and_current_forecasts():
+    snapshot = CompanySnapshot(
+        info={},
+        ratios={"PEEXCLXOR": ("Valuation", 29.5), "MKTCAP": ("Price", None)},
+        forecasts=[("TTMREVCHG", "PREV", 1.0), ("TTMREVCHG", "CURR", 2.5)],
+    )
+    assert snapshot_metrics(snapshot, METRICS) == {"pe": 29.5, "revenue_growth": 2.5}
+
+
+def test_prefetch_paces_only_uncached_reports(tmp_path):
+    table = UniverseTable(list(METRICS))
+    path = str(tmp_path / "universe.npz")
+    prefetcher = UniversePrefetcher(table, METRICS, path, concurrency=4, pacing=0.0, interval=0)
+    contracts = [Mock(conId=i + 1, symbol=s) for i, s in enumerate(["AAPL", "MSFT"])]
+    contracts.append(Mock(conId=0, symbol="NOPE"))
+    snapshot = (
+        '<ReportSnapshot><Ratios><Group ID="Valuation">'
+        '<Ratio FieldName="PEEXCLXOR" Type="N">20.0</Ratio></Group></Ratios></ReportSnapshot>'
+    )
+    cache = Mock()
+    cache.is_fresh = Mock(side_effect=lambda con_id, report_type: con_id == 1)
+    cache.get = AsyncMock(
+        side_effect=lambda contract, report_type, **kwargs: "" if contract.conId == 2 else snapshot
+    )
+
+    with patch.object(fundamental_screener, "fundamental_cache", cache), patch.object(
+        fundamental_screener, "qualify_stocks", AsyncMock(return_value=contracts)
+    ), patch.object(prefetcher, "_pace", AsyncMock()) as pace:
+        asyncio.run(prefetcher.run(["aapl", "msft", "nope"]))
+
+    pace.assert_awaited_once()
+    status = prefetcher.status()
+    assert (status["total"], status["completed"], status["failed"]) == (3, 1, 2)
+    assert table.screen()["rows"] == [["AAPL", 20.0, None, None]]
+    assert (tmp_path / "universe.npz").exists()
+
+
+def test_prefetch_waits_for_expired_reports_instead_of_stale_copies():
+    table = UniverseTable(list(METRICS))
+    prefetcher = UniversePrefetcher(table, METRICS, None, concurrency=1, pacing=0.0, interval=0)
+    contract = Mock(conId=1, symbol="AAPL")
+    cache = FundamentalCache(None, {}, default_ttl=0.0, max_stale=3600.0)
+
+    def snapshot(pe):
+        return (
+            '<ReportSnapshot><Ratios><Group ID="Valuation">'
+            f'<Ratio FieldName="PEEXCLXOR" Type="N">{pe}</Ratio></Group></Ratios></ReportSnapshot>'
+        )
+
+    async def run():
+        with patch("core.fundamental_cache.ib") as mock_ib:
+            mock_ib.reqFundamentalDataAsync = AsyncMock(return_value=snapshot(20.0))
+            await cache.get(contract, "ReportSnapshot")
+            # 报告已过期（ttl 为 0），预取应等待新报告
+            mock_ib.reqFundamentalDataAsync.return_value = snapshot(25.0)
+            await prefetcher.run(["AAPL"])
+            return mock_ib.reqFundamentalDataAsync.await_count
+
+    with patch.object(fundamental_screener, "fundamental_cache", cache), patch.object(
+        fundamental_screener, "qualify_stocks", AsyncMock(return_value=[contract])
+    ):
+        requests = asyncio.run(run())
+
+    assert requests == 2
+    assert not cache._refreshing and cache.stats()["stale_hits"] == 0
+    assert table.screen()["rows"] == [["AAPL", 25.0, None, None]]
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch
+import pytest
+from ib_async import BarDataList
+from core.history_scheduler import HistoricalDataError, HistoryScheduler, RateWindow
+
+
+def make_scheduler(**overrides):
+    options = dict(
+        max_requests=60,
+        window=600,
+        max_concurrent=50,
+        identical_interval=15,
+        contract_max_requests=5,
+        contract_window=2,
+    )
+    options.update(overrides)
+    return HistoryScheduler(**options)
+
+
+def test_rate_window_delays_once_full():
+    window = RateWindow(limit=2, period=10)
+    window.record(0)
+    window.record(1)
+
+    assert window.delay(5) == 5
+    assert window.delay(10) == 0
+
+
+def test_identical_requests_are_coalesced_and_reused():
+    scheduler = make_scheduler()
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def scenario():
+        first, second = await asyncio.gather(
+            scheduler.request(contract, durationStr="1 D"),
+            scheduler.request(contract, durationStr="1 D"),
+        )
+        third = await scheduler.request(contract, durationStr="1 D")
+        return first, second, third
+
+    with patch("core.history_scheduler.ib") as mock_ib:
+        mock_ib.reqHistoricalDataAsync = AsyncMock(return_value=["bar"])
+        results = asyncio.run(scenario())
+
+    assert results == (["bar"], ["bar"], ["bar"])
+    mock_ib.reqHistoricalDataAsync.assert_awaited_once()
+    stats = scheduler.stats()
+    assert (stats["coalesced"], stats["reused"]) == (1, 1)
+
+
+def test_queued_requests_follow_priority():
+    scheduler = make_scheduler(max_concurrent=1)
+    order = []
+
+    async def request(contract, **params):
+        order.append(contract.symbol)
+        await asyncio.sleep(0)
+        return []
+
+    async def scenario():
+        blocker = asyncio.create_task(
+            scheduler.request(Mock(conId=1, symbol="FIRST"), priority=0)
+        )
+        await asyncio.sleep(0)
+        await asyncio.gather(
+            blocker,
+            scheduler.request(Mock(conId=2, symbol="BACKFILL"), priority=10),
+            scheduler.request(Mock(conId=3, symbol="CHART"), priority=0),
+        )
+
+    with patch("core.history_scheduler.ib") as mock_ib:
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        asyncio.run(scenario())
+
+    assert order == ["FIRST", "CHART", "BACKFILL"]
+
+
+def empty_bars(req_id: int) -> BarDataList:
+    bars = BarDataList()
+    bars.reqId = req_id
+    return bars
+
+
+def test_failed_requests_raise_instead_of_returning_empty():
+    scheduler = make_scheduler(request_timeout=0.01)
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def request(contract, durationStr, **params):
+        if durationStr == "1 D":
+            scheduler._on_error(1, 162, "Historical data request pacing violation", contract)
+            return empty_bars(1)
+        if durationStr == "2 D":
+            scheduler._on_error(2, 162, "HMDS query returned no data: AAPL@SMART Trades", contract)
+            return empty_bars(2)
+        await asyncio.sleep(0.02)
+        return empty_bars(3)
+
+    async def scenario():
+        with pytest.raises(HistoricalDataError, match="pacing violation"):
+            await scheduler.request(contract, durationStr="1 D")
+        no_data = await scheduler.request(contract, durationStr="2 D")
+        with pytest.raises(HistoricalDataError, match="超时"):
+            await scheduler.request(contract, durationStr="3 D")
+        return no_data
+
+    with patch("core.history_scheduler.ib") as mock_ib:
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        no_data = asyncio.run(scenario())
+
+    assert len(no_data) == 0
+    assert mock_ib.reqHistoricalDataAsync.await_args.kwargs["timeout"] == 0.01
+
+
+def test_paced_contract_does_not_block_other_requests():
+    scheduler = make_scheduler(contract_max_requests=1, contract_window=60)
+    order = []
+
+    async def request(contract, **params):
+        order.append((contract.symbol, params["durationStr"]))
+        return []
+
+    async def scenario():
+        first = asyncio.create_task(
+            scheduler.request(Mock(conId=1, symbol="AAPL"), durationStr="1 D")
+        )
+        await asyncio.sleep(0.01)
+        # AAPL 在节流窗口内，优先级更高的第二个 AAPL 请求不应阻塞 MSFT
+        paced = asyncio.create_task(
+            scheduler.request(Mock(conId=1, symbol="AAPL"), priority=0, durationStr="2 D")
+        )
+        other = scheduler.request(Mock(conId=2, symbol="MSFT"), priority=10, durationStr="1 D")
+        await asyncio.gather(first, other)
+        paced.cancel()
+        return scheduler.stats()["queue_depth"]
+
+    with patch("core.history_scheduler.ib") as mock_ib:
+        mock_ib.reqHistoricalDataAsync = AsyncMock(side_effect=request)
+        queued = asyncio.run(scenario())
+
+    assert order == [("AAPL", "1 D"), ("MSFT", "1 D")]
+    assert queued == 1
+
+
+def test_requests_ending_now_share_one_key():
+    scheduler = make_scheduler()
+    contract = Mock(conId=1, symbol="AAPL")
+
+    async def scenario():
+        first = await scheduler.request(
+            contract, endDateTime=datetime.now(timezone.utc), durationStr="1 D"
+        )
+        await asyncio.sleep(0.01)
+        second = await scheduler.request(
+            contract, endDateTime=datetime.now(timezone.utc), durationStr="1 D"
+        )
+        return first, second
+
+    with patch("core.history_scheduler.ib") as mock_ib:
+        mock_ib.reqHistoricalDataAsync = AsyncMock(return_value=["bar"])
+        first, second = asyncio.run(scenario())
+
+    assert first is second
+    mock_ib.reqHistoricalDataAsync.assert_awaited_once()
+    assert mock_ib.reqHistoricalDataAsync.await_args.kwargs["endDateTime"] == ""
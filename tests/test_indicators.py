@@ -0,0 +1,86 @@
+import math
+import numpy as np
+from core.bar_store import BAR_DTYPE
+from core.indicators import (
+    INDICATOR_COLUMNS,
+    IndicatorCache,
+    IndicatorEngine,
+    compute_indicators,
+    IndicatorParams,
+)
+
+
+def make_bars(count: int, start: int = 1_750_000_000):
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 1, count))
+    bars = np.zeros(count, dtype=BAR_DTYPE)
+    bars["time"] = start + 60 * np.arange(count)
+    bars["open"] = close - 0.2
+    bars["high"] = close + rng.uniform(0, 1, count)
+    bars["low"] = close - rng.uniform(0, 1, count)
+    bars["close"] = close
+    bars["volume"] = rng.integers(100, 1000, count)
+    return bars
+
+
+def assert_close(actual, expected):
+    if math.isnan(expected):
+        assert math.isnan(actual)
+    else:
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_incremental_updates_match_batch_computation():
+    bars = make_bars(120)
+    params = IndicatorParams()
+    batch = compute_indicators(bars, params)
+
+    engine = IndicatorEngine.from_bars(bars[:50], params)
+    for bar in bars[50:]:
+        engine.update(bar)
+
+    rows = engine.tail(70)
+    for name in INDICATOR_COLUMNS:
+        for actual, expected in zip(rows[name], batch[name][50:]):
+            assert_close(actual, expected)
+
+
+def test_cache_only_advances_new_bars():
+    bars = make_bars(100)
+    cache = IndicatorCache()
+
+    engine = cache.sync("AAPL", bars[:80])
+    same_engine = cache.sync("AAPL", bars)
+
+    assert same_engine is engine
+    assert engine.last_time == bars["time"][-2]
+    preview = engine.tail(1, pending=bars[-1])
+    batch = compute_indicators(bars, IndicatorParams())
+    assert_close(preview["rsi"][0], batch["rsi"][-1])
+
+
+def test_engine_keeps_only_recent_rows():
+    bars = make_bars(120)
+    batch = compute_indicators(bars, IndicatorParams())
+
+    engine = IndicatorEngine.from_bars(bars[:50], max_rows=30)
+    for bar in bars[50:]:
+        engine.update(bar)
+
+    assert all(len(values) == 30 for values in engine._columns.values())
+    rows = engine.tail(100)
+    assert len(rows["time"]) == 30
+    for actual, expected in zip(rows["macd"], batch["macd"][-30:]):
+        assert_close(actual, expected)
+
+
+def test_cache_evicts_least_recently_used_engines():
+    bars = make_bars(60)
+    cache = IndicatorCache(max_engines=2)
+
+    first = cache.sync("AAPL", bars)
+    cache.sync("MSFT", bars)
+    assert cache.sync("AAPL", bars) is first
+    cache.sync("NVDA", bars)
+
+    assert [key for key, _ in cache._engines] == ["AAPL", "NVDA"]
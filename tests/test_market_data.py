@@ -0,0 +1,66 @@
+import asyncio
+import io
+import numpy as np
+from unittest.mock import AsyncMock, Mock, patch
+from ib_async import Ticker
+from core.contract_cache import ContractCache
+from core.quote_cache import QuoteCache
+from core.bar_store import BAR_DTYPE
+from core.market_data_operate import (
+    get_stock_quotes,
+    format_bars_columnar,
+    format_bars_csv,
+    format_bars_npy,
+)
+
+
+def test_batch_quotes_report_partial_results():
+    cache = QuoteCache(idle_ttl=60, max_lines=10)
+
+    async def qualify(*contracts):
+        for contract in contracts:
+            if contract.symbol != "BOGUS":
+                contract.conId = hash(contract.symbol) & 0xFFFF
+        return list(contracts)
+
+    def req_mkt_data(contract):
+        ticker = Ticker(contract=contract)
+        if contract.symbol == "AAPL":
+            ticker.bid, ticker.ask, ticker.last = 200.0, 200.1, 200.05
+        return ticker
+
+    with (
+        patch("core.contract_cache.ib") as mock_ib,
+        patch("core.contract_cache.contract_cache", ContractCache(None, ttl=60)),
+        patch("core.quote_cache.ib") as mock_cache_ib,
+        patch("core.market_data_operate.quote_cache", cache),
+    ):
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=qualify)
+        mock_cache_ib.reqMktData.side_effect = req_mkt_data
+        text, table = asyncio.run(
+            get_stock_quotes(["aapl", "MSFT", "BOGUS", "AAPL"], timeout=0.05)
+        )
+
+    mock_ib.qualifyContractsAsync.assert_awaited_once()
+    statuses = {row[0]: row[-1] for row in table["rows"]}
+    assert statuses == {"AAPL": "ok", "MSFT": "timeout", "BOGUS": "unknown contract"}
+    assert text.splitlines()[0] == ",".join(table["columns"])
+
+
+def test_history_formats_are_compact_and_round_trip():
+    bars = np.zeros(2, dtype=BAR_DTYPE)
+    bars["time"] = [1749758340, 1749758400]
+    bars["open"], bars["close"], bars["volume"] = [100.5, 101], [101, 100.25], [1200, 800]
+
+    csv = format_bars_csv(bars)
+    columns = format_bars_columnar(bars)
+    restored = np.load(io.BytesIO(format_bars_npy(bars)))
+
+    assert csv.splitlines() == [
+        "time,open,high,low,close,volume",
+        "2025-06-12T19:59:00Z,100.5,0,0,101,1200",
+        "2025-06-12T20:00:00Z,101,0,0,100.25,800",
+    ]
+    assert columns["time"] == [1749758340, 1749758400]
+    assert columns["close"] == [101.0, 100.25]
+    assert (restored == bars).all()
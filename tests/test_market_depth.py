@@ -0,0 +1,108 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+from eventkit import Event
+from ib_async import MktDepthData
+from core.market_depth import DepthBook, DepthCache, DepthLinesExhausted
+
+ASK, BID = 0, 1
+INSERT, UPDATE, DELETE = 0, 1, 2
+
+
+def tick(position, operation, side, price=0.0, size=0.0):
+    return MktDepthData(datetime.now(), position, "", operation, side, price, size)
+
+
+def make_contract(con_id: int, symbol: str):
+    contract = Mock()
+    contract.conId = con_id
+    contract.symbol = symbol
+    return contract
+
+
+def test_insert_shifts_levels_down():
+    book = DepthBook(rows=3)
+    book.apply(tick(0, INSERT, BID, 10.0, 100))
+    book.apply(tick(0, INSERT, BID, 10.1, 200))
+    book.apply(tick(2, INSERT, BID, 9.9, 300))
+    book.apply(tick(0, INSERT, BID, 10.2, 400))
+
+    # 超出档位数的最后一档被丢弃
+    assert book.snapshot()["bids"] == [[10.2, 400], [10.1, 200], [10.0, 100]]
+    assert book.snapshot()["asks"] == []
+    assert book.seq == 4
+
+
+def test_update_and_delete_return_deltas():
+    book = DepthBook(rows=5)
+    for position, price in enumerate([10.0, 10.1, 10.2]):
+        book.apply(tick(position, INSERT, ASK, price, 100))
+
+    update = book.apply(tick(1, UPDATE, ASK, 10.1, 50))
+    delete = book.apply(tick(0, DELETE, ASK))
+
+    assert update == {
+        "seq": 4,
+        "side": "ask",
+        "op": "update",
+        "position": 1,
+        "price": 10.1,
+        "size": 50,
+    }
+    assert delete == {"seq": 5, "side": "ask", "op": "delete", "position": 0}
+    assert book.snapshot()["asks"] == [[10.1, 50], [10.2, 100]]
+
+
+def test_out_of_range_events_are_ignored():
+    book = DepthBook(rows=2)
+    assert book.apply(tick(5, INSERT, BID, 10.0, 1)) is None
+    assert book.apply(tick(0, DELETE, BID)) is None
+    assert book.seq == 0
+
+
+@pytest.fixture
+def mock_ib():
+    with patch("core.market_depth.ib") as mock:
+        mock.isConnected.return_value = True
+        mock.reqMktDepth.side_effect = lambda contract, rows, smart: Mock(
+            contract=contract, updateEvent=Event(), domTicks=[]
+        )
+        yield mock
+
+
+def test_cache_shares_subscription_and_notifies_listeners(mock_ib):
+    cache = DepthCache(idle_ttl=60, max_lines=3, rows=5, smart_depth=True)
+    contract = make_contract(1, "AAPL")
+    received = []
+    cache.add_listener(lambda c, deltas, seq: received.append((c.symbol, deltas, seq)))
+
+    book, fresh = cache.acquire(contract)
+    book_again, fresh_again = cache.acquire(contract)
+    assert fresh and not fresh_again and book is book_again
+    assert mock_ib.reqMktDepth.call_count == 1
+
+    ticker = cache._entries[1].ticker
+    ticker.domTicks = [tick(0, INSERT, BID, 10.0, 100), tick(0, INSERT, ASK, 10.1, 200)]
+    ticker.updateEvent.emit(ticker)
+    # 只有报价变化、没有深度事件的批次不推送
+    ticker.domTicks = []
+    ticker.updateEvent.emit(ticker)
+
+    assert len(received) == 1
+    symbol, deltas, seq = received[0]
+    assert symbol == "AAPL" and seq == 2
+    assert [delta["side"] for delta in deltas] == ["bid", "ask"]
+
+
+def test_cache_line_cap(mock_ib):
+    cache = DepthCache(idle_ttl=60, max_lines=1, rows=5, smart_depth=True)
+    first, second = make_contract(1, "AAPL"), make_contract(2, "MSFT")
+
+    cache.acquire(first)
+    with pytest.raises(DepthLinesExhausted, match="DEPTH_MAX_LINES"):
+        cache.acquire(second)
+
+    cache.release(first)
+    cache.acquire(second)
+    mock_ib.cancelMktDepth.assert_called_once_with(first, True)
+    assert cache.get(1) is None and cache.get(2) is not None
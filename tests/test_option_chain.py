@@ -0,0 +1,31 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+from core.option_chain import SecDefCache, select_expirations, select_strikes
+
+
+def test_select_strikes_centers_on_spot():
+    strikes = [90, 95, 100, 105, 110, 115]
+
+    assert select_strikes(strikes, 101.0, 1) == [95, 100, 105]
+    assert select_strikes(strikes, 200.0, 2) == [105, 110, 115]
+    assert select_strikes(strikes, 10.0, 1) == [90, 95]
+
+
+def test_select_expirations_skips_expired():
+    expirations = ["20000121", "29990115", "29990215", "29990315"]
+
+    assert select_expirations(expirations, 2) == ["29990115", "29990215"]
+    assert select_expirations(expirations, 2, ["29990315"]) == ["29990315"]
+
+
+def test_sec_def_params_cached_per_trading_day():
+    cache = SecDefCache()
+    underlying = Mock(conId=265598, symbol="AAPL", secType="STK")
+
+    with patch("core.option_chain.ib") as mock_ib:
+        mock_ib.reqSecDefOptParamsAsync = AsyncMock(return_value=["chain"])
+        asyncio.run(cache.get(underlying))
+        chains = asyncio.run(cache.get(underlying))
+
+    assert chains == ["chain"]
+    mock_ib.reqSecDefOptParamsAsync.assert_awaited_once()
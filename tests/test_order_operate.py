@@ -0,0 +1,197 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+import pytest
+from eventkit import Event
+from ib_async import LimitOrder, MarketOrder, OrderStatus, Stock, StopLimitOrder, StopOrder, Trade, TradeLogEntry
+from core import order_operate
+
+
+@pytest.fixture
+def placed():
+    """模拟 ib.placeOrder，返回下单后处于 PendingSubmit 的 Trade 列表"""
+    trades = []
+
+    def place_order(contract, order):
+        trades.append(Trade(contract, order, OrderStatus(status=OrderStatus.PendingSubmit)))
+        return trades[-1]
+
+    with patch.object(order_operate, "ib") as mock, patch.object(
+        order_operate, "qualify_stock", AsyncMock(return_value=Stock("AAPL", "SMART", "USD"))
+    ), patch.object(order_operate, "_send_order_notification_async", AsyncMock()):
+        mock.placeOrder.side_effect = place_order
+        mock.openOrderEvent = Event()
+        yield trades
+
+
+def update_status(trade, status, message="", error_code=0):
+    trade.orderStatus.status = status
+    trade.log.append(TradeLogEntry(datetime.now(timezone.utc), status, message, error_code))
+    trade.statusEvent.emit(trade)
+
+
+def test_ack_waits_for_submitted(placed):
+    async def run():
+        task = asyncio.create_task(order_operate.place_limit_order("AAPL", 10, 150.0, ack=True))
+        await asyncio.sleep(0.01)
+        update_status(placed[0], OrderStatus.ValidationError, "Warning 399", 399)
+        await asyncio.sleep(0)
+        assert not task.done()
+        update_status(placed[0], OrderStatus.Submitted)
+        return await task
+
+    formatted, result = asyncio.run(run())
+
+    ack = result["ack"]
+    assert result["trade"] is placed[0]
+    assert ack["status"] == "Submitted"
+    assert ack["acknowledged"] and not ack["rejected"] and not ack["timed_out"]
+    assert ack["latency_ms"] >= 10
+    assert ack["message"] == "Warning 399"
+    assert "<value>Submitted</value>" in formatted
+
+
+def test_ack_reports_rejection_and_timeout(placed):
+    async def run():
+        task = asyncio.create_task(order_operate.place_market_order("AAPL", 10, ack=True))
+        await asyncio.sleep(0)
+        update_status(placed[0], OrderStatus.Cancelled, "Error 201: Order rejected", 201)
+        rejected = await task
+        timed_out = await order_operate.place_market_order("AAPL", 10, ack=True, ack_timeout=0.01)
+        return rejected, timed_out
+
+    (_, rejected), (_, timed_out) = asyncio.run(run())
+
+    assert rejected["ack"]["rejected"] and not rejected["ack"]["acknowledged"]
+    assert rejected["ack"]["message"] == "Error 201: Order rejected"
+    assert timed_out["ack"]["timed_out"]
+    assert timed_out["ack"]["status"] == OrderStatus.PendingSubmit
+
+
+def test_without_ack_returns_immediately(placed):
+    _, trade = asyncio.run(order_operate.place_market_order("AAPL", 10))
+    assert trade is placed[0]
+    assert trade.orderStatus.status == OrderStatus.PendingSubmit
+
+
+def working_trade(order, status=OrderStatus.Submitted):
+    order.orderId = 5
+    return Trade(Stock("AAPL", "SMART", "USD"), order, OrderStatus(orderId=5, status=status))
+
+
+def test_modify_resubmits_same_order_in_place(placed):
+    trade = working_trade(StopLimitOrder("SELL", 100, 144.0, 145.0))
+
+    async def run():
+        with patch.object(order_operate.order_registry, "get", return_value=trade):
+            task = asyncio.create_task(
+                order_operate.modify_order(5, new_price=143.5, new_stop_price=144.5, ack=True)
+            )
+            await asyncio.sleep(0.01)
+            order_operate.ib.openOrderEvent.emit(trade)
+            return await task
+
+    _, result = asyncio.run(run())
+
+    order_operate.ib.cancelOrder.assert_not_called()
+    order_operate.ib.placeOrder.assert_called_once_with(trade.contract, trade.order)
+    assert (trade.order.orderId, trade.order.lmtPrice, trade.order.auxPrice) == (5, 143.5, 144.5)
+    assert result["ack"]["acknowledged"] and result["ack"]["latency_ms"] >= 10
+
+
+def test_rejected_modify_restores_order(placed):
+    trade = working_trade(StopOrder("SELL", 100, 145.0))
+
+    async def run():
+        with patch.object(order_operate.order_registry, "get", return_value=trade):
+            task = asyncio.create_task(
+                order_operate.modify_order(5, new_quantity=50, new_price=140.0, ack=True)
+            )
+            await asyncio.sleep(0)
+            update_status(trade, OrderStatus.ValidationError, "Warning 105: modify mismatch", 105)
+            return await task
+
+    _, result = asyncio.run(run())
+
+    assert result["ack"]["rejected"] and not result["ack"]["acknowledged"]
+    assert result["ack"]["message"] == "Warning 105: modify mismatch"
+    assert (trade.order.totalQuantity, trade.order.auxPrice) == (100, 145.0)
+
+
+def test_modify_returns_trade_without_ack_by_default(placed):
+    trade = working_trade(LimitOrder("BUY", 100, 150.0))
+
+    with patch.object(order_operate.order_registry, "get", return_value=trade):
+        _, result = asyncio.run(order_operate.modify_order(5, new_price=149.5))
+
+    assert result is trade and trade.order.lmtPrice == 149.5
+    order_operate.ib.placeOrder.assert_called_once_with(trade.contract, trade.order)
+
+
+def test_modify_rejects_unsupported_changes(placed):
+    market = working_trade(MarketOrder("BUY", 10))
+    filled = working_trade(StopOrder("SELL", 100, 145.0), OrderStatus.Filled)
+
+    for trade, kwargs in ((market, {"new_price": 1.0}), (filled, {"new_quantity": 1}), (market, {})):
+        with patch.object(order_operate.order_registry, "get", return_value=trade):
+            with pytest.raises(ValueError):
+                asyncio.run(order_operate.modify_order(5, **kwargs))
+    order_operate.ib.placeOrder.assert_not_called()
+
+
+def test_batch_places_brackets_and_oca_groups_in_one_pass(placed):
+    order_ids = iter(range(100, 200))
+    order_operate.ib.client.getReqId.side_effect = lambda: next(order_ids)
+
+    def place_order(contract, order):
+        order.orderId = order.orderId or next(order_ids)
+        placed.append(Trade(contract, order, OrderStatus(status=OrderStatus.PendingSubmit)))
+        return placed[-1]
+
+    order_operate.ib.placeOrder.side_effect = place_order
+
+    async def qualify(*contracts):
+        for i, contract in enumerate(contracts):
+            contract.conId = 0 if contract.symbol == "NOPE" else i + 1
+        return list(contracts)
+
+    legs = [
+        {"symbol": "aapl", "quantity": 10, "price": 150.0, "take_profit": 160.0, "stop_loss": 145.0},
+        {"symbol": "MSFT", "quantity": 5, "action": "sell", "price": 420.0, "oca_group": "exit"},
+        {"symbol": "MSFT", "quantity": 5, "action": "sell", "order_type": "STP", "stop_price": 400.0, "oca_group": "exit"},
+        {"symbol": "NOPE", "quantity": 1, "order_type": "MKT"},
+    ]
+
+    async def run():
+        with patch.object(order_operate.contract_cache, "qualify", side_effect=qualify) as mock:
+            task = asyncio.create_task(order_operate.place_batch_orders(legs, ack_timeout=1.0))
+            await asyncio.sleep(0.01)
+            for trade in placed:
+                update_status(trade, OrderStatus.Submitted)
+            table, results = await task
+        # 重复的合约只识别一次
+        assert len(mock.call_args.args) == 3
+        return table, results
+
+    table, results = asyncio.run(run())
+
+    parent, take_profit, stop_loss, limit, stop = [result["trade"].order for result in results[:5]]
+    assert [r["role"] for r in results] == ["parent", "take_profit", "stop_loss", "order", "order", "order"]
+    assert (parent.transmit, take_profit.transmit, stop_loss.transmit) == (False, False, True)
+    assert take_profit.parentId == stop_loss.parentId == parent.orderId == 100
+    assert (take_profit.action, take_profit.lmtPrice, stop_loss.auxPrice) == ("SELL", 160.0, 145.0)
+    assert limit.ocaGroup == stop.ocaGroup == "exit" and limit.ocaType == 1
+    assert all(r["ack"]["acknowledged"] for r in results[:5])
+    assert results[5]["trade"] is None and "NOPE" in results[5]["error"]
+    assert table.splitlines()[0] == ",".join(order_operate.BATCH_COLUMNS)
+    assert table.splitlines()[1].startswith("0,parent,AAPL,100,,BUY,10,LMT,150.0,Submitted,True,")
+
+
+def test_batch_validates_all_legs_before_placing(placed):
+    legs = [
+        {"symbol": "AAPL", "quantity": 10, "price": 150.0},
+        {"symbol": "MSFT", "quantity": 10, "order_type": "STP"},
+    ]
+    with pytest.raises(ValueError, match="第 1 个订单无效"):
+        asyncio.run(order_operate.place_batch_orders(legs))
+    order_operate.ib.placeOrder.assert_not_called()
@@ -0,0 +1,42 @@
+from ib_async import Order, OrderStatus, Stock, Trade
+from core.order_registry import OrderRegistry
+
+
+def make_trade(order_id, symbol, status, perm_id=0):
+    order = Order(orderId=order_id, permId=perm_id, action="BUY", totalQuantity=1)
+    return Trade(Stock(symbol, "SMART", "USD"), order, OrderStatus(orderId=order_id, status=status))
+
+
+def test_lookup_by_order_and_perm_id():
+    registry = OrderRegistry()
+    trade = make_trade(1, "AAPL", "PendingSubmit")
+    registry._on_trade(trade)
+
+    assert registry.get(1) is trade
+    assert registry.get_by_perm_id(555) is None
+
+    # permId 在 openOrder 后才分配
+    trade.order.permId = 555
+    registry._on_trade(trade)
+    assert registry.get_by_perm_id(555) is trade
+    assert len(registry) == 1
+
+
+def test_status_index_follows_updates():
+    registry = OrderRegistry()
+    aapl = make_trade(1, "AAPL", "Submitted")
+    msft = make_trade(2, "MSFT", "Submitted")
+    aapl_done = make_trade(3, "AAPL", "Filled")
+    registry.rebuild([aapl, msft, aapl_done])
+
+    assert registry.find(status="Submitted") == [aapl, msft]
+    assert registry.find(symbol="aapl") == [aapl, aapl_done]
+    assert registry.find(symbol="AAPL", active=True) == [aapl]
+    assert registry.find(active=False) == [aapl_done]
+
+    aapl.orderStatus.status = "Cancelled"
+    registry._on_fill(aapl, None)
+
+    assert registry.find(status="Submitted") == [msft]
+    assert registry.find(symbol="AAPL", active=True) == []
+    assert registry.stats()["by_status"] == {"Submitted": 1, "Filled": 1, "Cancelled": 1}
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from ib_async import Ticker
+from core.quote_cache import QuoteCache, QuoteLinesExhausted, wait_for_quote
+
+
+def make_contract(con_id: int, symbol: str):
+    contract = Mock()
+    contract.conId = con_id
+    contract.symbol = symbol
+    return contract
+
+
+@pytest.fixture
+def mock_ib():
+    with patch("core.quote_cache.ib") as mock:
+        mock.isConnected.return_value = True
+        mock.reqMktData.side_effect = lambda contract: Mock(contract=contract)
+        yield mock
+
+
+def test_acquire_reuses_subscription(mock_ib):
+    cache = QuoteCache(idle_ttl=60, max_lines=10)
+    contract = make_contract(1, "AAPL")
+
+    ticker, fresh = cache.acquire(contract)
+    cache.release(contract)
+    ticker_again, fresh_again = cache.acquire(contract)
+
+    assert fresh and not fresh_again
+    assert ticker is ticker_again
+    assert mock_ib.reqMktData.call_count == 1
+
+
+def test_idle_entries_expire(mock_ib):
+    cache = QuoteCache(idle_ttl=0, max_lines=10)
+    contract = make_contract(1, "AAPL")
+
+    with cache.lease(contract):
+        pass
+    cache.evict_idle()
+
+    mock_ib.cancelMktData.assert_called_once_with(contract)
+    assert cache.stats()["lines_in_use"] == 0
+
+
+def test_line_cap_evicts_least_recently_used(mock_ib):
+    cache = QuoteCache(idle_ttl=60, max_lines=2)
+    first, second, third = (
+        make_contract(1, "AAPL"),
+        make_contract(2, "MSFT"),
+        make_contract(3, "NVDA"),
+    )
+
+    with cache.lease(first):
+        pass
+    with cache.lease(second):
+        pass
+    with cache.lease(third):
+        pass
+
+    mock_ib.cancelMktData.assert_called_once_with(first)
+    assert cache.stats()["symbols"] == ["MSFT", "NVDA"]
+
+
+def test_leased_entries_are_never_evicted(mock_ib):
+    cache = QuoteCache(idle_ttl=60, max_lines=1)
+    cache.acquire(make_contract(1, "AAPL"))
+
+    with pytest.raises(QuoteLinesExhausted):
+        cache.acquire(make_contract(2, "MSFT"))
+
+
+def test_wait_for_quote_returns_once_fields_arrive():
+    ticker = Ticker()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        def fill():
+            ticker.bid, ticker.ask, ticker.last = 1.0, 1.1, 1.05
+            ticker.updateEvent.emit(ticker)
+
+        loop.call_later(0.01, fill)
+        started = loop.time()
+        ready = await wait_for_quote(ticker, ("bid", "ask", "last"), timeout=5)
+        return ready, loop.time() - started
+
+    ready, elapsed = asyncio.run(scenario())
+    assert ready
+    assert elapsed < 1
+
+
+def test_wait_for_quote_times_out():
+    ticker = Ticker()
+    ready = asyncio.run(wait_for_quote(ticker, ("bid",), timeout=0.05))
+    assert not ready
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch
+import pytest
+from ib_async import RealTimeBar, RealTimeBarList
+from core.realtime_bars import BarAggregator, RealTimeBarHub
+from core.websocket import WebSocketManager
+
+
+def five_second_bar(t, open_, high, low, close, volume, wap):
+    return {
+        "time": t,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+        "wap": wap,
+        "count": 1,
+    }
+
+
+def test_aggregator_builds_minute_bar():
+    aggregator = BarAggregator(60)
+    bars = [
+        aggregator.update(five_second_bar(600 + 5 * i, 10 + i, 11 + i, 9 + i, 10.5 + i, 100, 10 + i))
+        for i in range(12)
+    ]
+
+    last = bars[-1]
+    assert [bar["complete"] for bar in bars] == [False] * 11 + [True]
+    assert last["time"] == 600
+    assert (last["open"], last["high"], last["low"], last["close"]) == (10, 22, 9, 21.5)
+    assert last["volume"] == 1200 and last["count"] == 12
+    assert last["wap"] == pytest.approx(15.5)
+
+    # 新周期重新开始
+    next_bar = aggregator.update(five_second_bar(660, 30, 31, 29, 30, 10, 30))
+    assert next_bar["time"] == 660 and next_bar["open"] == 30 and not next_bar["complete"]
+
+
+def test_aggregator_rejects_invalid_period():
+    with pytest.raises(ValueError):
+        BarAggregator(7)
+
+
+@pytest.fixture
+def mock_ib():
+    with patch("core.realtime_bars.ib") as mock:
+        mock.isConnected.return_value = True
+
+        mock.reqRealTimeBars.side_effect = lambda *args: RealTimeBarList()
+        yield mock
+
+
+def test_hub_shares_subscription_and_aggregates(mock_ib):
+    hub = RealTimeBarHub(["5 secs", "1 min"], "TRADES", False)
+    contract = Mock(conId=1, symbol="AAPL")
+    received = []
+    hub.add_listener(lambda c, updates: received.append(updates))
+
+    assert hub.acquire(contract) == {}
+    hub.acquire(contract)
+    assert mock_ib.reqRealTimeBars.call_count == 1
+
+    bars = hub._subscriptions[1].bars
+    time = datetime.fromtimestamp(655, timezone.utc)
+    bars.append(RealTimeBar(time, -1, 10, 11, 9, 10.5, 100, 10.2, 5))
+    bars.updateEvent.emit(bars, True)
+
+    assert received[0]["5 secs"]["complete"]
+    assert received[0]["1 min"]["time"] == 600 and received[0]["1 min"]["complete"]
+    assert hub.acquire(contract)["1 min"]["close"] == 10.5
+
+    for _ in range(3):
+        hub.release(contract)
+    mock_ib.cancelRealTimeBars.assert_called_once_with(bars)
+    assert hub.stats()["subscriptions"] == []
+
+
+def test_failed_bar_subscription_leaves_no_client_entry():
+    manager = WebSocketManager()
+    contract = Mock(conId=1, symbol="AAPL")
+
+    with (
+        patch("core.websocket.qualify_stock", AsyncMock(return_value=contract)),
+        patch("core.websocket.realtime_bar_hub") as hub,
+    ):
+        hub.bar_sizes = ["5 secs", "1 min"]
+        hub.acquire.side_effect = RuntimeError("no lines")
+        with pytest.raises(RuntimeError):
+            asyncio.run(manager.subscribe_bars("client", "AAPL"))
+
+    assert manager._bar_clients == {} and manager._client_bars == {}
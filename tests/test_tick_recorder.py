@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+import numpy as np
+from ib_async import (
+    TickAttribBidAsk,
+    TickAttribLast,
+    TickByTickAllLast,
+    TickByTickBidAsk,
+    TickByTickMidPoint,
+)
+from core.tick_recorder import (
+    KIND_QUOTE,
+    KIND_TRADE,
+    TICK_DTYPE,
+    TickRing,
+    ticks_to_records,
+)
+
+
+def make_records(times):
+    records = np.zeros(len(times), TICK_DTYPE)
+    records["time"] = times
+    records["kind"] = KIND_TRADE
+    records["price"] = np.arange(len(times), dtype="f8")
+    return records
+
+
+def test_append_and_read_in_order(tmp_path):
+    ring = TickRing(str(tmp_path / "AAPL.ticks"), capacity=10)
+    ring.append(make_records([1, 2, 3]))
+    ring.append(make_records([4, 5]))
+
+    ticks = ring.read()
+    assert ticks["time"].tolist() == [1, 2, 3, 4, 5]
+    assert ticks["seq"].tolist() == [0, 1, 2, 3, 4]
+    assert ring.read(start=2, end=4)["time"].tolist() == [2, 3]
+    assert ring.read(after_seq=2, limit=1)["seq"].tolist() == [3]
+
+
+def test_ring_overwrites_oldest_records(tmp_path):
+    ring = TickRing(str(tmp_path / "AAPL.ticks"), capacity=4)
+    ring.append(make_records([1, 2, 3]))
+    ring.append(make_records([4, 5, 6]))
+
+    ticks = ring.read()
+    assert ticks["time"].tolist() == [3, 4, 5, 6]
+    assert ticks["seq"].tolist() == [2, 3, 4, 5]
+    assert ring.read(limit=3)["time"].tolist() == [3, 4, 5]
+
+    # 单批超过容量时只保留最新的记录
+    ring.append(make_records([7, 8, 9, 10, 11]))
+    assert ring.read()["time"].tolist() == [8, 9, 10, 11]
+    assert ring.count == 11
+
+
+def test_reopen_readonly(tmp_path):
+    path = str(tmp_path / "AAPL.ticks")
+    writer = TickRing(path, capacity=8)
+    writer.append(make_records([1, 2]))
+    writer.flush()
+
+    reader = TickRing(path, readonly=True)
+    assert reader.capacity == 8
+    assert reader.read()["time"].tolist() == [1, 2]
+
+    writer.append(make_records([3]))
+    assert reader.read()["time"].tolist() == [1, 2, 3]
+
+
+def test_ticks_to_records():
+    time = datetime(2024, 1, 2, 15, 30, tzinfo=timezone.utc)
+    ticks = [
+        TickByTickAllLast(1, time, 100.5, 10, TickAttribLast(unreported=True), "NYSE", ""),
+        TickByTickMidPoint(time, 100.4),
+        TickByTickBidAsk(time, 100.4, 100.6, 300, 200, TickAttribBidAsk(bidPastLow=True)),
+    ]
+
+    records = ticks_to_records(ticks)
+
+    assert records["kind"].tolist() == [KIND_TRADE, KIND_QUOTE]
+    assert records["time"].tolist() == [int(time.timestamp()) * 10**9] * 2
+    assert records["flags"].tolist() == [2, 1]
+    assert records[0]["price"] == 100.5 and np.isnan(records[0]["bid"])
+    assert records[1]["ask_size"] == 200 and np.isnan(records[1]["price"])
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch
+from eventkit import Event
+from ib_async import CommissionReport, Execution, Fill, Order, OrderStatus, Stock, Trade
+from core.websocket import WebSocketManager
+
+
+def make_trade():
+    order = Order(orderId=7, permId=70, action="BUY", totalQuantity=100, orderType="LMT", lmtPrice=150.0)
+    status = OrderStatus(orderId=7, status="Submitted", filled=40, remaining=60, avgFillPrice=150.2)
+    return Trade(Stock("AAPL", "SMART", "USD"), order, status)
+
+
+def test_order_events_are_attached_only_while_subscribed():
+    manager = WebSocketManager()
+    ib = Mock(orderStatusEvent=Event(), execDetailsEvent=Event(), commissionReportEvent=Event())
+    counts = []
+    with patch("core.websocket.ib", ib):
+
+        async def run():
+            manager.subscriptions = {"a": set(), "b": set()}
+            await manager.subscribe("a", ["order_update"])
+            await manager.subscribe("b", ["order_update"])
+            attached = manager._order_events_attached
+            counts.append(len(ib.orderStatusEvent))
+            await manager.unsubscribe("a", ["order_update"])
+            still_attached = manager._order_events_attached
+            await manager.disconnect("b")
+            return attached, still_attached
+
+        attached, still_attached = asyncio.run(run())
+
+    assert attached and still_attached
+    assert not manager._order_events_attached
+    assert counts == [1]
+    assert len(ib.orderStatusEvent) == len(ib.execDetailsEvent) == 0
+
+
+def test_fills_and_commissions_are_pushed_in_order():
+    manager = WebSocketManager()
+    manager.broadcast = AsyncMock()
+    trade = make_trade()
+    execution = Execution(
+        execId="e1",
+        time=datetime(2024, 5, 3, 14, 30, tzinfo=timezone.utc),
+        side="BOT",
+        shares=40,
+        price=150.2,
+        cumQty=40,
+        avgPrice=150.2,
+        exchange="ISLAND",
+    )
+    fill = Fill(trade.contract, execution, CommissionReport(), execution.time)
+    # ib_async 在发出 execDetailsEvent 前已把成交加入 trade.fills
+    trade.fills.append(fill)
+
+    async def run():
+        manager._on_order_status(trade)
+        manager._on_exec_details(trade, fill)
+        manager._on_commission_report(
+            trade, fill, CommissionReport(execId="e1", commission=1.0, currency="USD")
+        )
+        await asyncio.sleep(0)
+        manager._order_task.cancel()
+
+    asyncio.run(run())
+
+    messages = [call.args[0] for call in manager.broadcast.await_args_list]
+    assert [m["event"] for m in messages] == ["status", "fill", "commission"]
+    assert all(call.args[1] == "order_update" for call in manager.broadcast.await_args_list)
+    assert messages[1]["data"]["fill"]["shares"] == 40
+    assert messages[1]["data"]["fill"]["price"] == 150.2
+    assert messages[1]["data"]["filled"] == 40
+    assert messages[2]["data"]["commission"]["commission"] == 1.0
@@ -1,5 +1,10 @@
-from ib_async import AccountValue
-from typing import List, Generic, TypeVar
+from fastapi.responses import StreamingResponse
+from ib_async import AccountValue, Order, Trade
+from ib_async.util import UNSET_DOUBLE
+from core.config import get_settings
+from typing import Iterable, Iterator, List, Generic, Optional, Sequence, TypeVar
+import csv
+import io
 import json
 
 T = TypeVar("T")
@@ -34,6 +39,113 @@ def format_account_summary(account_summary: List[AccountValue]):
     return formatted_account_summary
 
 
+def format_table(table: dict) -> str:
+    """将 {"columns", "rows"} 表格格式化为紧凑的 CSV 文本"""
+    lines = [",".join(table["columns"])]
+    for row in table["rows"]:
+        lines.append(",".join(_csv_value(value) for value in row))
+    return "\n".join(lines)
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    # 含逗号、引号或换行的值按 CSV 规则加引号
+    if any(c in text for c in ',"\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+# 订单/成交流式输出的列
+TRADE_COLUMNS = [
+    "order_id",
+    "perm_id",
+    "symbol",
+    "action",
+    "quantity",
+    "order_type",
+    "price",
+    "status",
+    "filled",
+    "remaining",
+    "avg_fill_price",
+]
+
+
+def format_trade(trade: Trade) -> dict:
+    """将 Trade 转换为扁平的 dict"""
+    return {
+        "order_id": trade.order.orderId,
+        "perm_id": trade.order.permId,
+        "symbol": trade.contract.symbol,
+        "action": trade.order.action,
+        "quantity": trade.order.totalQuantity,
+        "order_type": trade.order.orderType,
+        "price": order_price(trade.order),
+        "status": trade.orderStatus.status,
+        "filled": trade.filled(),
+        "remaining": trade.remaining(),
+        "avg_fill_price": trade.orderStatus.avgFillPrice,
+    }
+
+
+def order_price(order: Order) -> Optional[float]:
+    """订单价格：限价优先，其次止损/触发价（auxPrice），市价单为 None"""
+    # 未设置的价格为 UNSET_DOUBLE
+    for price in (order.lmtPrice, order.auxPrice):
+        if price != UNSET_DOUBLE:
+            return price
+    return None
+
+
+def iter_ndjson(rows: Iterable[dict], chunk_rows: int) -> Iterator[str]:
+    """逐块输出 NDJSON，每块最多 chunk_rows 行"""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(chunk) >= chunk_rows:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def iter_csv(
+    rows: Iterable[dict], columns: Sequence[str], chunk_rows: int
+) -> Iterator[str]:
+    """逐块输出 CSV（首块带表头），每块最多 chunk_rows 行"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(
+        buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\n"
+    )
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_trades(trades: Iterable[Trade], format: str) -> StreamingResponse:
+    """以 NDJSON 或 CSV 分块流式输出订单"""
+    rows = (format_trade(trade) for trade in trades)
+    chunk_rows = get_settings().STREAM_CHUNK_ROWS
+    if format == "csv":
+        return StreamingResponse(
+            iter_csv(rows, TRADE_COLUMNS, chunk_rows), media_type="text/csv"
+        )
+    return StreamingResponse(
+        iter_ndjson(rows, chunk_rows), media_type="application/x-ndjson"
+    )
+
+
 class ApiResponse(Generic[T]):
     def __init__(self, data: T, code: int, message: str):
         self.data = data